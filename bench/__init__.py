@@ -0,0 +1,2 @@
+# PATH: bench/__init__.py
+
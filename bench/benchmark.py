@@ -0,0 +1,245 @@
+# PATH: bench/benchmark.py
+
+"""
+Benchmark de las transformaciones sobre datos sintéticos.
+
+Para cada escala genera las entradas (`bench.datos_sinteticos`), mide
+cada función de `src/transform.py` por separado y el pipeline completo
+en memoria (transformaciones + integridad + anotaciones + VALID), también
+con el backend Polars si está instalado, y compara con una línea base guardada en JSON.
+`_mapear_cod_tarea[filas]` es el bucle original, para comparar con el
+modo columnar (solo hasta `MAX_FILAS_BUCLE` filas).
+
+Cada medida es el mínimo de *repeticiones* ejecuciones; la preparación de
+las entradas (copias, caché de reglas vacía) queda fuera del tiempo.
+
+Uso:
+    python -m bench.benchmark 10k 100k                 # medir y comparar
+    python -m bench.benchmark 10k 100k --guardar       # fijar línea base
+    python -m bench.benchmark 1M --repeticiones 1 --tolerancia 1.3
+
+Sale con código 1 si alguna medida supera la línea base × tolerancia.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from bench.datos_sinteticos import escala, generar
+from src.integridad import validar_integridad
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    tablas_auxiliares,
+    analizar_cargado_a,
+    _aplicar_maestro,
+    _mapear_cod_tarea,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.utils.reglas_asterisco_tareas import _resolver
+
+try:
+    from src import transform_polars
+except ImportError:                    # backend opcional
+    transform_polars = None
+
+BASELINES = Path(__file__).resolve().parent / "baselines"
+AHORA = datetime(2025, 1, 1)
+MAX_FILAS_BUCLE = 1_000_000
+
+
+def _pipeline(d: dict) -> dict:
+    """Mismo recorrido que `migracion.main` sin lectura ni exportación."""
+    base = (
+        d["base"].pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    tb = d["tablas_bd"]
+    anot, trazada = preparar_anotaciones(
+        base=base,
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+    integridad = validar_integridad(base, tb, anot)
+    valid = preparar_anotaciones_valid(anot, trazada)
+    return {"anotaciones": anot, "valid": valid, "integridad": integridad}
+
+
+def _pipeline_polars(d: dict) -> dict:
+    """`_pipeline` con el backend Polars."""
+    tb = d["tablas_bd"]
+    r = transform_polars.ejecutar(
+        d["base"],
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+    integridad = validar_integridad(r["base"], tb, r["anotaciones"])
+    return {"anotaciones": r["anotaciones"], "valid": r["valid"], "integridad": integridad}
+
+
+def _casos(d: dict) -> list[tuple[str, Callable, Callable]]:
+    """
+    (nombre, preparar, ejecutar): *preparar()* devuelve los argumentos de
+    *ejecutar* y no se cronometra (las funciones modifican su entrada).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        norm = normaliza_columnas(d["base"].copy())
+        limpio = limpia_idusuario(norm.copy())
+        desglosado = desglosa_proyecto(limpio.copy())
+        base = borrar_registros_usuarios_incorrectos(desglosado.copy())
+        con_maestro = _aplicar_maestro(base.copy(), d["maestro"])
+        anot, trazada = preparar_anotaciones(
+            base=base.copy(),
+            asignaciones=d["asignaciones"],
+            usuarios_bd=d["tablas_bd"]["usuarios"],
+            maestro_obras=d["maestro"],
+            tareas_bd=d["tablas_bd"]["tareas"],
+            ahora=AHORA,
+        )
+    tb = d["tablas_bd"]
+    _, obras_subir = tablas_auxiliares(base, tb["usuarios"], tb["obras"])
+    kw_anot = dict(
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+
+    casos = [
+        ("normaliza_columnas", lambda: (d["base"].copy(),), normaliza_columnas),
+        ("limpia_idusuario", lambda: (norm.copy(),), limpia_idusuario),
+        ("desglosa_proyecto", lambda: (limpio.copy(),), desglosa_proyecto),
+        ("borrar_registros_usuarios_incorrectos", lambda: (desglosado.copy(),),
+         borrar_registros_usuarios_incorrectos),
+        ("tablas_auxiliares", lambda: (base, tb["usuarios"], tb["obras"]), tablas_auxiliares),
+        ("analizar_cargado_a", lambda: (base, tb["obras"], obras_subir), analizar_cargado_a),
+        ("_aplicar_maestro", lambda: (base.copy(), d["maestro"]), _aplicar_maestro),
+        ("_mapear_cod_tarea", lambda: (con_maestro, d["asignaciones"], tb["tareas"]),
+         _mapear_cod_tarea),
+        ("_mapear_cod_tarea[filas]", lambda: (con_maestro, d["asignaciones"], tb["tareas"]),
+         lambda *args: _mapear_cod_tarea(*args, modo="filas")),
+        ("preparar_anotaciones", lambda: (), lambda: preparar_anotaciones(base=base.copy(), **kw_anot)),
+        ("preparar_anotaciones[baja_memoria]", lambda: (),
+         lambda: preparar_anotaciones(base=base.copy(), baja_memoria=True, **kw_anot)),
+        ("preparar_anotaciones_valid", lambda: (anot, trazada), preparar_anotaciones_valid),
+        ("validar_integridad", lambda: (base, tb, anot), validar_integridad),
+        ("pipeline", lambda: (d,), _pipeline),
+    ]
+    if len(d["base"]) > MAX_FILAS_BUCLE:
+        casos = [c for c in casos if c[0] != "_mapear_cod_tarea[filas]"]
+    if transform_polars is not None:
+        casos.append(("pipeline[polars]", lambda: (d,), _pipeline_polars))
+    return casos
+
+
+def medir(filas: int, repeticiones: int = 3, semilla: int = 0) -> list[dict]:
+    """Mide todos los casos a la escala indicada."""
+    d = generar(filas, semilla)
+    resultados = []
+    for nombre, preparar, ejecutar in _casos(d):
+        tiempos = []
+        for _ in range(repeticiones):
+            args = preparar()
+            _resolver.cache_clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                ejecutar(*args)
+                tiempos.append(time.perf_counter() - inicio)
+        resultados.append(
+            {
+                "filas": filas,
+                "caso": nombre,
+                "segundos": round(min(tiempos), 4),
+                "filas_por_segundo": round(filas / max(min(tiempos), 1e-9)),
+            }
+        )
+    return resultados
+
+
+def _entorno() -> dict:
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+    }
+
+
+def comparar(actual: pd.DataFrame, ruta_base: Path, tolerancia: float) -> pd.DataFrame:
+    """Añade a *actual* la línea base y el cociente actual / base."""
+    base = pd.DataFrame(json.loads(ruta_base.read_text(encoding="utf-8"))["resultados"])
+    tabla = actual.merge(
+        base[["filas", "caso", "segundos"]].rename(columns={"segundos": "base"}),
+        on=["filas", "caso"],
+        how="left",
+    )
+    tabla["ratio"] = (tabla["segundos"] / tabla["base"]).round(2)
+    tabla["regresion"] = tabla["ratio"] > tolerancia
+    return tabla
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de src/transform.py")
+    parser.add_argument("escalas", nargs="*", default=["10k", "100k"],
+                        help="nº de filas (10k, 1M, 10M, …)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default="local",
+                        help="nombre de la línea base en bench/baselines/")
+    parser.add_argument("--guardar", action="store_true",
+                        help="guardar los resultados como línea base")
+    parser.add_argument("--tolerancia", type=float, default=1.25,
+                        help="ratio a partir del cual se marca regresión")
+    args = parser.parse_args()
+
+    resultados = []
+    for texto in args.escalas:
+        filas = escala(texto)
+        print(f"… {filas} filas", file=sys.stderr)
+        resultados += medir(filas, args.repeticiones, args.semilla)
+    actual = pd.DataFrame(resultados)
+
+    ruta_base = BASELINES / f"{args.baseline}.json"
+    if args.guardar:
+        BASELINES.mkdir(exist_ok=True)
+        ruta_base.write_text(
+            json.dumps({"entorno": _entorno(), "resultados": resultados}, indent=2),
+            encoding="utf-8",
+        )
+        print(actual.to_string(index=False))
+        print(f"Línea base guardada en {ruta_base}")
+        sys.exit(0)
+
+    if not ruta_base.exists():
+        print(actual.to_string(index=False))
+        print(f"Sin línea base ({ruta_base}); usar --guardar para crearla")
+        sys.exit(0)
+
+    tabla = comparar(actual, ruta_base, args.tolerancia)
+    print(tabla.to_string(index=False))
+    sys.exit(1 if tabla["regresion"].any() else 0)
@@ -0,0 +1,240 @@
+# PATH: bench/datos_sinteticos.py
+
+"""
+Generador de datos sintéticos con la forma de las entradas reales.
+
+`generar(filas)` devuelve en memoria lo mismo que `load_entradas`:
+    - base           → hoja *Base Datos* (columnas y tipos del Excel),
+    - asignaciones   → hoja *asignaciones_tareas*,
+    - maestro        → T_OBRAS_SUBIR_MAESTRO_MODIFICACIONES,
+    - tablas_bd      → {"usuarios", "obras", "procesos", "tareas"}.
+
+Las cardinalidades salen de las reglas '*': todas las actividades de
+`_RULES` y todas las chapas de `CHAPAS` / `_RULES` aparecen, más chapas,
+obras y actividades adicionales que crecen con el nº de filas. Las
+frecuencias siguen una ley de Zipf (pocas obras / personas concentran la
+mayoría de las horas), como en el histórico.
+
+`escribir(datos, carpeta)` deja la estructura de ./archivos para ejecutar
+`migracion.main` de extremo a extremo (máximo 1.048.575 filas, límite de
+Excel). Todo es determinista para una misma semilla y no usa red.
+
+Uso por línea de comandos:
+    python -m bench.datos_sinteticos 100k ./archivos_sinteticos
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.extract import TABLAS_BD
+from src.transform import RENAME
+from src.utils.reglas_asterisco_tareas import CHAPAS, _RULES
+
+HISTORICO = "20250512_Base datos historico IP Julen.xlsx"
+MAESTRO = "T_OBRAS_SUBIR_MAESTRO_MODIFICACIONES.xlsx"
+MAX_FILAS_EXCEL = 1_048_575
+
+# Nombre de columna en el Excel a partir del nombre normalizado
+_COLUMNA = {v: k for k, v in RENAME.items()}
+
+CATEGORIAS = np.array(["Procesos", "Utillajes", "GG", None], dtype=object)
+PESOS_CATEGORIA = [0.55, 0.30, 0.10, 0.05]
+AREAS = np.array(
+    ["BOGIES", "CAJAS", "PINTURA", "MONTAJE", "INGENIERIA", None], dtype=object
+)
+
+
+def escala(texto: str | int) -> int:
+    """'10k' → 10_000, '1M' → 1_000_000, '250000' → 250_000."""
+    if isinstance(texto, int):
+        return texto
+    texto = texto.strip().lower().replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(texto[-1:], 1)
+    return int(float(texto.rstrip("km")) * factor)
+
+
+def _zipf(rng: np.random.Generator, n_valores: int, filas: int, a: float = 1.1) -> np.ndarray:
+    """Índices 0..n_valores-1 con frecuencias ~ 1/rango**a."""
+    pesos = 1.0 / np.arange(1, n_valores + 1) ** a
+    return rng.choice(n_valores, size=filas, p=pesos / pesos.sum())
+
+
+def _tareas_reglas() -> list[str]:
+    return sorted({tarea for reglas in _RULES.values() for _, _, tarea in reglas})
+
+
+def _chapas_reglas() -> set[str]:
+    chapas = set().union(*CHAPAS.values())
+    for reglas in _RULES.values():
+        for conjunto, _, _ in reglas:
+            chapas |= conjunto or set()
+    return chapas
+
+
+def generar(filas: int, semilla: int = 0) -> dict:
+    """Genera un juego de entradas completo de *filas* filas."""
+    rng = np.random.default_rng(semilla)
+
+    # ---------------- dimensiones ----------------
+    chapas = sorted(_chapas_reglas())
+    extra = max(30, min(20_000, filas // 500))
+    chapas += [str(20000 + i) for i in range(extra)]
+    rng.shuffle(chapas)
+
+    n_obras = max(100, min(50_000, filas // 1_000))
+    claves_obra = [
+        f"{i:04d}" for i in rng.choice(max(10_000, 2 * n_obras), n_obras, replace=False)
+    ]
+    nombres_obra = [f"OBRA {c} LINEA {i % 37}" for i, c in enumerate(claves_obra)]
+    proyectos = [f"{n} ({c})" for n, c in zip(nombres_obra, claves_obra)]
+    # Algunos proyectos van sin código entre paréntesis (el código es el nombre)
+    for i, nombre in enumerate(["GENERAL", "OFICINA TECNICA", "FORMACION"]):
+        proyectos[i] = claves_obra[i] = nombres_obra[i] = nombre
+
+    act_reglas = list(_RULES)
+    n_extra = max(60, min(2_000, filas // 5_000))
+    act_extra = [f"X{i:02d}-ACTIVIDAD SINTETICA {i}" for i in range(n_extra)]
+    actividades = act_reglas + act_extra
+    rng.shuffle(actividades)
+
+    # ---------------- Base Datos ----------------
+    fechas = np.datetime64("2017-01-02") + rng.integers(0, 8 * 365, filas).astype("timedelta64[D]")
+    fecha = pd.to_datetime(fechas)
+
+    i_chapa = _zipf(rng, len(chapas), filas, 0.8)
+    i_obra = _zipf(rng, n_obras, filas)
+    i_act = _zipf(rng, len(actividades), filas, 0.9)
+
+    # CARGADO A: la propia obra casi siempre, a veces otra o vacío; como
+    # en el Excel, los códigos numéricos llegan como número
+    cargado_idx = np.where(rng.random(filas) < 0.85, i_obra, _zipf(rng, n_obras, filas))
+    cargado_vals = np.array(
+        [int(c) if c.isdigit() else c for c in claves_obra], dtype=object
+    )
+    cargado = cargado_vals[cargado_idx]
+    cargado[rng.random(filas) < 0.03] = None
+
+    horas = np.round(rng.gamma(2.0, 2.0, filas) * 2) / 2
+    horas = horas.astype(object)
+    texto_h = rng.random(filas) < 0.05       # el histórico trae horas como "7H"
+    horas[texto_h] = [f"{int(h)}H" for h in horas[texto_h]]
+
+    nplano = np.full(filas, None, dtype=object)
+    con_plano = rng.random(filas) < 0.10
+    nplano[con_plano] = [f"P-{n:06d}" for n in rng.integers(0, 999_999, int(con_plano.sum()))]
+
+    obs = np.full(filas, None, dtype=object)
+    con_obs = rng.random(filas) < 0.15
+    textos_obs = np.array([f"Observación {i}" for i in range(500)], dtype=object)
+    obs[con_obs] = textos_obs[rng.integers(0, 500, int(con_obs.sum()))]
+
+    base = pd.DataFrame(
+        {
+            _COLUMNA["fecha"]: fecha,
+            "AÑO": fecha.year,
+            "SEMANA": fecha.isocalendar().week.to_numpy(dtype="int64"),
+            "MES": fecha.month,
+            _COLUMNA["idusuario_raw"]: np.array(chapas, dtype=object)[i_chapa].astype("int64"),
+            _COLUMNA["proyecto"]: np.array(proyectos, dtype=object)[i_obra],
+            _COLUMNA["actividad"]: np.array(actividades, dtype=object)[i_act],
+            _COLUMNA["nplano"]: nplano,
+            _COLUMNA["choras"]: horas,
+            "AREA": AREAS[rng.integers(0, len(AREAS), filas)],
+            "CARGADO A": cargado,
+            "CATEGORIA": CATEGORIAS[rng.choice(len(CATEGORIAS), filas, p=PESOS_CATEGORIA)],
+            _COLUMNA["obs"]: obs,
+            "Column1": np.full(filas, np.nan),
+        }
+    )
+
+    # ---------------- asignaciones_tareas ----------------
+    tareas = _tareas_reglas() + ["UE10", "UT20", "UE64", "UT64", "UE20", "UT16", "A20"]
+    opciones = np.array(tareas + ["#ESPECIAL#", "XXX99", None], dtype=object)
+    asign_extra = opciones[rng.integers(0, len(opciones), len(act_extra))]
+    asignaciones = pd.DataFrame(
+        {
+            "Tarea ": act_reglas + act_extra,
+            "AsignarATarea": ["*"] * len(act_reglas) + list(asign_extra),
+        }
+    )
+
+    # ---------------- T_* ----------------
+    conocidas = rng.random(len(chapas)) < 0.7
+    usuarios = pd.DataFrame(
+        {
+            "IdUsuario": np.array(chapas, dtype="int64")[conocidas],
+            "PagaHE": rng.choice(["S", "N"], int(conocidas.sum())),
+        }
+    )
+    en_bd = rng.random(n_obras) < 0.8
+    obras = pd.DataFrame(
+        {
+            "ClaveObra": np.array(claves_obra, dtype=object)[en_bd],
+            "NomObra": np.array(nombres_obra, dtype=object)[en_bd],
+        }
+    )
+    # Alguna tarea asignada no existe en T_TAREAS (→ CodTarea vacío)
+    tareas_bd = pd.DataFrame({"CodTarea": sorted(set(tareas) - {"UT80", "A20"})})
+    procesos = pd.DataFrame({"IdProceso": [1, 2]})
+
+    # ---------------- maestro de modificaciones ----------------
+    n_maestro = max(30, n_obras // 20)
+    en_maestro = rng.choice(n_obras, n_maestro, replace=False)
+    accion = rng.choice(4, n_maestro, p=[0.1, 0.4, 0.3, 0.2])
+    cambiar = np.array(claves_obra, dtype=object)[rng.integers(0, n_obras, n_maestro)]
+    cambiar[accion == 0] = "borrar"
+    cambiar[accion == 1] = "VAR_VAR"
+    cambiar[accion == 3] = None
+    maestro = pd.DataFrame(
+        {
+            "ClaveObra ": np.array(claves_obra, dtype=object)[en_maestro],
+            "CambiarAObra": pd.Series(cambiar, dtype=object),
+        }
+    )
+
+    return {
+        "base": base,
+        "asignaciones": asignaciones,
+        "maestro": maestro,
+        "tablas_bd": {
+            "usuarios": usuarios,
+            "obras": obras,
+            "procesos": procesos,
+            "tareas": tareas_bd,
+        },
+    }
+
+
+def escribir(datos: dict, carpeta: Path) -> Path:
+    """Escribe *datos* con la estructura de ./archivos y devuelve *carpeta*."""
+    if len(datos["base"]) > MAX_FILAS_EXCEL:
+        raise ValueError(
+            f"{len(datos['base'])} filas no caben en una hoja Excel "
+            f"(máximo {MAX_FILAS_EXCEL})"
+        )
+    carpeta = Path(carpeta)
+    (carpeta / "TABLAS_BD").mkdir(parents=True, exist_ok=True)
+
+    with pd.ExcelWriter(carpeta / HISTORICO) as writer:
+        datos["base"].to_excel(writer, sheet_name="Base Datos", index=False)
+        datos["asignaciones"].to_excel(writer, sheet_name="asignaciones_tareas", index=False)
+    datos["maestro"].to_excel(carpeta / MAESTRO, index=False)
+    for clave, fichero in TABLAS_BD.items():
+        datos["tablas_bd"][clave].to_excel(carpeta / "TABLAS_BD" / fichero, index=False)
+    return carpeta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera entradas sintéticas")
+    parser.add_argument("filas", help="nº de filas de Base Datos (10k, 1M, …)")
+    parser.add_argument("carpeta", type=Path, help="carpeta destino (estructura ./archivos)")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    ruta = escribir(generar(escala(args.filas), args.semilla), args.carpeta)
+    print(f"Entradas sintéticas en {ruta}")
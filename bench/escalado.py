@@ -0,0 +1,158 @@
+# PATH: bench/escalado.py
+
+"""
+Escalado de las etapas por filas repartidas en tramos (src/particiones.py).
+
+Para cada escala genera las entradas (`bench.datos_sinteticos`), mide el
+recorrido en serie (las etapas de `bench.benchmark._pipeline`) y
+`procesar_particionado` con 1…N workers, y comprueba que las tablas son
+idénticas a las de la serie (IdAnot incluidos, tipos incluidos). El
+tiempo de los workers incluye arrancar el pool y enviar los tramos.
+
+Uso:
+    python -m bench.escalado 100k 1M                   # 1…nº de CPUs
+    python -m bench.escalado 1M --workers 1 2 4 8 --tramos 16
+
+Sale con código 1 si alguna ejecución no coincide con la serie.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from unittest import mock
+
+import pandas as pd
+
+from bench.benchmark import AHORA
+from bench.datos_sinteticos import escala, generar
+from src import particiones
+from src.integridad import validar_integridad
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.utils.reglas_asterisco_tareas import _resolver
+
+
+def _serie(d: dict) -> dict[str, pd.DataFrame]:
+    """Las tablas de `procesar_particionado`, calculadas en serie."""
+    tb = d["tablas_bd"]
+    base = (
+        d["base"].copy().pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    anot, trazada = preparar_anotaciones(
+        base=base,
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+    usuarios, obras, cargado_a, informe = validar_integridad(base, tb, anot)
+    return {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a,
+        "T_ANOTACIONES_SUBIR": anot,
+        "T_ANOTACIONES_VALID_SUBIR": preparar_anotaciones_valid(anot, trazada),
+        "BASE_PROCESADA": trazada,
+        "INFORME_INTEGRIDAD": informe,
+    }
+
+
+def _particionado(d: dict, workers: int, tramos: int | None) -> dict[str, pd.DataFrame]:
+    # FCREA / FMODIFI fijos para poder comparar con la serie
+    with mock.patch.object(particiones, "datetime", mock.Mock(now=lambda: AHORA)):
+        return particiones.procesar_particionado(
+            d["base"].copy(),
+            asignaciones=d["asignaciones"],
+            tablas_bd=d["tablas_bd"],
+            maestro_obras=d["maestro"],
+            workers=workers,
+            tramos=tramos,
+        )
+
+
+def _iguales(a: dict, b: dict) -> list[str]:
+    """Tablas de *a* que no son idénticas en *b*."""
+    distintas = []
+    for nombre, df in a.items():
+        try:
+            pd.testing.assert_frame_equal(
+                df.reset_index(drop=True), b[nombre].reset_index(drop=True)
+            )
+        except AssertionError:
+            distintas.append(nombre)
+    return distintas
+
+
+def medir(
+    filas: int, workers: list[int], tramos: int | None = None,
+    repeticiones: int = 3, semilla: int = 0,
+) -> list[dict]:
+    """Serie y 1…N workers a la escala indicada (mínimo de *repeticiones*)."""
+    d = generar(filas, semilla)
+    casos = [("serie", None, lambda: _serie(d))] + [
+        (f"{w} workers", w, lambda w=w: _particionado(d, w, tramos)) for w in workers
+    ]
+    referencia, resultados = None, []
+    for nombre, w, ejecutar in casos:
+        tiempos = []
+        for _ in range(repeticiones):
+            _resolver.cache_clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                salidas = ejecutar()
+                tiempos.append(time.perf_counter() - inicio)
+        if referencia is None:
+            referencia = salidas
+        segundos = min(tiempos)
+        resultados.append(
+            {
+                "filas": filas,
+                "caso": nombre,
+                "workers": w,
+                "segundos": round(segundos, 4),
+                "distintas": ", ".join(_iguales(referencia, salidas)),
+            }
+        )
+    serie = resultados[0]["segundos"]
+    for r in resultados:
+        r["aceleracion"] = round(serie / max(r["segundos"], 1e-9), 2)
+        r["eficiencia"] = round(r["aceleracion"] / r["workers"], 2) if r["workers"] else None
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escalado de src/particiones.py")
+    parser.add_argument("escalas", nargs="*", default=["100k"],
+                        help="nº de filas (10k, 1M, …)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=list(range(1, (os.cpu_count() or 1) + 1)))
+    parser.add_argument("--tramos", type=int, default=None,
+                        help="tramos por ejecución (por defecto, uno por worker)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    resultados = []
+    for texto in args.escalas:
+        filas = escala(texto)
+        print(f"… {filas} filas", file=sys.stderr)
+        resultados += medir(filas, args.workers, args.tramos, args.repeticiones, args.semilla)
+    tabla = pd.DataFrame(resultados).astype({"workers": "Int64"})
+    print(f"CPUs: {os.cpu_count()}")
+    print(tabla.to_string(index=False))
+    sys.exit(1 if (tabla["distintas"] != "").any() else 0)
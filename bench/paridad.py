@@ -0,0 +1,340 @@
+# PATH: bench/paridad.py
+
+"""
+Paridad entre los backends de transformación (pandas / Polars).
+
+Ejecuta el recorrido completo con ambos backends sobre datos sintéticos
+(o sobre una carpeta con la estructura de ./archivos) y compara las
+tablas celda a celda: mismas columnas en el mismo orden, mismas filas y
+mismos valores. No se comparan los tipos (Categorical ↔ texto) ni el
+tipo de vacío (NaN ↔ None): en la exportación son iguales.
+
+Las tablas de pandas se escriben además con el exportador parquet y se
+vuelven a leer: tienen que salir las mismas, salvo las columnas que
+mezclan tipos (CARGADO A), que se guardan como texto.
+
+Antes de los datos se comprueba la tabla de decisión '*' compilada contra
+las reglas de `_RULES` recorridas en orden, como la cadena de `if`
+original, en todas las combinaciones (actividad, chapa, categoría).
+
+Cada entrada se prueba también con CARGADO A en decimales: la mitad de
+los números como float (1234 y 1234.0 conviven) y todos como float (sin
+textos). En cada variante, los borrados del maestro y las obras de
+CARGADO A faltantes se comparan además con `str(v)` fila a fila, como el
+código original.
+
+`_mapear_cod_tarea` se compara además en sus dos modos (columnar y el
+bucle por filas original) sobre la base, hasta `MAX_FILAS_BUCLE` filas,
+más una fila de cada caso: '*' resuelto, '*' sin regla (PEND), sin
+asignación, #ESPECIAL#, código que no está en T_TAREAS, categoría vacía
+y espacios / mayúsculas.
+
+Uso:
+    python -m bench.paridad 10k 1M
+    python -m bench.paridad --archivos ./archivos
+
+Sale con código 1 si alguna tabla difiere (se puede usar como
+comprobación antes de cambiar src/transform.py o src/transform_polars.py).
+tests/test_paridad.py ejecuta las mismas comprobaciones con pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bench.datos_sinteticos import HISTORICO, MAESTRO, escala, generar
+from src.export import ESCRITORES
+from src.transform import (
+    _aplicar_maestro,
+    _mapear_cod_tarea,
+    _reglas_maestro,
+    analizar_cargado_a,
+    tablas_auxiliares,
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.utils import reglas_asterisco_tareas as reglas_ast
+from src.utils.valores import tipo_unico
+
+AHORA = datetime(2025, 1, 1)
+MAX_FILAS_BUCLE = 200_000      # el modo "filas" es un bucle con iterrows
+
+# (actividad, chapa, CATEGORIA) añadidas a la base y asignaciones que usan
+_FILAS_TAREAS = [
+    ("VARIOS", "12705", "Procesos"),                  # '*' resuelto
+    ("  VARIOS ", "12705", " UTILLAJES "),            # espacios / mayúsculas
+    ("VARIOS", "12705", None),                        # '*' sin regla → PEND
+    ("IPS-GESTION SUBCONTRATACION", "99999", "GG"),   # '*' sin regla → PEND
+    ("ZZ-ESPECIAL", "12705", "Procesos"),             # #ESPECIAL#
+    ("ZZ-FUERA DE T_TAREAS", "12705", "Procesos"),    # código desconocido
+    ("ZZ-SIN ASIGNACION", "12705", "Procesos"),       # no está en la hoja
+    (None, "12705", "Procesos"),
+]
+_ASIGNACIONES_TAREAS = [
+    ("VARIOS", "*"),
+    ("IPS-GESTION SUBCONTRATACION", "*"),
+    ("ZZ-ESPECIAL", "#ESPECIAL#"),
+    ("ZZ-FUERA DE T_TAREAS", "ZZ_NO_EXISTE"),
+]
+
+
+def _pandas(d: dict) -> dict[str, pd.DataFrame]:
+    base = (
+        d["base"].copy().pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    tb = d["tablas_bd"]
+    anot, trazada = preparar_anotaciones(
+        base=base.copy(),
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+    return {
+        "base": base,
+        "anotaciones": anot,
+        "trazada": trazada,
+        "valid": preparar_anotaciones_valid(anot, trazada),
+    }
+
+
+def _polars(d: dict) -> dict[str, pd.DataFrame]:
+    from src import transform_polars
+
+    tb = d["tablas_bd"]
+    return transform_polars.ejecutar(
+        d["base"],
+        asignaciones=d["asignaciones"],
+        usuarios_bd=tb["usuarios"],
+        maestro_obras=d["maestro"],
+        tareas_bd=tb["tareas"],
+        ahora=AHORA,
+    )
+
+
+def _valores(serie: pd.Series) -> pd.Series:
+    serie = serie.reset_index(drop=True).astype(object)
+    return serie.where(serie.notna(), None)
+
+
+def diferencias(a: dict[str, pd.DataFrame], b: dict[str, pd.DataFrame]) -> list[str]:
+    """Descripción de cada diferencia entre las tablas de *a* y *b*."""
+    difs = []
+    for nombre, ta in a.items():
+        tb = b[nombre]
+        if list(ta.columns) != list(tb.columns):
+            difs.append(f"{nombre}: columnas {list(ta.columns)} ≠ {list(tb.columns)}")
+            continue
+        if len(ta) != len(tb):
+            difs.append(f"{nombre}: {len(ta)} filas ≠ {len(tb)}")
+            continue
+        for col in ta.columns:
+            va, vb = _valores(ta[col]), _valores(tb[col])
+            distintas = ~((va == vb) | (va.isna() & vb.isna()))
+            if distintas.any():
+                i = int(distintas.idxmax())
+                difs.append(
+                    f"{nombre}.{col}: {int(distintas.sum())} filas distintas "
+                    f"(fila {i}: {va[i]!r} ≠ {vb[i]!r})"
+                )
+    return difs
+
+
+def _en_orden(entradas: list, chapa: str, categoria: str) -> str:
+    """Primera entrada (chapas, categoria, tarea) que casa, como un `if` tras otro."""
+    for chapas, cat, tarea in entradas:
+        if (chapas is reglas_ast.TODAS or chapa in chapas) and cat in (reglas_ast.TODAS, categoria):
+            return tarea
+    return ""
+
+
+def reglas(tabla: dict[str, list] | None = None) -> list[str]:
+    """
+    Combinaciones (actividad, chapa, categoria) en las que la tabla
+    compilada a partir de *tabla* (por defecto `_RULES`) no da lo mismo
+    que recorrer sus entradas en orden.
+    """
+    tabla = reglas_ast._RULES if tabla is None else tabla
+    chapas = {"99999"} | {c for e in tabla.values() for s, _, _ in e if s for c in s}
+    categorias = [reglas_ast.PROC, reglas_ast.UTI, reglas_ast.GG, ""]
+    activa = reglas_ast.tabla_decision()
+    reglas_ast.fijar_tabla_decision(reglas_ast._compilar(reglas_ast._filas_desde_reglas(tabla)))
+    try:
+        return [
+            f"reglas: {a!r} / {c} / {k!r}: {obtenido!r} ≠ {esperado!r}"
+            for a, entradas in tabla.items()
+            for c in sorted(chapas)
+            for k in categorias
+            if (obtenido := reglas_ast.asignar_tarea_asterisco(a, c, k))
+            != (esperado := _en_orden(entradas, c, k))
+        ]
+    finally:
+        reglas_ast.fijar_tabla_decision(activa)
+
+
+def tareas(d: dict, base: pd.DataFrame) -> list[str]:
+    """
+    Diferencias entre `_mapear_cod_tarea` columnar y por filas sobre
+    *base* (ya normalizada) más las filas de `_FILAS_TAREAS`.
+    """
+    extra = base.head(1).astype(object)
+    extra = extra.loc[extra.index.repeat(len(_FILAS_TAREAS))].reset_index(drop=True)
+    extra[["actividad", "idusuario", "CATEGORIA"]] = _FILAS_TAREAS
+    base = pd.concat(
+        [base.head(MAX_FILAS_BUCLE), extra.dropna(axis=1, how="all")], ignore_index=True
+    )
+    asign = pd.concat(
+        [d["asignaciones"].rename(columns=str.strip), pd.DataFrame(_ASIGNACIONES_TAREAS, columns=["Tarea", "AsignarATarea"])],
+        ignore_index=True,
+    )
+    columnar, filas = (
+        {"tareas": _mapear_cod_tarea(base, asign, d["tablas_bd"]["tareas"], modo=modo)}
+        for modo in ("columnar", "filas")
+    )
+    return diferencias(columnar, filas)
+
+
+def cargado_a(d: dict, base: pd.DataFrame) -> list[str]:
+    """
+    Borrados del maestro y obras de CARGADO A faltantes de *base* (ya
+    normalizada) frente a `str(v)` fila a fila sobre los valores de la
+    entrada (*base* conserva el índice de `d["base"]`).
+    """
+    tb = d["tablas_bd"]
+    borrar, _ = _reglas_maestro(d["maestro"])
+    cargado = d["base"].loc[base.index, "CARGADO A"].astype(object)
+    quedan = int(
+        (~base["proyecto_codigo"].astype(object).isin(borrar) & ~cargado.map(str).isin(borrar)).sum()
+    )
+    difs = []
+    filas = len(_aplicar_maestro(base.copy(), d["maestro"]))
+    if filas != quedan:
+        difs.append(f"maestro: {filas} filas tras borrar ≠ {quedan} fila a fila")
+
+    _, obras_subir = tablas_auxiliares(base, tb["usuarios"], tb["obras"])
+    obtenidas = set(analizar_cargado_a(base, tb["obras"], obras_subir)["ClaveObra"])
+    conocidas = set(tb["obras"]["ClaveObra"].astype(str)) | set(obras_subir["ClaveObra"].astype(str))
+    esperadas = {str(v).strip() for v in cargado.dropna()} - conocidas
+    if obtenidas != esperadas:
+        difs.append(
+            f"cargado_a_faltantes: {len(obtenidas)} obras ≠ {len(esperadas)} fila a fila"
+        )
+    return difs
+
+
+def variantes(d: dict) -> dict[str, dict]:
+    """
+    *d* tal cual y con CARGADO A en decimales: la mitad de los números
+    como float y todos como float (los textos quedan vacíos).
+    """
+    col = "CARGADO A"
+    valores = d["base"][col].to_numpy(dtype=object)
+    numeros = np.array(
+        [isinstance(v, (int, float, np.number)) and not pd.isna(v) for v in valores], dtype=bool
+    )
+    mitad = valores.copy()
+    cambiar = np.flatnonzero(numeros)[::2]
+    mitad[cambiar] = [float(v) for v in mitad[cambiar]]
+    todos = np.where(numeros, valores, np.nan).astype(float)
+    return {
+        "": d,
+        f" [{col} mitad float]": {**d, "base": d["base"].assign(**{col: mitad})},
+        f" [{col} float]": {**d, "base": d["base"].assign(**{col: todos})},
+    }
+
+
+def _como_texto(serie: pd.Series) -> pd.Series:
+    """Lo que se espera leer del parquet: texto si *serie* mezcla tipos."""
+    if tipo_unico(serie):
+        return serie
+    serie = serie.astype(object)
+    return serie.where(serie.isna(), serie.astype(str))
+
+
+def parquet(tablas: dict[str, pd.DataFrame]) -> list[str]:
+    """Diferencias de *tablas* tras escribirlas en parquet y volver a leerlas."""
+    _, escribir = ESCRITORES["parquet"]
+    difs, esperadas, leidas = [], {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, df in tablas.items():
+            ruta = Path(tmp) / f"{nombre}.parquet"
+            try:
+                escribir(df, ruta)
+            except Exception as e:
+                difs.append(f"parquet {nombre}: {type(e).__name__}: {e}")
+                continue
+            esperadas[f"parquet {nombre}"] = df.apply(_como_texto)
+            leidas[f"parquet {nombre}"] = pd.read_parquet(ruta)
+    return difs + diferencias(esperadas, leidas)
+
+
+def comparar(d: dict) -> list[str]:
+    """
+    Ejecuta ambos backends sobre las entradas *d* y compara; comprueba
+    también la ida y vuelta a parquet de las tablas de pandas y los dos
+    modos de `_mapear_cod_tarea` y CARGADO A frente al cálculo fila a fila.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tablas = _pandas(d)
+        return (
+            diferencias(tablas, _polars(d))
+            + parquet(tablas)
+            + tareas(d, tablas["base"])
+            + cargado_a(d, tablas["base"])
+        )
+
+
+def _entradas(carpeta: Path) -> dict:
+    from src.extract import load_entradas
+
+    tablas_bd, base, asign, maestro = load_entradas(
+        carpeta / "TABLAS_BD", carpeta / HISTORICO, carpeta / MAESTRO
+    )
+    return {"base": base, "asignaciones": asign, "maestro": maestro, "tablas_bd": tablas_bd}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paridad pandas / Polars")
+    parser.add_argument("escalas", nargs="*", default=["10k"],
+                        help="nº de filas sintéticas (10k, 1M, …)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--archivos", type=Path,
+                        help="carpeta con la estructura de ./archivos")
+    args = parser.parse_args()
+
+    casos = {f"sintetico {t}": lambda t=t: generar(escala(t), args.semilla) for t in args.escalas}
+    if args.archivos is not None:
+        casos = {str(args.archivos): lambda: _entradas(args.archivos)}
+
+    # Una regla genérica declarada antes que una concreta tiene que ganar
+    orden = {"X": [(None, reglas_ast.PROC, "GENERICA"), ({"1"}, reglas_ast.PROC, "CONCRETA")]}
+    difs = reglas() + reglas(orden)
+    print(f"reglas '*': {'idénticas' if not difs else f'{len(difs)} diferencias'}")
+    for linea in difs:
+        print(f"    {linea}")
+    fallos = bool(difs)
+    for nombre, entradas in casos.items():
+        for variante, d in variantes(entradas()).items():
+            difs = comparar(d)
+            print(f"{nombre}{variante}: {'idénticas' if not difs else f'{len(difs)} diferencias'}")
+            for linea in difs:
+                print(f"    {linea}")
+            fallos += bool(difs)
+    sys.exit(1 if fallos else 0)
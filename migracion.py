@@ -1,83 +1,583 @@
 # PATH: migracion.py
 
-from src.config import ARCHIVOS
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import (
+    ARCHIVOS,
+    REGLAS_ASTERISCO,
+    TRAZA,
+    PERFIL_TAREAS,
+    VALIDAR_ESQUEMA,
+    EXTRACT_PARALELO,
+    FILAS_POR_BLOQUE,
+    GRAFO_ETAPAS,
+    GRAFO_PARALELO,
+    ORQUESTADOR_ASYNC,
+    REFERENCIAS_BD,
+    CACHE_ETAPAS_DIR,
+    LOTE_HISTORICOS,
+    LOTE_PARALELO,
+    FORMATO_EXPORT,
+    EXPORT_PARALELO,
+    EXPORT_DELTA,
+    BD_LOCAL,
+    ESTADO_INCREMENTAL,
+    BACKEND_TRANSFORM,
+    TRANSFORM_WORKERS,
+    BAJA_MEMORIA,
+    COLUMNAS_DEBUG,
+    PRIMER_ID_ANOT,
+    FECHA_VALIDACION,
+    ID_USUARIO_VALIDACION,
+    AGREGAR_ANOTACIONES,
+    INFORME_EJECUCION,
+    MEDIR_TRACEMALLOC,
+    PERFIL_ETAPA,
+    ENV,
+)
 from src.extract import (
+    TABLAS_BD,
+    load_entradas,
     load_tablas_bd,
-    load_historico,
+    load_asignaciones,
     load_maestro_modificaciones,
 )
+from src.incremental import (
+    firma_referencias,
+    seleccionar_pendientes,
+    anotaciones_retiradas,
+    registrar_emitidas,
+)
 from src.transform import (
     normaliza_columnas,
     limpia_idusuario,
     desglosa_proyecto,
     borrar_registros_usuarios_incorrectos,
-    tablas_auxiliares,
-    analizar_cargado_a,
     preparar_anotaciones,
     preparar_anotaciones_valid,  # Añadir esta importación
+    agregar_anotaciones,
 )
+from src.integridad import informe_integridad, validar_integridad
+from src.esquema import validar_entradas
 from src.export import crear_output_dir, exportar_dataframes
+from src.delta import exportar_delta
+from src import perfil_tareas
+from src.load import cargar_migracion
+from src.streaming import procesar_en_bloques
+from src.lotes import libros_historico, procesar_lote
+from src.particiones import procesar_particionado
+from src.utils.reglas_asterisco_tareas import (
+    cargar_reglas,
+    estadisticas_cache,
+    firma_reglas,
+)
+from src.utils import cache_excel, traza
+from src.utils.grafo import ejecutar, huella_ficheros, nodo
+from src.utils.medicion import etapa, medida, filas, iniciar, guardar
 
 
-def main() -> None:
-    # ------------- EXTRACCIÓN -------------
-    tablas_bd = load_tablas_bd(ARCHIVOS / "TABLAS_BD")
-    base, asign = load_historico(
-        ARCHIVOS / "20250512_Base datos historico IP Julen.xlsx"
-    )
-    maestro = load_maestro_modificaciones(
-        ARCHIVOS / "T_OBRAS_SUBIR_MAESTRO_MODIFICACIONES.xlsx"
+def _agregar(salidas: dict) -> dict:
+    """T_ANOTACIONES_SUBIR agregada por AGREGAR_ANOTACIONES y su VALID."""
+    with etapa("agregar_anotaciones", salidas["T_ANOTACIONES_SUBIR"]) as e:
+        anotaciones, procedencia = agregar_anotaciones(
+            salidas["T_ANOTACIONES_SUBIR"],
+            salidas["BASE_PROCESADA"],
+            AGREGAR_ANOTACIONES,
+        )
+        valid = preparar_anotaciones_valid(
+            anotaciones_subir=anotaciones,
+            base_trazada=procedencia,
+            fecha_validacion=FECHA_VALIDACION,
+            id_usuario_validacion=ID_USUARIO_VALIDACION,
+        )
+        e["filas_salida"] = filas(anotaciones)
+    print(f"Anotaciones agregadas: {len(procedencia)} → {len(anotaciones)} filas")
+    return {
+        **salidas,
+        "T_ANOTACIONES_SUBIR": anotaciones,
+        "T_ANOTACIONES_VALID_SUBIR": valid,
+        "PROCEDENCIA_AGREGACION": procedencia,
+    }
+
+
+def _exportar(salidas: dict) -> Path:
+    if AGREGAR_ANOTACIONES:
+        salidas = _agregar(salidas)
+    if traza.activa():
+        salidas = {**salidas, "TRAZA": traza.tabla()}
+    if PERFIL_TAREAS:
+        with etapa("perfil_tareas", salidas["BASE_PROCESADA"]):
+            perfil = perfil_tareas.perfil_tareas(salidas["BASE_PROCESADA"])
+        print(perfil_tareas.resumen(perfil))
+        salidas = {**salidas, "PERFIL_TAREAS": perfil}
+    output_dir = crear_output_dir(ARCHIVOS)
+    with etapa("exportar", salidas) as e:
+        informe = (exportar_delta if EXPORT_DELTA else exportar_dataframes)(
+            output_dir,
+            salidas,
+            formato=FORMATO_EXPORT,
+            paralelo=EXPORT_PARALELO,
+        )
+        e["bytes"] = int(informe["bytes"].sum())
+    print(informe.drop(columns="ruta").to_string(index=False))
+    _cargar_bd(salidas, output_dir)
+    return output_dir
+
+
+def _cargar_bd(salidas: dict, output_dir: Path) -> None:
+    # ------------- CARGA EN BD LOCAL (opcional) -------------
+    if BD_LOCAL is not None:
+        with etapa("cargar_bd", salidas):
+            print(
+                cargar_migracion(
+                    BD_LOCAL,
+                    salidas,
+                    ruta_log=output_dir / f"migration_{output_dir.name.removeprefix('output_')}.txt",
+                    # incremental: las filas modificadas llegan con IdAnot ya cargados
+                    actualizar=ESTADO_INCREMENTAL is not None,
+                )
+            )
+
+
+def _informe_ejecucion(output_dir: Path) -> None:
+    """Guarda el informe de etapas como output_{timestamp}_ejecucion.json."""
+    if not INFORME_EJECUCION:
+        return
+    ruta = guardar(
+        output_dir.with_name(f"{output_dir.name}_ejecucion.json"),
+        entorno=ENV,
+        salida=str(output_dir),
+        config={
+            "FILAS_POR_BLOQUE": FILAS_POR_BLOQUE,
+            "GRAFO_ETAPAS": GRAFO_ETAPAS,
+            "ORQUESTADOR_ASYNC": ORQUESTADOR_ASYNC,
+            "BACKEND_TRANSFORM": BACKEND_TRANSFORM,
+            "TRANSFORM_WORKERS": TRANSFORM_WORKERS,
+            "LOTE_HISTORICOS": LOTE_HISTORICOS,
+            "BAJA_MEMORIA": BAJA_MEMORIA,
+            "FORMATO_EXPORT": FORMATO_EXPORT,
+            "EXPORT_PARALELO": EXPORT_PARALELO,
+            "ESTADO_INCREMENTAL": ESTADO_INCREMENTAL,
+        },
+        cache_excel=cache_excel.estadisticas(),
+        cache_reglas=estadisticas_cache(),
     )
+    print(f"Informe de ejecución: {ruta}")
 
-    # ------------- TRANSFORMACIONES BÁSICAS -------------
-    base = (
+
+# ------------- NODOS DEL GRAFO DE ETAPAS (GRAFO_ETAPAS) -------------
+def _n_entradas(*, carpeta_bd: Path, historico: Path, maestro: Path, huella: str):
+    return load_entradas(carpeta_bd, historico, maestro)
+
+
+def _n_base(entradas):
+    _, base, _, _ = entradas
+    return (
         base.pipe(normaliza_columnas)
         .pipe(limpia_idusuario)
         .pipe(desglosa_proyecto)
         .pipe(borrar_registros_usuarios_incorrectos)
     )
 
-    # Auxiliares (usuarios/obras que faltan) -------------------------------
-    usuarios_subir, obras_subir = tablas_auxiliares(
-        base, tablas_bd["usuarios"], tablas_bd["obras"]
-    )
-
-    # Obras que aparecen en «CARGADO A» y no existen todavía --------------
-    cargado_a_subir = analizar_cargado_a(
-        base, tablas_bd["obras"], obras_subir
-    )
 
-    # ------------- GENERACIÓN T_ANOTACIONES_SUBIR -------------
-    anotaciones_subir, base_trazada = preparar_anotaciones(
+def _n_anotaciones(entradas, base, *, primer_id: int, baja_memoria: bool, depuracion: bool, reglas: str):
+    tablas_bd, _, asign, maestro = entradas
+    return preparar_anotaciones(
         base=base,
         asignaciones=asign,
         usuarios_bd=tablas_bd["usuarios"],
         maestro_obras=maestro,
         tareas_bd=tablas_bd["tareas"],
-        primer_id=47000,
+        primer_id=primer_id,
+        baja_memoria=baja_memoria,
+        depuracion=depuracion,
+    )
+
+
+def _n_auxiliares(entradas, base):
+    # Sin anotaciones: corre a la vez que la rama de anotaciones
+    return validar_integridad(base, entradas[0])
+
+
+def _n_valid(anotaciones, *, fecha_validacion: str, id_usuario_validacion: str):
+    anot, trazada = anotaciones
+    return preparar_anotaciones_valid(
+        anotaciones_subir=anot,
+        base_trazada=trazada,
+        fecha_validacion=fecha_validacion,
+        id_usuario_validacion=id_usuario_validacion,
     )
+
+
+def _n_informe(entradas, auxiliares, anotaciones):
+    informe_base = auxiliares[3]
+    informe_anot = informe_integridad(entradas[0], auxiliares[1], anotaciones=anotaciones[0])
+    return pd.concat([informe_base, informe_anot], ignore_index=True)
+
+
+def _salidas_grafo(historico: Path, ruta_maestro: Path) -> dict:
+    """
+    Mismas salidas que el recorrido normal, resueltas con el grafo de
+    etapas: solo se recalculan los nodos cuya entrada, parámetros o
+    código han cambiado desde la última ejecución.
+    """
+    carpeta_bd = ARCHIVOS / "TABLAS_BD"
+    nodos = {
+        "entradas": nodo(
+            _n_entradas,
+            cache=False,     # ya hay caché por libro (cache_excel)
+            carpeta_bd=carpeta_bd,
+            historico=historico,
+            maestro=ruta_maestro,
+            huella=huella_ficheros(
+                *(carpeta_bd / f for f in TABLAS_BD.values()), historico, ruta_maestro
+            ),
+        ),
+        "base": nodo(_n_base, "entradas"),
+        "anotaciones": nodo(
+            _n_anotaciones, "entradas", "base",
+            primer_id=PRIMER_ID_ANOT,
+            baja_memoria=BAJA_MEMORIA,
+            depuracion=COLUMNAS_DEBUG,
+            reglas=firma_reglas(),
+        ),
+        "auxiliares": nodo(_n_auxiliares, "entradas", "base"),
+        "valid": nodo(
+            _n_valid, "anotaciones",
+            fecha_validacion=FECHA_VALIDACION,
+            id_usuario_validacion=ID_USUARIO_VALIDACION,
+        ),
+        "informe": nodo(_n_informe, "entradas", "auxiliares", "anotaciones"),
+    }
+    with etapa("grafo") as e:
+        r, registro = ejecutar(
+            nodos,
+            salidas=["auxiliares", "anotaciones", "valid", "informe"],
+            paralelo=GRAFO_PARALELO,
+            # con traza o perfil las etapas deben ejecutarse para medirlas
+            cache_dir=None if traza.activa() or PERFIL_TAREAS else CACHE_ETAPAS_DIR,
+        )
+        e["nodos"] = registro.to_dict("records")
+    print(registro.to_string(index=False))
+
+    usuarios_subir, obras_subir, cargado_a_subir, _ = r["auxiliares"]
+    anotaciones_subir, base_trazada = r["anotaciones"]
+    # Las anotaciones pueden venir de caché: FCREA/FMODIFI de esta ejecución
+    ahora = datetime.now()
+    anotaciones_subir = anotaciones_subir.assign(FCREA=ahora, FMODIFI=ahora)
+    return {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        "T_ANOTACIONES_SUBIR": anotaciones_subir,
+        "T_ANOTACIONES_VALID_SUBIR": r["valid"],
+        "BASE_PROCESADA": base_trazada,
+        "INFORME_INTEGRIDAD": r["informe"],
+    }
+
+
+def _ejecutar_async(historico: Path, ruta_maestro: Path) -> Path:
+    """
+    Recorrido con src/asincrono.py. Cada tabla se escribe en cuanto está
+    lista, salvo que la exportación necesite todas (delta, agregación,
+    perfil, traza): entonces se exporta al final como siempre.
+    """
+    from src import asincrono
+
+    al_vuelo = not (EXPORT_DELTA or AGREGAR_ANOTACIONES or PERFIL_TAREAS or traza.activa())
+    output_dir = crear_output_dir(ARCHIVOS) if al_vuelo else None
+    with etapa("asincrono") as e:
+        salidas, informe, registro = asincrono.ejecutar(
+            ARCHIVOS / "TABLAS_BD",
+            historico,
+            ruta_maestro,
+            output_dir=output_dir,
+            formato=FORMATO_EXPORT,
+            primer_id=PRIMER_ID_ANOT,
+            fecha_validacion=FECHA_VALIDACION,
+            id_usuario_validacion=ID_USUARIO_VALIDACION,
+            baja_memoria=BAJA_MEMORIA,
+            depuracion=COLUMNAS_DEBUG,
+        )
+        e["filas_salida"] = filas(salidas)
+        e["tareas"] = registro.to_dict("records")
+        if al_vuelo:
+            e["bytes"] = int(informe["bytes"].sum())
+    print(registro.to_string(index=False))
+    print(salidas["INFORME_INTEGRIDAD"].to_string(index=False))
+
+    if not al_vuelo:
+        return _exportar(salidas)
+    print(informe.drop(columns="ruta").to_string(index=False))
+    _cargar_bd(salidas, output_dir)
+    return output_dir
+
+
+def _salidas_polars(base, asign, tablas_bd: dict, maestro) -> dict:
+    """Transformaciones con el backend Polars (un solo plan perezoso)."""
+    from src import transform_polars
+
+    if traza.activa():
+        print("Aviso: la traza de filas solo se captura con BACKEND_TRANSFORM = 'pandas'")
+    with etapa("transform_polars", base) as e:
+        r = transform_polars.ejecutar(
+            base,
+            asignaciones=asign,
+            usuarios_bd=tablas_bd["usuarios"],
+            maestro_obras=maestro,
+            tareas_bd=tablas_bd["tareas"],
+            primer_id=PRIMER_ID_ANOT,
+            depuracion=COLUMNAS_DEBUG,
+            fecha_validacion=FECHA_VALIDACION,
+            id_usuario_validacion=ID_USUARIO_VALIDACION,
+        )
+        e["filas_salida"] = filas(r)
+    print(f"Caché reglas '*': {estadisticas_cache()}")
+
+    with etapa("validar_integridad", r["base"]) as e:
+        usuarios_subir, obras_subir, cargado_a_subir, informe = validar_integridad(
+            r["base"], tablas_bd, r["anotaciones"]
+        )
+        e["filas_salida"] = filas([usuarios_subir, obras_subir, cargado_a_subir])
+    return {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        "T_ANOTACIONES_SUBIR": r["anotaciones"],
+        "T_ANOTACIONES_VALID_SUBIR": r["valid"],
+        "BASE_PROCESADA": r["trazada"],
+        "INFORME_INTEGRIDAD": informe,
+    }
+
+
+def main() -> None:
+    if BACKEND_TRANSFORM not in ("pandas", "polars"):
+        raise ValueError(f"BACKEND_TRANSFORM desconocido: {BACKEND_TRANSFORM!r}")
+    if AGREGAR_ANOTACIONES and ESTADO_INCREMENTAL is not None:
+        raise ValueError("AGREGAR_ANOTACIONES no es compatible con ESTADO_INCREMENTAL")
+    if LOTE_HISTORICOS is not None and ESTADO_INCREMENTAL is not None:
+        raise ValueError("LOTE_HISTORICOS no es compatible con ESTADO_INCREMENTAL")
+    if FILAS_POR_BLOQUE and ESTADO_INCREMENTAL is not None:
+        raise ValueError("FILAS_POR_BLOQUE no es compatible con ESTADO_INCREMENTAL")
+    iniciar(perfil_etapa=PERFIL_ETAPA, tracemalloc_=MEDIR_TRACEMALLOC)
+
+    # ------------- REGLAS '*' EXTERNAS (opcional) -------------
+    if REGLAS_ASTERISCO.exists():
+        with etapa("reglas_asterisco"):
+            n_reglas = cargar_reglas(REGLAS_ASTERISCO)
+        print(f"Reglas '*' cargadas desde {REGLAS_ASTERISCO.name}: {n_reglas}")
+
+    # ------------- TRAZA DE FILAS (opcional) -------------
+    traza.fijar_filtro(None)
+    perfil_tareas.activar(PERFIL_TAREAS)
+    if TRAZA.exists():
+        print(f"Traza de filas desde {TRAZA.name}: {traza.cargar_filtro(TRAZA)} valores")
+
+    historico = ARCHIVOS / "20250512_Base datos historico IP Julen.xlsx"
+    ruta_maestro = ARCHIVOS / "T_OBRAS_SUBIR_MAESTRO_MODIFICACIONES.xlsx"
+
+    # ------------- ESQUEMA DE ENTRADAS (solo cabeceras, falla pronto) -------------
+    if VALIDAR_ESQUEMA:
+        with etapa("validar_esquema") as e:
+            e["libros"] = validar_entradas(
+                ARCHIVOS / "TABLAS_BD",
+                libros_historico(LOTE_HISTORICOS) if LOTE_HISTORICOS is not None else historico,
+                ruta_maestro,
+                paralelo=EXTRACT_PARALELO,
+            )
+
+    # ------------- MODO LOTE (varios históricos) -------------
+    if LOTE_HISTORICOS is not None:
+        with etapa("procesar_lote") as e:
+            salidas = procesar_lote(
+                libros_historico(LOTE_HISTORICOS),
+                tablas_bd=load_tablas_bd(ARCHIVOS / "TABLAS_BD"),
+                maestro_obras=load_maestro_modificaciones(ruta_maestro),
+                primer_id=PRIMER_ID_ANOT,
+                fecha_validacion=FECHA_VALIDACION,
+                id_usuario_validacion=ID_USUARIO_VALIDACION,
+                paralelo=LOTE_PARALELO,
+                baja_memoria=BAJA_MEMORIA,
+                depuracion=COLUMNAS_DEBUG,
+                referencias_bd=REFERENCIAS_BD,
+            )
+            e["filas_salida"] = filas(salidas)
+        print(salidas["RESUMEN_LOTE"].to_string(index=False))
+        _informe_ejecucion(_exportar(salidas))
+        return
+
+    # ------------- MODO POR BLOQUES (históricos grandes) -------------
+    if FILAS_POR_BLOQUE:
+        # Cada bloque se escribe al vuelo salvo que la exportación necesite
+        # las tablas enteras (delta, agregación, perfil, traza, carga en BD)
+        al_vuelo = not (
+            EXPORT_DELTA or AGREGAR_ANOTACIONES or PERFIL_TAREAS or traza.activa()
+            or BD_LOCAL is not None
+        )
+        output_dir = crear_output_dir(ARCHIVOS) if al_vuelo else None
+        with etapa("procesar_en_bloques") as e:
+            salidas, informe = procesar_en_bloques(
+                historico,
+                asignaciones=load_asignaciones(historico),
+                tablas_bd=load_tablas_bd(ARCHIVOS / "TABLAS_BD"),
+                maestro_obras=load_maestro_modificaciones(ruta_maestro),
+                primer_id=PRIMER_ID_ANOT,
+                fecha_validacion=FECHA_VALIDACION,
+                id_usuario_validacion=ID_USUARIO_VALIDACION,
+                filas_por_bloque=FILAS_POR_BLOQUE,
+                baja_memoria=BAJA_MEMORIA,
+                depuracion=COLUMNAS_DEBUG,
+                output_dir=output_dir,
+                formato=FORMATO_EXPORT,
+            )
+            if al_vuelo:
+                e["filas_salida"] = dict(zip(informe["tabla"], informe["filas"].tolist()))
+                e["bytes"] = int(informe["bytes"].sum())
+            else:
+                e["filas_salida"] = filas(salidas)
+        print(salidas["INFORME_INTEGRIDAD"].to_string(index=False))
+        if not al_vuelo:
+            _informe_ejecucion(_exportar(salidas))
+            return
+        print(informe.drop(columns="ruta").to_string(index=False))
+        _informe_ejecucion(output_dir)
+        return
+
+    # ------------- GRAFO DE ETAPAS (resultados intermedios en caché) -------------
+    if GRAFO_ETAPAS and ESTADO_INCREMENTAL is None:
+        salidas = _salidas_grafo(historico, ruta_maestro)
+        print(salidas["INFORME_INTEGRIDAD"].to_string(index=False))
+        _informe_ejecucion(_exportar(salidas))
+        return
+
+    # ------------- ASYNCIO (extracción / transformación / exportación solapadas) -------------
+    if ORQUESTADOR_ASYNC and ESTADO_INCREMENTAL is None and BACKEND_TRANSFORM == "pandas":
+        _informe_ejecucion(_ejecutar_async(historico, ruta_maestro))
+        return
+
+    # ------------- EXTRACCIÓN -------------
+    with etapa("extraccion") as e:
+        tablas_bd, base, asign, maestro = load_entradas(
+            ARCHIVOS / "TABLAS_BD", historico, ruta_maestro
+        )
+        e["filas_salida"] = filas({"base": base, "asignaciones": asign, "maestro": maestro})
+    print(f"Caché Excel: {cache_excel.estadisticas()}")
+
+    # ------------- BACKEND POLARS (sin modo incremental) -------------
+    if BACKEND_TRANSFORM == "polars" and ESTADO_INCREMENTAL is None:
+        salidas = _salidas_polars(base, asign, tablas_bd, maestro)
+        print(salidas["INFORME_INTEGRIDAD"].to_string(index=False))
+        _informe_ejecucion(_exportar(salidas))
+        return
+
+    # ------------- ETAPAS POR FILAS EN PARALELO (tramos de la base) -------------
+    if TRANSFORM_WORKERS and ESTADO_INCREMENTAL is None:
+        with etapa("procesar_particionado", base) as e:
+            salidas = procesar_particionado(
+                base,
+                asignaciones=asign,
+                tablas_bd=tablas_bd,
+                maestro_obras=maestro,
+                primer_id=PRIMER_ID_ANOT,
+                fecha_validacion=FECHA_VALIDACION,
+                id_usuario_validacion=ID_USUARIO_VALIDACION,
+                workers=TRANSFORM_WORKERS,
+                baja_memoria=BAJA_MEMORIA,
+                depuracion=COLUMNAS_DEBUG,
+            )
+            e["filas_salida"] = filas(salidas)
+        print(salidas["INFORME_INTEGRIDAD"].to_string(index=False))
+        _informe_ejecucion(_exportar(salidas))
+        return
+
+    # ------------- TRANSFORMACIONES BÁSICAS -------------
+    columnas_origen = list(normaliza_columnas(base.iloc[:0]).columns)
+    base = (
+        base.pipe(medida(normaliza_columnas))
+        .pipe(medida(limpia_idusuario))
+        .pipe(medida(desglosa_proyecto))
+        .pipe(medida(borrar_registros_usuarios_incorrectos))
+    )
+
+    # ------------- INCREMENTAL: solo filas nuevas / modificadas -------------
+    primer_id, ids_existentes = PRIMER_ID_ANOT, None
+    if ESTADO_INCREMENTAL is not None:
+        firma = firma_referencias(
+            asign,
+            maestro,
+            tablas_bd["usuarios"],
+            tablas_bd["tareas"],
+            extra=firma_reglas(),
+        )
+        with etapa("seleccionar_pendientes", base) as e:
+            base, ids_existentes, primer_id, desaparecidas = seleccionar_pendientes(
+                base, ESTADO_INCREMENTAL, firma, columnas_origen, primer_id
+            )
+            e["filas_salida"] = filas(base)
+
+    # ------------- GENERACIÓN T_ANOTACIONES_SUBIR -------------
+    with etapa("preparar_anotaciones", base) as e:
+        anotaciones_subir, base_trazada = preparar_anotaciones(
+            base=base,
+            asignaciones=asign,
+            usuarios_bd=tablas_bd["usuarios"],
+            maestro_obras=maestro,
+            tareas_bd=tablas_bd["tareas"],
+            primer_id=primer_id,
+            ids_existentes=ids_existentes,
+            baja_memoria=BAJA_MEMORIA,
+            depuracion=COLUMNAS_DEBUG,
+        )
+        e["filas_salida"] = filas(anotaciones_subir)
+    print(f"Caché reglas '*': {estadisticas_cache()}")
+
+    # ------------- INTEGRIDAD REFERENCIAL (auxiliares + informe) -------------
+    with etapa("validar_integridad", base) as e:
+        usuarios_subir, obras_subir, cargado_a_subir, informe_integridad = (
+            validar_integridad(base, tablas_bd, anotaciones_subir)
+        )
+        e["filas_salida"] = filas([usuarios_subir, obras_subir, cargado_a_subir])
+    print(informe_integridad.to_string(index=False))
     
     # ------------- GENERACIÓN T_ANOTACIONES_VALID_SUBIR -------------
-    anotaciones_valid_subir = preparar_anotaciones_valid(
-        anotaciones_subir=anotaciones_subir,
-        base_trazada=base_trazada,
-        fecha_validacion="15/05/2025",
-        id_usuario_validacion="18287"
-    )
+    with etapa("preparar_anotaciones_valid", anotaciones_subir) as e:
+        anotaciones_valid_subir = preparar_anotaciones_valid(
+            anotaciones_subir=anotaciones_subir,
+            base_trazada=base_trazada,
+            fecha_validacion=FECHA_VALIDACION,
+            id_usuario_validacion=ID_USUARIO_VALIDACION
+        )
+        e["filas_salida"] = filas(anotaciones_valid_subir)
+
+    salidas = {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        "T_ANOTACIONES_SUBIR": anotaciones_subir,
+        "T_ANOTACIONES_VALID_SUBIR": anotaciones_valid_subir,  # Añadir esta línea
+        "BASE_PROCESADA": base_trazada,          # ← ya incluye IdAnot
+        "INFORME_INTEGRIDAD": informe_integridad,
+    }
+    # ------------- INCREMENTAL: IdAnot emitidos que hay que retirar -------------
+    if ESTADO_INCREMENTAL is not None:
+        salidas["T_ANOTACIONES_BORRAR"] = anotaciones_retiradas(
+            desaparecidas, ids_existentes, base_trazada
+        )
+        print(f"Incremental: {len(salidas['T_ANOTACIONES_BORRAR'])} IdAnot a retirar")
 
     # ------------- EXPORT -------------
-    output_dir = crear_output_dir(ARCHIVOS)
-    exportar_dataframes(
-        output_dir,
-        {
-            "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
-            "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
-            "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
-            "T_ANOTACIONES_SUBIR": anotaciones_subir,
-            "T_ANOTACIONES_VALID_SUBIR": anotaciones_valid_subir,  # Añadir esta línea
-            "BASE_PROCESADA": base_trazada,          # ← ya incluye IdAnot
-        },
-    )
+    output_dir = _exportar(salidas)
+
+    if ESTADO_INCREMENTAL is not None:
+        with etapa("registrar_emitidas", base):
+            registrar_emitidas(
+                ESTADO_INCREMENTAL, base, base_trazada, firma, desaparecidas
+            )
+
+    _informe_ejecucion(output_dir)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,238 @@
+# PATH: src/asincrono.py
+
+"""
+Ejecución con asyncio: extracción, transformación y exportación solapadas.
+
+Cada libro se lee en su propio proceso y cada etapa espera solo lo que
+necesita:
+
+    historico ─► base ─┬─► auxiliares ────────────────┬─► informe
+    T_USUARIOS/T_OBRAS ┘                              │
+    maestro, T_TAREAS ─────► anotaciones ─► valid     │
+                                  └───────────────────┘
+
+La base se normaliza en cuanto llega la hoja del histórico, sin esperar
+a T_* ni al maestro, y cada tabla terminada se escribe (en un proceso
+del pool) mientras las demás se siguen calculando. Las transformaciones
+van a un pool de hilos; las lecturas de Excel y las escrituras, a un
+pool de procesos. El tiempo total tiende al camino crítico (histórico →
+base → anotaciones → valid → escritura) en lugar de a la suma de etapas.
+
+El registro devuelto tiene una fila por tarea con su inicio y fin
+relativos, para ver qué se ha solapado.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import (
+    EXTRACT_PARALELO,
+    FECHA_VALIDACION,
+    ID_USUARIO_VALIDACION,
+    PRIMER_ID_ANOT,
+    REFERENCIAS_BD,
+)
+from src.export import _exportar_uno
+from src.extract import HOJAS_HISTORICO, TABLAS_BD, _leer_libro, load_tablas_bd
+from src.integridad import informe_integridad, validar_integridad
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.utils import cache_excel
+
+
+def _normalizar(base: pd.DataFrame) -> pd.DataFrame:
+    return (
+        base.pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+
+
+class _Runner:
+    """Estado de una ejecución: pools, registro de tareas e informe de escritura."""
+
+    def __init__(self, procesos: Executor, hilos: Executor, output_dir, formato):
+        self.procesos, self.hilos = procesos, hilos
+        self.output_dir, self.formato = output_dir, formato
+        self.inicio = time.perf_counter()
+        self.registro: list[dict] = []
+        self.escrituras: list[asyncio.Task] = []
+
+    async def en(self, pool: Executor, nombre: str, func, *args, **kwargs):
+        """Ejecuta func(*args, **kwargs) en *pool* y lo anota en el registro."""
+        desde = time.perf_counter() - self.inicio
+        resultado = await asyncio.get_running_loop().run_in_executor(
+            pool, partial(func, *args, **kwargs)
+        )
+        hasta = time.perf_counter() - self.inicio
+        self.registro.append(
+            {"tarea": nombre, "inicio": round(desde, 3), "fin": round(hasta, 3),
+             "segundos": round(hasta - desde, 3)}
+        )
+        return resultado
+
+    async def leer(self, nombre: str, ruta: Path, hojas: list[str] | None = None):
+        datos, contadores = await self.en(self.procesos, f"leer {nombre}", _leer_libro, ruta, hojas)
+        cache_excel.sumar_contadores(contadores)
+        return datos
+
+    def escribir(self, tablas: dict[str, pd.DataFrame]) -> None:
+        """Lanza la escritura de cada tabla sin esperarla (si hay carpeta de salida)."""
+        if self.output_dir is None:
+            return
+        formato = self.formato
+        for nombre, df in tablas.items():
+            self.escrituras.append(asyncio.create_task(self.en(
+                self.procesos, f"escribir {nombre}", _exportar_uno, nombre, df, self.output_dir,
+                formato.get(nombre, "xlsx") if isinstance(formato, dict) else formato,
+            )))
+
+
+async def _de(t_todas: asyncio.Task, clave: str) -> pd.DataFrame:
+    return (await t_todas)[clave]
+
+
+async def _ejecutar(
+    r: _Runner,
+    carpeta_bd: Path,
+    historico: Path,
+    maestro: Path,
+    *,
+    primer_id: int,
+    fecha_validacion: str,
+    id_usuario_validacion: str,
+    baja_memoria: bool,
+    depuracion: bool,
+) -> tuple[list[dict], dict[str, pd.DataFrame]]:
+    # ---------- lecturas: todas lanzadas de inmediato ----------
+    t_historico = asyncio.create_task(r.leer("historico", historico, HOJAS_HISTORICO))
+    t_maestro = asyncio.create_task(r.leer("maestro", maestro))
+    if REFERENCIAS_BD is None:
+        t_tablas = {
+            clave: asyncio.create_task(r.leer(clave, Path(carpeta_bd) / fichero))
+            for clave, fichero in TABLAS_BD.items()
+        }
+    else:
+        t_todas = asyncio.create_task(r.en(r.hilos, "referencias", load_tablas_bd, carpeta_bd))
+        t_tablas = {
+            clave: asyncio.create_task(_de(t_todas, clave)) for clave in TABLAS_BD
+        }
+
+    # ---------- base: solo necesita el histórico ----------
+    hojas = await t_historico
+    base = await r.en(r.hilos, "normalizar base", _normalizar, hojas["Base Datos"])
+
+    async def auxiliares():
+        tablas_bd = {"usuarios": await t_tablas["usuarios"], "obras": await t_tablas["obras"]}
+        # Copia superficial: preparar_anotaciones puede añadir columnas a la suya
+        usuarios, obras, cargado_a, informe = await r.en(
+            r.hilos, "auxiliares", validar_integridad, base.copy(deep=False), tablas_bd
+        )
+        r.escribir({
+            "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios,
+            "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras,
+            "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a,
+        })
+        return usuarios, obras, cargado_a, informe
+
+    async def anotaciones():
+        anot, trazada = await r.en(
+            r.hilos, "anotaciones", preparar_anotaciones,
+            base=base.copy(deep=False),
+            asignaciones=hojas["asignaciones_tareas"],
+            usuarios_bd=await t_tablas["usuarios"],
+            maestro_obras=await t_maestro,
+            tareas_bd=await t_tablas["tareas"],
+            primer_id=primer_id,
+            baja_memoria=baja_memoria,
+            depuracion=depuracion,
+        )
+        r.escribir({"T_ANOTACIONES_SUBIR": anot, "BASE_PROCESADA": trazada})
+        valid = await r.en(
+            r.hilos, "valid", preparar_anotaciones_valid,
+            anotaciones_subir=anot,
+            base_trazada=trazada,
+            fecha_validacion=fecha_validacion,
+            id_usuario_validacion=id_usuario_validacion,
+        )
+        r.escribir({"T_ANOTACIONES_VALID_SUBIR": valid})
+        return anot, trazada, valid
+
+    (usuarios, obras, cargado_a, informe_base), (anot, trazada, valid) = await asyncio.gather(
+        auxiliares(), anotaciones()
+    )
+
+    # ---------- informe: claves de las anotaciones (tareas, procesos) ----------
+    tablas_bd = {clave: await t for clave, t in t_tablas.items()}
+    informe_anot = await r.en(
+        r.hilos, "informe", informe_integridad, tablas_bd, obras, anotaciones=anot
+    )
+    informe = pd.concat([informe_base, informe_anot], ignore_index=True)
+    r.escribir({"INFORME_INTEGRIDAD": informe})
+    informe_escritura = await asyncio.gather(*r.escrituras)
+
+    return informe_escritura, {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a,
+        "T_ANOTACIONES_SUBIR": anot,
+        "T_ANOTACIONES_VALID_SUBIR": valid,
+        "BASE_PROCESADA": trazada,
+        "INFORME_INTEGRIDAD": informe,
+    }
+
+
+def ejecutar(
+    carpeta_bd: Path,
+    historico: Path,
+    maestro: Path,
+    *,
+    output_dir: Path | None = None,
+    formato: str | dict[str, str] = "xlsx",
+    primer_id: int = PRIMER_ID_ANOT,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+    baja_memoria: bool = False,
+    depuracion: bool = True,
+) -> tuple[dict[str, pd.DataFrame], pd.DataFrame, pd.DataFrame]:
+    """
+    Recorrido completo (las mismas tablas que `migracion.main`). Con
+    *output_dir* cada tabla se escribe en cuanto está lista.
+
+    Devuelve (salidas, informe de escritura como el de
+    `exportar_dataframes` o vacío, registro de tareas).
+    """
+    workers = os.cpu_count() or 1
+    procesos = (
+        ProcessPoolExecutor(max_workers=workers) if EXTRACT_PARALELO
+        else ThreadPoolExecutor(max_workers=1)
+    )
+    with procesos, ThreadPoolExecutor(max_workers=max(2, workers)) as hilos:
+        r = _Runner(procesos, hilos, output_dir, formato)
+        informe, salidas = asyncio.run(
+            _ejecutar(
+                r, carpeta_bd, historico, maestro,
+                primer_id=primer_id,
+                fecha_validacion=fecha_validacion,
+                id_usuario_validacion=id_usuario_validacion,
+                baja_memoria=baja_memoria,
+                depuracion=depuracion,
+            )
+        )
+    registro = pd.DataFrame(r.registro).sort_values("inicio", kind="stable", ignore_index=True)
+    return salidas, pd.DataFrame(informe), registro
@@ -5,5 +5,98 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parents[1]
 ARCHIVOS = BASE_DIR / "archivos"
 
+# Reglas de asignación de '*' (opcional; si no existe se usan las del código)
+REGLAS_ASTERISCO = ARCHIVOS / "reglas_asterisco_tareas.csv"
+
+# Traza de filas (opcional; sin fichero no se traza): CSV ';' con columnas
+# campo;valor (campo = actividad | chapa | obra) → tabla TRAZA en la salida
+TRAZA = ARCHIVOS / "traza_filas.csv"
+
+# Tabla PERFIL_TAREAS en la salida (src/perfil_tareas.py): filas, horas y
+# tiempo de cada regla '*' y cada asignación, y lo que queda sin CodTarea
+PERFIL_TAREAS = False
+
+# Caché columnar de las hojas Excel de entrada (ver src/utils/cache_excel.py)
+CACHE_EXCEL = True
+CACHE_DIR = BASE_DIR / ".cache" / "excel"
+
+# Lectura de los libros de entrada en paralelo (un proceso por libro)
+EXTRACT_PARALELO = True
+
+# Almacén SQLite indexado de T_USUARIOS / T_OBRAS / T_PROCESOS / T_TAREAS
+# (src/referencias.py), reconstruido solo si cambia TABLAS_BD; None → Excel
+REFERENCIAS_BD = None        # p.ej. BASE_DIR / ".cache" / "referencias.sqlite"
+
+# Comprobar hojas, cabeceras y tipos de las entradas (src/esquema.py) leyendo
+# solo las primeras filas, antes de cargar ningún libro entero
+VALIDAR_ESQUEMA = True
+
+# Nº de filas por bloque para leer «Base Datos» en modo streaming
+# (None → se carga la hoja entera, comportamiento clásico). No compatible
+# con el modo incremental
+FILAS_POR_BLOQUE = None
+
+# Grafo de etapas con resultados intermedios en caché (src/utils/grafo.py):
+# solo se recalcula lo que depende de lo que ha cambiado
+GRAFO_ETAPAS = False
+GRAFO_PARALELO = True
+CACHE_ETAPAS_DIR = BASE_DIR / ".cache" / "etapas"
+
+# Extracción, transformación y exportación solapadas con asyncio
+# (src/asincrono.py); sin modo incremental y con el backend pandas
+ORQUESTADOR_ASYNC = False
+
+# Modo lote: carpeta (o lista) de libros históricos, uno por departamento /
+# periodo, procesados en paralelo (None → solo el histórico de main).
+# No compatible con el modo incremental
+LOTE_HISTORICOS = None       # p.ej. ARCHIVOS / "historicos"
+LOTE_PARALELO = True
+
+# Modo incremental: fichero SQLite con el estado de filas ya emitidas y la
+# marca de agua de IdAnot (None → se procesa y numera todo el histórico);
+# los IdAnot de filas que desaparecen salen en T_ANOTACIONES_BORRAR
+ESTADO_INCREMENTAL = None    # p.ej. ARCHIVOS / "estado_incremental.sqlite"
+
+# Etapas por filas de un solo histórico repartidas en tramos entre este nº
+# de procesos (src/particiones.py), mismos IdAnot; None → en serie
+TRANSFORM_WORKERS = None     # p.ej. os.cpu_count()
+
+# Backend de las transformaciones: "pandas" | "polars" (src/transform_polars.py,
+# requiere polars; el modo incremental usa siempre pandas)
+BACKEND_TRANSFORM = "pandas"
+
+# Primer IdAnot de T_ANOTACIONES_SUBIR (ejecución completa; el modo
+# incremental sigue desde su marca de agua)
+PRIMER_ID_ANOT = 47000
+# Fecha y usuario de validación de T_ANOTACIONES_VALID_SUBIR
+FECHA_VALIDACION = "15/05/2025"
+ID_USUARIO_VALIDACION = "18287"
+
+# Maestro / anotaciones sin copias intermedias del DataFrame base
+BAJA_MEMORIA = False
+# Columnas DBG_* (valores originales) en T_ANOTACIONES_SUBIR y BASE_PROCESADA
+COLUMNAS_DEBUG = True
+
+# Agregar T_ANOTACIONES_SUBIR sumando CHoras por estas columnas antes de
+# exportar (+ tabla PROCEDENCIA_AGREGACION); None → una fila por línea.
+# No compatible con el modo incremental (los IdAnot dejan de ser estables)
+AGREGAR_ANOTACIONES = None   # p.ej. ["Idusuario", "FAnotacion", "ClaveObra", "CodTarea", "NPlano"]
+
+# Exportación: "xlsx" | "xlsx_stream" | "csv" | "parquet", o {tabla: formato}
+FORMATO_EXPORT = "xlsx"
+EXPORT_PARALELO = True
+# Solo diferencias frente a la última salida (src/delta.py): tablas sin
+# cambios se omiten y las que cambian van como insert / update / delete
+EXPORT_DELTA = False
+
+# Carga directa en base de datos local (SQLite) tras exportar; None → no
+BD_LOCAL = None              # p.ej. ARCHIVOS / "ip_tareas.sqlite"
+
+# Informe JSON por etapa (tiempo, CPU, memoria, filas) junto a la carpeta
+# de salida; tracemalloc da el pico por etapa pero ralentiza la ejecución
+INFORME_EJECUCION = True
+MEDIR_TRACEMALLOC = False
+PERFIL_ETAPA = None          # p.ej. "preparar_anotaciones" → volcado cProfile
+
 # Dev / prod con un solo flag externo
 ENV = "dev"                  # cambiar a "prod" en despliegue
@@ -0,0 +1,218 @@
+# PATH: src/delta.py
+
+"""
+Exportación delta frente a la última salida.
+
+Cada tabla se resume en una huella por fila (hash de sus valores) y una
+huella de tabla; se comparan con las de la salida anterior (la última
+carpeta output_* con MANIFIESTO.json) y solo se escribe lo que cambia:
+
+    • tabla igual                → no se escribe nada ("sin cambios"),
+    • tabla con clave (`CLAVES`) → {tabla}__insert / __update (filas
+      completas) y {tabla}__delete (solo la clave), cada uno si no vacío,
+    • tabla sin clave, con columnas distintas o sin salida anterior
+      → la tabla entera ("completa").
+
+Las columnas de `VOLATILES` (marca de tiempo de la ejecución, tiempos
+de PERFIL_TAREAS) no entran en la huella. MANIFIESTO.json recoge la huella, filas y ficheros de cada
+tabla, y huellas_filas.pkl las huellas por fila, siempre completas, que
+usará la siguiente ejecución.
+
+Los IdAnot se numeran por posición, así que una fila nueva en medio del
+histórico renumera las siguientes; con ESTADO_INCREMENTAL son estables y
+el delta queda en las filas realmente nuevas o modificadas.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.export import ESCRITORES, exportar_dataframes
+
+MANIFIESTO = "MANIFIESTO.json"
+HUELLAS = "huellas_filas.pkl"
+
+# Clave de fila por tabla (las demás tablas se reescriben enteras si cambian)
+CLAVES = {
+    "T_ANOTACIONES_SUBIR": ["IdAnot"],
+    "T_ANOTACIONES_VALID_SUBIR": ["IdAnot"],
+    "BASE_PROCESADA": ["IdAnot"],
+    "PROCEDENCIA_AGREGACION": ["IdAnotOrigen"],
+    "AUX_USUARIOS_SUBIR_DEBE_CONTENER": ["idusuario"],
+    "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": ["ClaveObra"],
+    "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": ["ClaveObra"],
+}
+VOLATILES = ["FCREA", "FMODIFI", "segundos"]
+
+_HUELLA = "_huella"
+
+
+def salida_anterior(output_dir: Path) -> Path | None:
+    """Última carpeta output_* anterior a *output_dir* con manifiesto."""
+    previas = sorted(
+        p for p in output_dir.parent.glob("output_*")
+        if p.name < output_dir.name and (p / MANIFIESTO).exists()
+    )
+    return previas[-1] if previas else None
+
+
+def huellas_filas(df: pd.DataFrame) -> pd.Series:
+    """Hash (uint64) de los valores de cada fila, sin `VOLATILES`."""
+    columnas = [c for c in df.columns if c not in VOLATILES]
+    return pd.util.hash_pandas_object(df[columnas], index=False)
+
+
+def _huella_tabla(df: pd.DataFrame, filas: pd.Series) -> str:
+    h = hashlib.sha256(repr([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(filas.to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _leer_anterior(anterior: Path | None) -> tuple[dict, dict]:
+    if anterior is None:
+        return {}, {}
+    manifiesto = json.loads((anterior / MANIFIESTO).read_text(encoding="utf-8"))
+    ruta = anterior / HUELLAS
+    return manifiesto["tablas"], pd.read_pickle(ruta) if ruta.exists() else {}
+
+
+def _comparar(
+    df: pd.DataFrame, clave: list[str], actual: pd.DataFrame, previas: pd.DataFrame
+) -> dict[str, pd.DataFrame]:
+    """Filas insertadas / modificadas (completas) y borradas (solo clave)."""
+    cruce = actual.reset_index().merge(
+        previas, how="outer", on=clave, suffixes=("", "_anterior"), indicator=True
+    )
+    nuevas = cruce["_merge"] == "left_only"
+    cambian = (cruce["_merge"] == "both") & (cruce[_HUELLA] != cruce[f"{_HUELLA}_anterior"])
+    borradas = cruce["_merge"] == "right_only"
+    return {
+        "insert": df.iloc[np.sort(cruce.loc[nuevas, "posicion"].to_numpy(dtype=int))],
+        "update": df.iloc[np.sort(cruce.loc[cambian, "posicion"].to_numpy(dtype=int))],
+        "delete": cruce.loc[borradas, clave].reset_index(drop=True),
+    }
+
+
+def exportar_delta(
+    output_dir: Path,
+    archivos: dict[str, pd.DataFrame],
+    formato: str | dict[str, str] = "xlsx",
+    paralelo: bool = False,
+    anterior: Path | None = None,
+) -> pd.DataFrame:
+    """
+    Como `exportar_dataframes`, pero escribiendo solo las diferencias con
+    la salida *anterior* (por defecto `salida_anterior(output_dir)`).
+
+    El informe añade la columna "delta" (completa / insert / update /
+    delete / sin cambios); las tablas sin cambios aparecen con 0 bytes.
+    """
+    anterior = salida_anterior(output_dir) if anterior is None else anterior
+    tablas_prev, huellas_prev = _leer_anterior(anterior)
+    formatos = {
+        nombre: formato.get(nombre, "xlsx") if isinstance(formato, dict) else formato
+        for nombre in archivos
+    }
+
+    escribir: dict[str, pd.DataFrame] = {}
+    delta_fichero: dict[str, tuple[str, str]] = {}
+    manifiesto: dict[str, dict] = {}
+    huellas: dict[str, pd.DataFrame] = {}
+    sin_cambios = []
+    for nombre, df in archivos.items():
+        filas = huellas_filas(df)
+        clave = CLAVES.get(nombre)
+        if clave is not None and (
+            not set(clave) <= set(df.columns) or df.duplicated(clave).any()
+        ):
+            clave = None
+        huellas[nombre] = pd.DataFrame(
+            {
+                **({c: df[c].to_numpy() for c in clave} if clave else {}),
+                _HUELLA: filas.to_numpy(),
+            }
+        )
+        entrada = {
+            "huella": _huella_tabla(df, filas),
+            "filas": len(df),
+            "columnas": [str(c) for c in df.columns],
+            "clave": clave,
+        }
+        previa = tablas_prev.get(nombre)
+
+        if previa is not None and previa["huella"] == entrada["huella"]:
+            entrada.update(estado="sin cambios", ficheros={})
+            sin_cambios.append(nombre)
+        elif (
+            previa is None
+            or clave is None
+            or previa.get("clave") != clave
+            or previa["columnas"] != entrada["columnas"]
+            or nombre not in huellas_prev
+        ):
+            entrada.update(estado="completa", ficheros={"completa": nombre})
+            escribir[nombre] = df
+            delta_fichero[nombre] = (nombre, "completa")
+        else:
+            actual = huellas[nombre].rename_axis("posicion")
+            partes = _comparar(df, clave, actual, huellas_prev[nombre])
+            entrada.update(
+                estado="delta",
+                ficheros={},
+                **{tipo: len(parte) for tipo, parte in partes.items()},
+            )
+            for tipo, parte in partes.items():
+                if len(parte):
+                    fichero = f"{nombre}__{tipo}"
+                    escribir[fichero] = parte
+                    delta_fichero[fichero] = (nombre, tipo)
+                    entrada["ficheros"][tipo] = fichero
+        manifiesto[nombre] = entrada
+
+    informe = exportar_dataframes(
+        output_dir,
+        escribir,
+        formato={fichero: formatos[tabla] for fichero, (tabla, _) in delta_fichero.items()},
+        paralelo=paralelo,
+    )
+    for nombre in manifiesto:
+        manifiesto[nombre]["ficheros"] = {
+            tipo: f"{fichero}{ESCRITORES[formatos[nombre]][0]}"
+            for tipo, fichero in manifiesto[nombre]["ficheros"].items()
+        }
+    informe = pd.DataFrame(
+        [
+            *(
+                {**fila, "tabla": delta_fichero[Path(fila["ruta"]).stem][0],
+                 "delta": delta_fichero[Path(fila["ruta"]).stem][1]}
+                for fila in informe.to_dict("records")
+            ),
+            *(
+                {"tabla": nombre, "formato": formatos[nombre], "filas": len(archivos[nombre]),
+                 "segundos": 0.0, "bytes": 0, "ruta": "", "delta": "sin cambios"}
+                for nombre in sin_cambios
+            ),
+        ],
+        columns=["tabla", "formato", "filas", "segundos", "bytes", "ruta", "delta"],
+    )
+
+    pd.to_pickle(huellas, output_dir / HUELLAS)
+    (output_dir / MANIFIESTO).write_text(
+        json.dumps(
+            {
+                "creado": datetime.now().isoformat(timespec="seconds"),
+                "anterior": anterior.name if anterior is not None else None,
+                "tablas": manifiesto,
+            },
+            indent=2,
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    return informe
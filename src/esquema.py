@@ -0,0 +1,165 @@
+# PATH: src/esquema.py
+
+"""
+Esquema de los libros de entrada que lee src/extract.py.
+
+Para cada libro: hojas, columnas obligatorias y tipos admitidos en cada
+columna. `validar_entradas` lo comprueba leyendo solo la cabecera y las
+primeras `FILAS_MUESTRA` filas de cada hoja (openpyxl en modo read-only),
+todos los libros a la vez, antes de cargar ninguno entero: un libro con
+una hoja o columna renombrada se rechaza al momento y el error enumera
+todos los problemas encontrados.
+
+Los tipos se comprueban sobre la muestra y solo fallan cuando ningún
+valor no vacío es de un tipo admitido (p.ej. HORAS con solo textos →
+columnas desplazadas); valores sueltos raros se siguen tratando como
+hasta ahora en las transformaciones.
+"""
+
+from __future__ import annotations
+
+import difflib
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+from pathlib import Path
+
+from src.extract import TABLAS_BD
+from src.transform import RENAME
+
+NUMERO, TEXTO, FECHA = "número", "texto", "fecha"
+CUALQUIERA = None
+
+FILAS_MUESTRA = 20
+
+# {hoja (None → la primera): {columna: tipos admitidos}}
+ESQUEMA_TABLAS_BD = {
+    "usuarios": {None: {"IdUsuario": (NUMERO, TEXTO), "PagaHE": CUALQUIERA}},
+    "obras": {None: {"ClaveObra": (NUMERO, TEXTO)}},
+    "procesos": {None: {"IdProceso": (NUMERO, TEXTO)}},
+    "tareas": {None: {"CodTarea": (TEXTO, NUMERO)}},
+}
+ESQUEMA_HISTORICO = {
+    "Base Datos": {
+        **{col: CUALQUIERA for col in RENAME},
+        "FECHA": (FECHA, TEXTO),
+        "PERSONA\n(Nº de chapa)": (NUMERO, TEXTO),
+        "PROYECTO": (TEXTO,),
+        "ACTIVIDAD/TAREA": (TEXTO,),
+        "HORAS": (NUMERO,),
+        "CARGADO A": (NUMERO, TEXTO),
+        "CATEGORIA": (TEXTO,),
+    },
+    "asignaciones_tareas": {"Tarea": (TEXTO,), "AsignarATarea": CUALQUIERA},
+}
+ESQUEMA_MAESTRO = {None: {"ClaveObra": (NUMERO, TEXTO), "CambiarAObra": CUALQUIERA}}
+
+# Hojas cuyas cabeceras se usan sin espacios exteriores (rename(str.strip))
+_CABECERA_SIN_ESPACIOS = {"asignaciones_tareas", "maestro"}
+
+
+def _tipo(valor) -> str | None:
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return NUMERO
+    if isinstance(valor, (datetime, date, time)):
+        return FECHA
+    if isinstance(valor, str):
+        return TEXTO if valor.strip() else None
+    return None
+
+
+def _comprobar_hoja(
+    nombre: str, hoja: str | None, filas: list[tuple], esquema: dict, sin_espacios: bool
+) -> list[str]:
+    """Problemas de una hoja a partir de su cabecera y filas de muestra."""
+    donde = nombre if hoja is None else f"{nombre} › {hoja}"
+    if not filas:
+        return [f"{donde}: hoja vacía, sin cabecera"]
+    cabecera = [
+        None if v is None else (str(v).strip() if sin_espacios else str(v))
+        for v in filas[0]
+    ]
+    presentes = [c for c in cabecera if c is not None]
+
+    problemas = []
+    for columna, tipos in esquema.items():
+        if columna not in cabecera:
+            parecidas = difflib.get_close_matches(columna, presentes, n=1, cutoff=0.6)
+            pista = f" (¿renombrada a {parecidas[0]!r}?)" if parecidas else ""
+            problemas.append(f"{donde}: falta la columna {columna!r}{pista}")
+            continue
+        if tipos is CUALQUIERA:
+            continue
+        i = cabecera.index(columna)
+        vistos = {_tipo(f[i]) for f in filas[1:] if i < len(f)} - {None}
+        if vistos and not vistos & set(tipos):
+            problemas.append(
+                f"{donde}: la columna {columna!r} debería ser {' o '.join(tipos)} "
+                f"y en las primeras filas es {' / '.join(sorted(vistos))}"
+            )
+    return problemas
+
+
+def _comprobar_libro(nombre: str, ruta: Path, hojas: dict) -> list[str]:
+    """Abre *ruta* en modo read-only y comprueba cada hoja de *hojas*."""
+    from openpyxl import load_workbook
+
+    if not ruta.exists():
+        return [f"{nombre}: no existe {ruta}"]
+    try:
+        wb = load_workbook(ruta, read_only=True, data_only=True)
+    except Exception as e:           # libro dañado / no es .xlsx
+        return [f"{nombre}: no se puede abrir {ruta.name} ({e})"]
+    try:
+        problemas = []
+        for hoja, esquema in hojas.items():
+            if hoja is not None and hoja not in wb.sheetnames:
+                parecidas = difflib.get_close_matches(hoja, wb.sheetnames, n=1, cutoff=0.6)
+                pista = f" (¿renombrada a {parecidas[0]!r}?)" if parecidas else ""
+                problemas.append(f"{nombre}: falta la hoja {hoja!r}{pista}")
+                continue
+            ws = wb.worksheets[0] if hoja is None else wb[hoja]
+            ws.reset_dimensions()
+            filas = list(ws.iter_rows(max_row=FILAS_MUESTRA + 1, values_only=True))
+            problemas += _comprobar_hoja(
+                nombre, hoja, filas, esquema,
+                sin_espacios=(hoja or nombre) in _CABECERA_SIN_ESPACIOS,
+            )
+        return problemas
+    finally:
+        wb.close()
+
+
+def validar_entradas(
+    carpeta_bd: Path, historicos: Path | Iterable[Path], maestro: Path, paralelo: bool = True
+) -> int:
+    """
+    Comprueba el esquema de todos los libros de entrada (solo cabeceras y
+    muestra). Devuelve el nº de libros comprobados; ValueError con la
+    lista de problemas si alguno no cumple.
+    """
+    if isinstance(historicos, (str, Path)):
+        historicos = [historicos]
+    trabajos = [
+        (clave, Path(carpeta_bd) / fichero, ESQUEMA_TABLAS_BD[clave])
+        for clave, fichero in TABLAS_BD.items()
+    ]
+    trabajos += [(Path(h).name, Path(h), ESQUEMA_HISTORICO) for h in historicos]
+    trabajos.append(("maestro", Path(maestro), ESQUEMA_MAESTRO))
+
+    # Hilos: cada lectura es corta y un proceso por libro costaría más que ella
+    if paralelo and len(trabajos) > 1:
+        with ThreadPoolExecutor(max_workers=len(trabajos)) as pool:
+            resultados = list(pool.map(lambda t: _comprobar_libro(*t), trabajos))
+    else:
+        resultados = [_comprobar_libro(*t) for t in trabajos]
+
+    problemas = [p for r in resultados for p in r]
+    if problemas:
+        raise ValueError(
+            "Los libros de entrada no tienen el formato esperado:\n  - "
+            + "\n  - ".join(problemas)
+        )
+    return len(trabajos)
@@ -1,8 +1,15 @@
 # PATH: src/export.py
 
-import pandas as pd
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from src.utils.valores import tipo_unico
 
 def crear_output_dir(base_path: Path) -> Path:
     """Crea una carpeta en ./archivos/output/output_{timestamp}/ y la devuelve."""
@@ -11,8 +18,251 @@ def crear_output_dir(base_path: Path) -> Path:
     output_dir.mkdir(parents=True, exist_ok=True)
     return output_dir
 
-def exportar_dataframes(output_dir: Path, archivos: dict[str, pd.DataFrame]) -> None:
-    """Exporta cada DataFrame a un Excel dentro del directorio indicado."""
-    for nombre, df in archivos.items():
-        ruta_salida = output_dir / f"{nombre}.xlsx"
-        df.to_excel(ruta_salida, index=False)
+# ---------------------------------------------------------------------- #
+#  ---------------------------  ESCRITORES  ---------------------------- #
+# ---------------------------------------------------------------------- #
+def _celda(valor):
+    """NaN / None / NaT → celda vacía; el resto tal cual."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return valor
+
+def _filas(df: pd.DataFrame):
+    for fila in df.itertuples(index=False, name=None):
+        yield [_celda(v) for v in fila]
+
+def _escribir_xlsx(df: pd.DataFrame, ruta: Path) -> None:
+    df.to_excel(ruta, index=False)
+
+def _escribir_xlsx_stream(df: pd.DataFrame, ruta: Path) -> None:
+    """
+    Excel fila a fila con memoria constante: xlsxwriter en modo
+    `constant_memory` si está instalado, si no openpyxl `write_only`.
+    """
+    with _XlsxBloques(ruta) as escritor:
+        escritor.anadir(df)
+
+def _escribir_csv(df: pd.DataFrame, ruta: Path) -> None:
+    df.to_csv(ruta, index=False, sep=";", encoding="utf-8-sig")
+
+def _escribir_parquet(df: pd.DataFrame, ruta: Path) -> None:
+    # Parquet no admite columnas con tipos mezclados (números y textos),
+    # ni object ni Categorical: esas columnas se guardan como texto.
+    df = df.copy()
+    for col in df.columns:
+        if not tipo_unico(df[col]):
+            texto = df[col].astype(object)
+            df[col] = texto.where(texto.isna(), texto.astype(str))
+    df.columns = [str(c) for c in df.columns]
+    df.to_parquet(ruta, index=False)
+
+# ---------------------------------------------------------------------- #
+#  ------------------  ESCRITURA POR BLOQUES (streaming)  -------------- #
+# ---------------------------------------------------------------------- #
+class _XlsxBloques:
+    """Hoja Sheet1 escrita fila a fila; la cabecera con el primer bloque."""
+
+    def __init__(self, ruta: Path):
+        self.ruta, self.fila = ruta, 0
+        try:
+            import xlsxwriter
+        except ImportError:
+            from openpyxl import Workbook
+
+            self.wb = Workbook(write_only=True)
+            self.ws = self.wb.create_sheet("Sheet1")
+            self.xlsxwriter = False
+            return
+        self.wb = xlsxwriter.Workbook(
+            str(ruta), {"constant_memory": True, "nan_inf_to_errors": True}
+        )
+        self.ws = self.wb.add_worksheet("Sheet1")
+        self.fmt_fecha = self.wb.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        self.xlsxwriter = True
+
+    def anadir(self, df: pd.DataFrame) -> None:
+        cabecera = [str(c) for c in df.columns] if self.fila == 0 else None
+        if not self.xlsxwriter:
+            for fila in ([cabecera] if cabecera else []) + list(_filas(df)):
+                self.ws.append(fila)
+            self.fila += len(df) + bool(cabecera)
+            return
+        if cabecera:
+            self.ws.write_row(0, 0, cabecera)
+            self.fila = 1
+        for i, fila in enumerate(_filas(df), start=self.fila):
+            for j, valor in enumerate(fila):
+                if valor is None:
+                    continue
+                if isinstance(valor, datetime):
+                    self.ws.write_datetime(i, j, valor, self.fmt_fecha)
+                else:
+                    self.ws.write(i, j, valor)
+        self.fila += len(df)
+
+    def cerrar(self) -> None:
+        if self.xlsxwriter:
+            self.wb.close()
+        else:
+            self.wb.save(self.ruta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cerrar()
+
+class _CsvBloques:
+    """CSV ';' en utf-8-sig; la cabecera con el primer bloque."""
+
+    def __init__(self, ruta: Path):
+        self.f = open(ruta, "w", encoding="utf-8-sig", newline="")
+        self.cabecera = True
+
+    def anadir(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.f, index=False, sep=";", header=self.cabecera)
+        self.cabecera = False
+
+    def cerrar(self) -> None:
+        self.f.close()
+
+class _ParquetBloques:
+    """
+    Un row group por bloque con el esquema del primer bloque. Las columnas
+    object / Categorical se guardan siempre como texto: el tipo que tengan
+    en un bloque no puede fijar el de los siguientes.
+    """
+
+    def __init__(self, ruta: Path):
+        self.ruta, self.escritor, self.esquema = ruta, None, None
+
+    def anadir(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object or isinstance(df[col].dtype, pd.CategoricalDtype):
+                texto = df[col].astype(object)
+                df[col] = texto.where(texto.isna(), texto.astype(str)).astype(object)
+        df.columns = [str(c) for c in df.columns]
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        if self.escritor is None:
+            self.esquema = pa.schema(
+                [
+                    pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                    for f in tabla.schema
+                ]
+            )
+            self.escritor = pq.ParquetWriter(self.ruta, self.esquema)
+        self.escritor.write_table(tabla.select(self.esquema.names).cast(self.esquema))
+
+    def cerrar(self) -> None:
+        if self.escritor is None:
+            return
+        self.escritor.close()
+
+# formato → clase que escribe una tabla bloque a bloque ("xlsx" no admite
+# añadir filas: se escribe como "xlsx_stream")
+ESCRITORES_BLOQUES = {
+    "xlsx": _XlsxBloques,
+    "xlsx_stream": _XlsxBloques,
+    "csv": _CsvBloques,
+    "parquet": _ParquetBloques,
+}
+
+class EscritorBloques:
+    """
+    Una tabla de salida escrita bloque a bloque con memoria acotada:
+    `anadir(df)` por bloque y `cerrar()` al final, que devuelve su fila
+    del informe (la misma forma que la de `exportar_dataframes`).
+    """
+
+    def __init__(self, output_dir: Path, nombre: str, formato: str):
+        if formato not in ESCRITORES_BLOQUES:
+            raise ValueError(f"Formato de exportación desconocido: {formato!r}")
+        self.nombre, self.formato = nombre, formato
+        self.ruta = output_dir / f"{nombre}{ESCRITORES[formato][0]}"
+        self.escritor = ESCRITORES_BLOQUES[formato](self.ruta)
+        self.filas, self.segundos = 0, 0.0
+
+    def anadir(self, df: pd.DataFrame) -> None:
+        inicio = time.perf_counter()
+        self.escritor.anadir(df)
+        self.segundos += time.perf_counter() - inicio
+        self.filas += len(df)
+
+    def cerrar(self) -> dict:
+        inicio = time.perf_counter()
+        self.escritor.cerrar()
+        self.segundos += time.perf_counter() - inicio
+        return {
+            "tabla": self.nombre,
+            "formato": self.formato,
+            "filas": self.filas,
+            "segundos": round(self.segundos, 3),
+            "bytes": self.ruta.stat().st_size if self.ruta.exists() else 0,
+            "ruta": str(self.ruta),
+        }
+
+# formato → (extensión, función que escribe)
+ESCRITORES: dict[str, tuple[str, Callable[[pd.DataFrame, Path], None]]] = {
+    "xlsx": (".xlsx", _escribir_xlsx),
+    "xlsx_stream": (".xlsx", _escribir_xlsx_stream),
+    "csv": (".csv", _escribir_csv),
+    "parquet": (".parquet", _escribir_parquet),
+}
+
+def _exportar_uno(nombre: str, df: pd.DataFrame, output_dir: Path, formato: str) -> dict:
+    extension, escribir = ESCRITORES[formato]
+    ruta = output_dir / f"{nombre}{extension}"
+    inicio = time.perf_counter()
+    escribir(df, ruta)
+    return {
+        "tabla": nombre,
+        "formato": formato,
+        "filas": len(df),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "bytes": ruta.stat().st_size,
+        "ruta": str(ruta),
+    }
+
+def exportar_dataframes(
+    output_dir: Path,
+    archivos: dict[str, pd.DataFrame],
+    formato: str | dict[str, str] = "xlsx",
+    paralelo: bool = False,
+) -> pd.DataFrame:
+    """
+    Exporta cada DataFrame al directorio indicado.
+
+    *formato* es uno de ESCRITORES ("xlsx", "xlsx_stream", "csv",
+    "parquet") o un dict {tabla: formato}; las tablas que no aparezcan en
+    el dict van en "xlsx". Con *paralelo* cada tabla se escribe en su
+    propio proceso.
+
+    Devuelve un informe con filas, tiempo de escritura y tamaño por fichero.
+    """
+    formatos = {
+        nombre: formato.get(nombre, "xlsx") if isinstance(formato, dict) else formato
+        for nombre in archivos
+    }
+    desconocidos = set(formatos.values()) - set(ESCRITORES)
+    if desconocidos:
+        raise ValueError(f"Formato de exportación desconocido: {sorted(desconocidos)}")
+
+    if paralelo and len(archivos) > 1:
+        workers = min(len(archivos), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [
+                pool.submit(_exportar_uno, nombre, df, output_dir, formatos[nombre])
+                for nombre, df in archivos.items()
+            ]
+            informe = [f.result() for f in futuros]
+    else:
+        informe = [
+            _exportar_uno(nombre, df, output_dir, formatos[nombre])
+            for nombre, df in archivos.items()
+        ]
+
+    return pd.DataFrame(informe)
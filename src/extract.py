@@ -1,26 +1,203 @@
 # PATH: src/extract.py
 
-import pandas as pd
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from src.config import EXTRACT_PARALELO, REFERENCIAS_BD
+from src.utils import cache_excel
+from src.utils.cache_excel import leer_excel, leer_hojas
+
+TABLAS_BD = {
+    "usuarios": "T_USUARIOS.xlsx",
+    "obras": "T_OBRAS.xlsx",
+    "procesos": "T_PROCESOS.xlsx",
+    "tareas": "T_TAREAS.xlsx",
+}
+HOJAS_HISTORICO = ["Base Datos", "asignaciones_tareas"]
+
+# Textos que read_excel interpreta como vacíos (valores por defecto de pandas)
+_NA_EXCEL = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+
+
+def _leer_libro(ruta: Path, hojas: list[str] | None):
+    """Lee un libro (primera hoja o varias) y devuelve también los contadores
+    de caché del proceso que lo ha leído."""
+    cache_excel.tomar_contadores()
+    datos = leer_excel(ruta) if hojas is None else leer_hojas(ruta, hojas)
+    return datos, cache_excel.tomar_contadores()
+
+
+def _leer_libros(trabajos: dict[str, tuple[Path, list[str] | None]]) -> dict:
+    """
+    Lee cada libro de *trabajos* ({nombre: (ruta, hojas)}) en su propio
+    proceso; el tiempo total es aproximadamente el del libro más grande.
+    """
+    if not EXTRACT_PARALELO or len(trabajos) == 1:
+        return {
+            nombre: leer_excel(ruta) if hojas is None else leer_hojas(ruta, hojas)
+            for nombre, (ruta, hojas) in trabajos.items()
+        }
+
+    workers = min(len(trabajos), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            nombre: pool.submit(_leer_libro, ruta, hojas)
+            for nombre, (ruta, hojas) in trabajos.items()
+        }
+        resultados = {}
+        for nombre, futuro in futuros.items():
+            resultados[nombre], contadores = futuro.result()
+            cache_excel.sumar_contadores(contadores)
+    return resultados
+
 
 def load_tablas_bd(carpeta: Path) -> dict:
     """Carga T_USUARIOS, T_OBRAS, T_PROCESOS y T_TAREAS en DataFrames."""
-    return {
-        "usuarios": pd.read_excel(carpeta / "T_USUARIOS.xlsx"),
-        "obras": pd.read_excel(carpeta / "T_OBRAS.xlsx"),
-        "procesos": pd.read_excel(carpeta / "T_PROCESOS.xlsx"),
-        "tareas": pd.read_excel(carpeta / "T_TAREAS.xlsx"),
-    }
+    if REFERENCIAS_BD is not None:
+        from src import referencias
+
+        return referencias.tablas_bd(carpeta, REFERENCIAS_BD)
+    return _leer_libros(
+        {clave: (carpeta / fichero, None) for clave, fichero in TABLAS_BD.items()}
+    )
 
 
 def load_historico(fichero: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Carga las hojas *Base Datos* y *asignaciones_tareas*."""
-    base = pd.read_excel(fichero, sheet_name="Base Datos")
-    asign = pd.read_excel(fichero, sheet_name="asignaciones_tareas")
-    return base, asign
+    hojas = leer_hojas(fichero, HOJAS_HISTORICO)
+    return hojas["Base Datos"], hojas["asignaciones_tareas"]
+
+
+def load_asignaciones(fichero: Path) -> pd.DataFrame:
+    """Carga solo la hoja *asignaciones_tareas* del histórico."""
+    return leer_excel(fichero, sheet_name="asignaciones_tareas")
 
 
 def load_maestro_modificaciones(ruta: Path) -> pd.DataFrame:
     """Lee T_OBRAS_SUBIR_MAESTRO_MODIFICACIONES.xlsx."""
-    return pd.read_excel(ruta)
+    return leer_excel(ruta)
+
+
+def load_entradas(
+    carpeta_bd: Path, historico: Path, maestro: Path
+) -> tuple[dict, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Equivale a `load_tablas_bd` + `load_historico` +
+    `load_maestro_modificaciones`, pero leyendo los seis libros a la vez.
+
+    Devuelve (tablas_bd, base, asign, maestro). Con REFERENCIAS_BD las
+    tablas T_* salen del almacén SQLite en lugar de los Excel.
+    """
+    trabajos = {}
+    if REFERENCIAS_BD is None:
+        trabajos = {
+            clave: (carpeta_bd / fichero, None) for clave, fichero in TABLAS_BD.items()
+        }
+    trabajos["historico"] = (historico, HOJAS_HISTORICO)
+    trabajos["maestro"] = (maestro, None)
+
+    leidos = _leer_libros(trabajos)
+    if REFERENCIAS_BD is None:
+        tablas_bd = {clave: leidos[clave] for clave in TABLAS_BD}
+    else:
+        tablas_bd = load_tablas_bd(carpeta_bd)
+    historico_hojas = leidos["historico"]
+    return (
+        tablas_bd,
+        historico_hojas["Base Datos"],
+        historico_hojas["asignaciones_tareas"],
+        leidos["maestro"],
+    )
+
+
+# ---------------------------------------------------------------------- #
+#  ------------------  LECTURA POR BLOQUES (streaming)  ---------------- #
+# ---------------------------------------------------------------------- #
+def _valor_celda(celda):
+    """Conversión de celda equivalente a la de read_excel (motor openpyxl)."""
+    valor = celda.value
+    if valor is None or celda.data_type == "e":
+        return np.nan
+    if celda.data_type == "n" and isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str) and valor in _NA_EXCEL:
+        return np.nan
+    return valor
+
+
+def _cabecera(valores: list) -> list:
+    """Nombres de columna como los deja read_excel (Unnamed: i, X.1, ...)."""
+    columnas, vistos = [], {}
+    for i, v in enumerate(valores):
+        nombre = f"Unnamed: {i}" if v is None else v
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        columnas.append(nombre)
+    return columnas
+
+
+def iter_hoja(
+    fichero: Path, hoja: str, filas_por_bloque: int = 50_000
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee *hoja* en bloques de `filas_por_bloque` filas con el iterador
+    read-only de openpyxl, sin materializar la hoja entera.
+
+    Los valores de celda se convierten como en read_excel, pero los tipos
+    no se infieren por bloque: cada columna queda como object. El índice es
+    global (el primer bloque empieza en 0 y los siguientes continúan), como
+    si la hoja se hubiera leído de una vez.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fichero, read_only=True, data_only=True)
+    try:
+        ws = wb[hoja]
+        ws.reset_dimensions()
+        filas = ws.iter_rows()
+        columnas = _cabecera([c.value for c in next(filas, ())])
+        ancho = len(columnas)
+
+        bloque, vacias, inicio = [], [], 0
+        for fila in filas:
+            valores = [_valor_celda(c) for c in fila[:ancho]]
+            valores += [np.nan] * (ancho - len(valores))
+            # Las filas vacías finales se descartan, igual que read_excel
+            if all(v is np.nan for v in valores):
+                vacias.append(valores)
+                continue
+            bloque.extend(vacias)
+            vacias = []
+            bloque.append(valores)
+
+            while len(bloque) >= filas_por_bloque:
+                yield pd.DataFrame(
+                    bloque[:filas_por_bloque],
+                    columns=columnas,
+                    index=pd.RangeIndex(inicio, inicio + filas_por_bloque),
+                    dtype=object,
+                )
+                inicio += filas_por_bloque
+                bloque = bloque[filas_por_bloque:]
+
+        if bloque:
+            yield pd.DataFrame(
+                bloque,
+                columns=columnas,
+                index=pd.RangeIndex(inicio, inicio + len(bloque)),
+                dtype=object,
+            )
+    finally:
+        wb.close()
@@ -0,0 +1,237 @@
+# PATH: src/incremental.py
+
+"""
+Migración incremental con IdAnot estables.
+
+Cada fila del histórico se identifica por una huella de identidad
+(fecha, chapa, proyecto, actividad + nº de hermana: posición entre las
+filas con esas mismas claves) y una huella de contenido (todas las
+columnas de origen). Corregir las horas o la obra de una fila cambia su
+contenido, no su identidad, y conserva su IdAnot. Un almacén SQLite
+recuerda, por huella de identidad, el contenido y el IdAnot emitidos en
+ejecuciones anteriores, además de:
+    • `ultimo_id`          → mayor IdAnot emitido (marca de agua),
+    • `firma_referencias`  → huella de asignaciones / maestro / T_* /
+      reglas '*' con la que se procesó.
+
+En cada ejecución solo se procesan las filas nuevas o modificadas. Las
+modificadas conservan su IdAnot (el destino debe actualizarlas, no
+insertarlas) y las nuevas reciben ids a partir de la marca de agua. Si
+cambian las referencias se reprocesa todo el histórico, pero los IdAnot
+ya emitidos se mantienen.
+
+Las identidades del estado que ya no están en el histórico (fila
+borrada, o la última hermana cuando se borra una anterior: las demás se
+renumeran y llegan como modificadas) quedan como lápidas, y su IdAnot va
+a T_ANOTACIONES_BORRAR para que el destino lo elimine. También se retira
+el IdAnot de una fila modificada que el maestro ahora descarta.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import PRIMER_ID_ANOT
+
+# Columnas (ya normalizadas) que identifican una fila del histórico
+CLAVE_FILA = ["fecha", "idusuario", "proyecto", "actividad"]
+
+
+def _canonico(valor) -> str:
+    """Texto estable para hashear: 7.0 → '7', NaN → '', fechas en ISO."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor).strip()
+
+
+def _columna_canonica(serie: pd.Series) -> pd.Series:
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    textos = pd.Index(unicos, dtype=object).map(_canonico)
+    return pd.Series(textos.take(codigos), index=serie.index, dtype=object)
+
+
+def _hash_filas(df: pd.DataFrame) -> pd.Series:
+    canon = pd.DataFrame({c: _columna_canonica(df[c]) for c in df.columns})
+    return pd.util.hash_pandas_object(canon, index=False)
+
+
+def huellas(base: pd.DataFrame, columnas_origen: list[str]) -> pd.DataFrame:
+    """
+    Devuelve, con el índice de *base*, las columnas HuellaFila (identidad)
+    y HuellaContenido (valores de *columnas_origen*) en hexadecimal.
+    """
+    clave = _hash_filas(base[CLAVE_FILA]).to_numpy()
+    contenido = _hash_filas(base[columnas_origen])
+    # Nº de hermana: posición entre las filas con la misma clave
+    hermana = pd.Series(clave).groupby(clave).cumcount().to_numpy()
+    identidad = pd.util.hash_pandas_object(
+        pd.DataFrame({"h": clave, "n": hermana}), index=False
+    )
+    return pd.DataFrame(
+        {
+            "HuellaFila": [f"{h:016x}" for h in identidad],
+            "HuellaContenido": [f"{h:016x}" for h in contenido],
+        },
+        index=base.index,
+    )
+
+
+def firma_referencias(*tablas: pd.DataFrame, extra: str = "") -> str:
+    """Huella conjunta de las tablas de referencia (y de *extra*)."""
+    h = hashlib.sha256(extra.encode("utf-8"))
+    for df in tablas:
+        h.update(",".join(map(str, df.columns)).encode("utf-8"))
+        h.update(_hash_filas(df).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------- #
+#  -------------------------  ALMACÉN DE ESTADO  ----------------------- #
+# ---------------------------------------------------------------------- #
+def _abrir(ruta: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(ruta)
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS filas ("
+        " huella TEXT PRIMARY KEY, contenido TEXT NOT NULL, id_anot INTEGER,"
+        " borrada INTEGER NOT NULL DEFAULT 0)"
+    )
+    # Estados creados antes de las lápidas
+    if "borrada" not in {r[1] for r in con.execute("PRAGMA table_info(filas)")}:
+        con.execute("ALTER TABLE filas ADD COLUMN borrada INTEGER NOT NULL DEFAULT 0")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)"
+    )
+    return con
+
+
+def _meta(con: sqlite3.Connection, clave: str) -> str | None:
+    fila = con.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else None
+
+
+def seleccionar_pendientes(
+    base: pd.DataFrame,
+    ruta_estado: Path,
+    firma: str,
+    columnas_origen: list[str],
+    primer_id: int = PRIMER_ID_ANOT,
+) -> tuple[pd.DataFrame, pd.Series, int, pd.Series]:
+    """
+    Filtra *base* a las filas nuevas o modificadas respecto al estado.
+
+    Devuelve (base_pendiente, ids_existentes, siguiente_id, desaparecidas):
+        • base_pendiente lleva las columnas HuellaFila / HuellaContenido,
+        • ids_existentes (índice de base_pendiente) tiene el IdAnot ya
+          emitido para las filas modificadas y NaN para las nuevas,
+        • siguiente_id es el primer IdAnot libre,
+        • desaparecidas (índice = huella) tiene el IdAnot (o NaN) de las
+          identidades del estado que ya no están en *base*.
+    """
+    base = base.join(huellas(base, columnas_origen))
+
+    con = _abrir(ruta_estado)
+    try:
+        previo = pd.read_sql_query(
+            "SELECT huella, contenido, id_anot FROM filas WHERE borrada = 0",
+            con,
+            index_col="huella",
+        )
+        ultimo = _meta(con, "ultimo_id")
+        misma_firma = _meta(con, "firma_referencias") == firma
+    finally:
+        con.close()
+
+    contenido_previo = base["HuellaFila"].map(previo["contenido"])
+    if misma_firma:
+        pendiente = contenido_previo.ne(base["HuellaContenido"]).to_numpy()
+    else:
+        pendiente = np.ones(len(base), dtype=bool)
+
+    desaparecidas = previo.loc[
+        ~previo.index.isin(base["HuellaFila"]), "id_anot"
+    ].astype(float)
+    base = base.loc[pendiente]
+    ids_existentes = base["HuellaFila"].map(previo["id_anot"]).astype(float)
+    siguiente_id = max(primer_id, int(ultimo) + 1) if ultimo else primer_id
+
+    print(
+        f"Incremental: {int(pendiente.sum())} filas pendientes de "
+        f"{len(pendiente)} ({int(ids_existentes.notna().sum())} modificadas, "
+        f"{len(desaparecidas)} desaparecidas)"
+    )
+    return base, ids_existentes, siguiente_id, desaparecidas
+
+
+def anotaciones_retiradas(
+    desaparecidas: pd.Series,
+    ids_existentes: pd.Series,
+    base_trazada: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    T_ANOTACIONES_BORRAR: IdAnot ya emitidos que el destino debe eliminar
+    (identidades desaparecidas y filas modificadas que ya no generan
+    anotación, p.ej. porque el maestro ahora las descarta).
+    """
+    descartadas = ids_existentes[~ids_existentes.isin(base_trazada["IdAnot"])]
+    ids = np.concatenate([desaparecidas.to_numpy(float), descartadas.to_numpy(float)])
+    return pd.DataFrame({"IdAnot": np.sort(ids[~np.isnan(ids)]).astype("int64")})
+
+
+def registrar_emitidas(
+    ruta_estado: Path,
+    base_pendiente: pd.DataFrame,
+    base_trazada: pd.DataFrame,
+    firma: str,
+    desaparecidas: pd.Series | None = None,
+) -> None:
+    """
+    Guarda en el estado las filas procesadas en esta ejecución y marca
+    como lápidas las *desaparecidas*. Las que el maestro descartó se
+    guardan sin IdAnot (ya retirado) para no reprocesarlas.
+    Llamar solo cuando la exportación haya terminado bien.
+    """
+    id_por_huella = dict(zip(base_trazada["HuellaFila"], base_trazada["IdAnot"]))
+    filas = [
+        (huella, contenido, id_por_huella.get(huella))
+        for huella, contenido in zip(
+            base_pendiente["HuellaFila"], base_pendiente["HuellaContenido"]
+        )
+    ]
+    filas = [(h, c, None if i is None else int(i)) for h, c, i in filas]
+
+    con = _abrir(ruta_estado)
+    try:
+        with con:
+            if desaparecidas is not None:
+                con.executemany(
+                    "UPDATE filas SET borrada = 1 WHERE huella = ?",
+                    [(h,) for h in desaparecidas.index],
+                )
+            con.executemany(
+                "INSERT INTO filas (huella, contenido, id_anot) VALUES (?, ?, ?) "
+                "ON CONFLICT(huella) DO UPDATE SET contenido = excluded.contenido, "
+                "id_anot = excluded.id_anot, borrada = 0",
+                filas,
+            )
+            # La marca de agua no baja aunque se retiren ids: no se reutilizan
+            maximo = con.execute("SELECT MAX(id_anot) FROM filas").fetchone()[0]
+            previo = _meta(con, "ultimo_id")
+            ultimo = max(
+                (int(i) for i in (maximo, previo) if i not in (None, "")), default=None
+            )
+            con.executemany(
+                "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)",
+                [("ultimo_id", str(ultimo or "")), ("firma_referencias", firma)],
+            )
+    finally:
+        con.close()
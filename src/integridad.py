@@ -0,0 +1,192 @@
+# PATH: src/integridad.py
+
+"""
+Integridad referencial de la base frente a las tablas T_*.
+
+Todas las comprobaciones son anti-joins sobre tablas hash: cada columna
+se factoriza una vez, la pertenencia a la referencia se evalúa solo
+sobre sus valores distintos y el resultado se propaga a las filas con
+los códigos. Coste lineal en filas + tamaño de la referencia.
+
+`validar_integridad()` devuelve las tablas *_SUBIR_DEBE_CONTENER y un
+informe con una fila por clave foránea.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.utils.fechas import parsear_fechas
+from src.utils.valores import factorizar
+
+# clave → (origen, columna, tabla de referencia, columna de referencia,
+#          comparar como texto)
+CLAVES_FORANEAS = {
+    "usuarios": ("base", "idusuario", "usuarios", "IdUsuario", False),
+    "obras": ("base", "proyecto_codigo", "obras", "ClaveObra", False),
+    "cargado_a": ("base", "CARGADO A", "obras", "ClaveObra", True),
+    "tareas": ("anotaciones", "CodTarea", "tareas", "CodTarea", True),
+    "procesos": ("anotaciones", "IdProceso", "procesos", "IdProceso", True),
+}
+
+
+def claves_referencia(*columnas: pd.Series, como_texto: bool = False) -> pd.Index:
+    """Índice hash con los valores distintos de una o varias columnas."""
+    valores = pd.concat(
+        [c.astype(str) if como_texto else c.astype(object) for c in columnas],
+        ignore_index=True,
+    )
+    return pd.Index(pd.unique(valores))
+
+
+def anti_join(
+    valores: pd.Series, referencia: pd.Index
+) -> tuple[np.ndarray, pd.Index, np.ndarray]:
+    """
+    Devuelve (codigos, distintos, falta) donde `falta[i]` indica si
+    `distintos[i]` no está en *referencia*. `falta[codigos]` da la máscara
+    por fila. NaN se trata como un valor más (igual que `isin`).
+    """
+    codigos, distintos = factorizar(valores, use_na_sentinel=False)
+    return codigos, distintos, ~distintos.isin(referencia)
+
+
+def _texto_limpio(serie: pd.Series) -> pd.Series:
+    """`dropna().astype(str).str.strip()` calculado por valor distinto."""
+    serie = serie.dropna()
+    codigos, distintos = factorizar(serie)
+    limpios = distintos.map(lambda v: str(v).strip())
+    return pd.Series(limpios.take(codigos), index=serie.index, dtype=object)
+
+
+# ---------------------------------------------------------------------- #
+#  -------------------------  TABLAS *_SUBIR  -------------------------- #
+# ---------------------------------------------------------------------- #
+def usuarios_faltantes(base: pd.DataFrame, usuarios: pd.DataFrame) -> pd.DataFrame:
+    """Usuarios de la base que no existen en T_USUARIOS."""
+    _, distintos, falta = anti_join(
+        base["idusuario"], claves_referencia(usuarios["IdUsuario"])
+    )
+    return pd.DataFrame({"idusuario": distintos[falta]}).assign(
+        NomUsuario="", ClaveUsuario="", PagaHE=""
+    )
+
+
+def obras_faltantes(base: pd.DataFrame, obras: pd.DataFrame) -> pd.DataFrame:
+    """Obras (proyecto_codigo / proyecto_nombre) que no existen en T_OBRAS."""
+    codigos, _, falta = anti_join(
+        base["proyecto_codigo"], claves_referencia(obras["ClaveObra"])
+    )
+    return (
+        base.loc[falta[codigos], ["proyecto_codigo", "proyecto_nombre"]]
+        .drop_duplicates()
+        .rename(columns={"proyecto_codigo": "ClaveObra", "proyecto_nombre": "NomObra"})
+        .reset_index(drop=True)
+    )
+
+
+def cargado_a_faltantes(
+    base: pd.DataFrame, obras_exist: pd.DataFrame, obras_subir: pd.DataFrame
+) -> pd.DataFrame:
+    """Valores de 'CARGADO A' que no están ni en T_OBRAS ni en las obras a subir."""
+    referencia = claves_referencia(
+        obras_exist["ClaveObra"], obras_subir["ClaveObra"], como_texto=True
+    )
+    _, distintos, falta = anti_join(_texto_limpio(base["CARGADO A"]), referencia)
+    faltantes = list(distintos[falta])
+    return pd.DataFrame({"ClaveObra": faltantes, "NomObra": [""] * len(faltantes)})
+
+
+# ---------------------------------------------------------------------- #
+#  -------------------------  INFORME CONSOLIDADO  --------------------- #
+# ---------------------------------------------------------------------- #
+def _fila_informe(
+    clave: str, origen: pd.DataFrame, columna: str, tabla_ref: str,
+    col_ref: str, referencia: pd.Index, como_texto: bool, nombre_origen: str,
+) -> dict:
+    valores = origen[columna]
+    if como_texto:
+        valores = _texto_limpio(valores).reindex(valores.index)
+    vacio = valores.isna() | (valores == "")
+    codigos, distintos, falta = anti_join(valores[~vacio], referencia)
+    return {
+        "clave": clave,
+        "origen": f"{nombre_origen}.{columna}",
+        "referencia": f"{tabla_ref}.{col_ref}",
+        "filas": len(valores),
+        "vacios": int(vacio.sum()),
+        "filas_sin_referencia": int(falta[codigos].sum()),
+        "distintos": len(distintos),
+        "distintos_sin_referencia": int(falta.sum()),
+    }
+
+
+def _fila_fechas(origen: pd.DataFrame, columna: str, nombre_origen: str) -> dict:
+    """Misma forma que `_fila_informe`: fechas que no se pueden interpretar."""
+    valores = origen[columna]
+    fechas, no_validas = parsear_fechas(valores)
+    return {
+        "clave": columna,
+        "origen": f"{nombre_origen}.{columna}",
+        "referencia": "fecha válida",
+        "filas": len(valores),
+        "vacios": int(valores.isna().sum()),
+        "filas_sin_referencia": int(fechas.isna().sum() - valores.isna().sum()),
+        "distintos": int(valores.nunique()),
+        "distintos_sin_referencia": len(no_validas),
+    }
+
+
+def informe_integridad(
+    tablas_bd: dict,
+    obras_subir: pd.DataFrame,
+    base: pd.DataFrame | None = None,
+    anotaciones: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Informe de `CLAVES_FORANEAS` para los orígenes indicados (las claves
+    sin origen, columna o referencia se omiten). *obras_subir* completa la
+    referencia de CARGADO A. Tras las claves de la base va la fila de
+    fechas no válidas de `base.fecha`.
+    """
+    origenes = {"base": base, "anotaciones": anotaciones}
+    informe = []
+    for clave, (nombre_origen, columna, tabla_ref, col_ref, como_texto) in CLAVES_FORANEAS.items():
+        origen = origenes[nombre_origen]
+        ref = tablas_bd.get(tabla_ref)
+        if origen is None or columna not in origen or ref is None or col_ref not in ref:
+            continue
+        columnas_ref = [ref[col_ref]]
+        if clave == "cargado_a":
+            columnas_ref.append(obras_subir["ClaveObra"])
+        referencia = claves_referencia(*columnas_ref, como_texto=como_texto)
+        informe.append(
+            _fila_informe(
+                clave, origen, columna, tabla_ref, col_ref,
+                referencia, como_texto, nombre_origen,
+            )
+        )
+    if base is not None and "fecha" in base:
+        n_base = sum(fila["origen"].startswith("base.") for fila in informe)
+        informe.insert(n_base, _fila_fechas(base, "fecha", "base"))
+    return pd.DataFrame(informe)
+
+
+def validar_integridad(
+    base: pd.DataFrame,
+    tablas_bd: dict,
+    anotaciones: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Comprueba todas las claves de `CLAVES_FORANEAS` en una pasada.
+
+    Devuelve (usuarios_subir, obras_subir, cargado_a_subir, informe). Las
+    claves de *anotaciones* (tareas, procesos) solo se comprueban si se
+    pasa la tabla.
+    """
+    usuarios_subir = usuarios_faltantes(base, tablas_bd["usuarios"])
+    obras_subir = obras_faltantes(base, tablas_bd["obras"])
+    cargado_a_subir = cargado_a_faltantes(base, tablas_bd["obras"], obras_subir)
+    informe = informe_integridad(tablas_bd, obras_subir, base, anotaciones)
+    return usuarios_subir, obras_subir, cargado_a_subir, informe
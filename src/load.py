@@ -0,0 +1,304 @@
+# PATH: src/load.py
+
+"""
+Carga de las tablas *_SUBIR en una base de datos SQL.
+
+Sustituye a `ImportarDesdeExcelRapido` (vba_migrations/…V4.vba) usando
+SQLite como base local en lugar de Access. Cada tabla se inserta con
+`executemany` en lotes dentro de una transacción; si un lote falla se
+parte en dos mitades (recursivamente) hasta aislar las filas erróneas, en
+lugar de pasar a insertar toda la tabla registro a registro.
+
+El log tiene el mismo formato que el del VBA (total / insertados /
+fallidos y una línea por registro fallido).
+
+Con *actualizar* (modo incremental, ESTADO_INCREMENTAL) las filas cuyo
+IdAnot ya existe en el destino se actualizan en lugar de insertarse, y
+los IdAnot de T_ANOTACIONES_BORRAR se eliminan de las tablas destino.
+
+Uso por línea de comandos (sobre una carpeta output_{timestamp}):
+    python -m src.load <carpeta_output> <base.sqlite> [--actualizar]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.sql import LOTE_IN, identificador, valor_sql
+
+# Fichero generado → tabla destino, en el orden en que se cargan
+DESTINOS = {
+    "T_ANOTACIONES_SUBIR": "T_ANOTACIONES",
+    "T_ANOTACIONES_VALID_SUBIR": "T_ANOTACIONES_VALID",
+}
+# Columna que identifica la fila en las tablas destino (actualizaciones)
+CLAVE_DESTINO = "IdAnot"
+# Fichero con los IdAnot a eliminar de todas las tablas destino (incremental)
+BORRAR = "T_ANOTACIONES_BORRAR"
+
+
+def _columnas_destino(con: sqlite3.Connection, tabla: str) -> list[str]:
+    return [r[1] for r in con.execute(f"PRAGMA table_info({identificador(tabla)})")]
+
+
+def _insertar_lote(
+    con: sqlite3.Connection,
+    sql: str,
+    filas: list[tuple],
+    desde: int,
+    errores: list[tuple[int, str]],
+) -> int:
+    """
+    Inserta *filas* dentro de un SAVEPOINT. Si falla, deshace el lote y lo
+    parte en dos. Devuelve cuántas filas se insertaron; las que fallan se
+    añaden a *errores* como (nº de registro, mensaje).
+    """
+    con.execute("SAVEPOINT lote")
+    try:
+        con.executemany(sql, filas)
+    except sqlite3.Error as e:
+        con.execute("ROLLBACK TO lote")
+        con.execute("RELEASE lote")
+        if len(filas) == 1:
+            errores.append((desde + 1, str(e)))
+            return 0
+        mitad = len(filas) // 2
+        return (
+            _insertar_lote(con, sql, filas[:mitad], desde, errores)
+            + _insertar_lote(con, sql, filas[mitad:], desde + mitad, errores)
+        )
+    con.execute("RELEASE lote")
+    return len(filas)
+
+
+def _cargar_lotes(
+    con: sqlite3.Connection,
+    sql: str,
+    numeradas: list[tuple[int, tuple]],
+    tam_lote: int,
+    errores: list[tuple[int, str]],
+) -> int:
+    """`_insertar_lote` por lotes de (posición original, fila); errores con esa posición."""
+    hechas = 0
+    for inicio in range(0, len(numeradas), tam_lote):
+        lote = numeradas[inicio:inicio + tam_lote]
+        fallos: list[tuple[int, str]] = []
+        hechas += _insertar_lote(con, sql, [f for _, f in lote], 0, fallos)
+        errores += [(lote[n - 1][0] + 1, mensaje) for n, mensaje in fallos]
+    return hechas
+
+
+def _existentes(con: sqlite3.Connection, tabla: str, clave: str, valores: list) -> set:
+    """Valores de *valores* que ya están en la columna *clave* de *tabla*."""
+    existentes: set = set()
+    for inicio in range(0, len(valores), LOTE_IN):
+        lote = valores[inicio:inicio + LOTE_IN]
+        existentes.update(
+            r[0] for r in con.execute(
+                f"SELECT {identificador(clave)} FROM {identificador(tabla)} "
+                f"WHERE {identificador(clave)} IN ({', '.join('?' for _ in lote)})",
+                lote,
+            )
+        )
+    return existentes
+
+
+def cargar_tabla(
+    con: sqlite3.Connection,
+    tabla: str,
+    df: pd.DataFrame,
+    tam_lote: int = 5000,
+    clave: str | None = None,
+) -> dict:
+    """
+    Inserta *df* en *tabla* en una única transacción (la conexión debe
+    estar en modo autocommit, `isolation_level=None`). Si la tabla no
+    existe se crea con las columnas del DataFrame; si existe, solo se
+    insertan las columnas que tenga.
+
+    Con *clave* las filas cuyo valor de *clave* ya existe en *tabla* se
+    actualizan (UPDATE … WHERE clave = ?) en lugar de insertarse.
+
+    Devuelve {"total", "insertados", "actualizados", "fallidos", "errores",
+    "ignoradas"}.
+    """
+    columnas = _columnas_destino(con, tabla)
+    if not columnas:
+        columnas = [str(c) for c in df.columns]
+        con.execute(
+            f"CREATE TABLE {identificador(tabla)} "
+            f"({', '.join(map(identificador, columnas))})"
+        )
+
+    comunes = [c for c in df.columns if str(c) in columnas]
+    ignoradas = [str(c) for c in df.columns if str(c) not in columnas]
+    sql = (
+        f"INSERT INTO {identificador(tabla)} ({', '.join(map(identificador, comunes))}) "
+        f"VALUES ({', '.join('?' for _ in comunes)})"
+    )
+
+    filas = [
+        tuple(valor_sql(v) for v in fila)
+        for fila in df[comunes].itertuples(index=False, name=None)
+    ]
+
+    # --- filas a actualizar: su clave ya está en el destino
+    actualizar: list[tuple[int, tuple]] = []
+    if clave is not None and clave in comunes:
+        pos = comunes.index(clave)
+        existentes = _existentes(con, tabla, clave, [f[pos] for f in filas])
+        resto = [c for c in comunes if c != clave]
+        sql_update = (
+            f"UPDATE {identificador(tabla)} "
+            f"SET {', '.join(f'{identificador(c)} = ?' for c in resto)} "
+            f"WHERE {identificador(clave)} = ?"
+        )
+        actualizar = [
+            (i, f[:pos] + f[pos + 1:] + (f[pos],))
+            for i, f in enumerate(filas) if f[pos] in existentes
+        ]
+        insertar = [(i, f) for i, f in enumerate(filas) if f[pos] not in existentes]
+    else:
+        insertar = list(enumerate(filas))
+
+    errores: list[tuple[int, str]] = []
+    con.execute("BEGIN")
+    try:
+        actualizados = (
+            _cargar_lotes(con, sql_update, actualizar, tam_lote, errores) if actualizar else 0
+        )
+        insertados = _cargar_lotes(con, sql, insertar, tam_lote, errores)
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+    errores.sort()
+
+    return {
+        "total": len(filas),
+        "insertados": insertados,
+        "actualizados": actualizados,
+        "fallidos": len(filas) - insertados - actualizados,
+        "errores": errores,
+        "ignoradas": ignoradas,
+    }
+
+
+def borrar_claves(
+    con: sqlite3.Connection, tablas: list[str], clave: str, valores: pd.Series
+) -> dict[str, int]:
+    """
+    Elimina de cada tabla de *tablas* (si existe y tiene *clave*) las filas
+    con esos *valores*, en una única transacción. Devuelve {tabla: borradas}.
+    """
+    valores_sql = [(valor_sql(v),) for v in valores]
+    borradas: dict[str, int] = {}
+    con.execute("BEGIN")
+    try:
+        for tabla in tablas:
+            if clave not in _columnas_destino(con, tabla):
+                continue
+            antes = con.total_changes
+            con.executemany(
+                f"DELETE FROM {identificador(tabla)} WHERE {identificador(clave)} = ?",
+                valores_sql,
+            )
+            borradas[tabla] = con.total_changes - antes
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+    return borradas
+
+
+def _log_tabla(nombre: str, tabla: str, res: dict) -> str:
+    log = f">> Insertando {nombre} en {tabla}...\n"
+    if res["ignoradas"]:
+        log += f"   Columnas sin destino (no se cargan): {', '.join(res['ignoradas'])}\n"
+    if not res["errores"]:
+        log += "   Todos los registros insertados correctamente.\n"
+    else:
+        for n, mensaje in res["errores"]:
+            log += f"      Error en registro {n}: {mensaje}\n"
+    log += f"   Total registros: {res['total']}\n"
+    log += f"   Registros insertados: {res['insertados']}\n"
+    if res["actualizados"]:
+        log += f"   Registros actualizados: {res['actualizados']}\n"
+    log += f"   Registros fallidos: {res['fallidos']}\n"
+    return log
+
+
+def _log_borrado(nombre: str, borradas: dict[str, int], total: int) -> str:
+    log = f">> Borrando {nombre} ({total} {CLAVE_DESTINO})...\n"
+    for tabla, n in borradas.items():
+        log += f"   {tabla}: {n} registros borrados\n"
+    return log
+
+
+def cargar_migracion(
+    ruta_db: Path,
+    tablas: dict[str, pd.DataFrame],
+    ruta_log: Path | None = None,
+    tam_lote: int = 5000,
+    actualizar: bool = False,
+) -> str:
+    """
+    Carga en *ruta_db* las tablas de `DESTINOS` presentes en *tablas*
+    ({nombre_fichero: DataFrame}) y devuelve el log; si se indica
+    *ruta_log* también lo escribe en disco.
+
+    Con *actualizar* las filas con un `CLAVE_DESTINO` ya cargado se
+    actualizan y, si *tablas* trae `BORRAR`, sus IdAnot se eliminan antes
+    de cargar.
+    """
+    con = sqlite3.connect(ruta_db, isolation_level=None)
+    try:
+        log = ""
+        if actualizar and BORRAR in tablas:
+            ids = tablas[BORRAR][CLAVE_DESTINO]
+            borradas = borrar_claves(con, list(DESTINOS.values())[::-1], CLAVE_DESTINO, ids)
+            log += _log_borrado(BORRAR, borradas, len(ids)) + "\n"
+        for nombre, tabla in DESTINOS.items():
+            if nombre in tablas:
+                res = cargar_tabla(
+                    con, tabla, tablas[nombre], tam_lote,
+                    clave=CLAVE_DESTINO if actualizar else None,
+                )
+                log += _log_tabla(nombre, tabla, res) + "\n"
+    finally:
+        con.close()
+
+    if ruta_log is not None:
+        ruta_log.write_text(log, encoding="utf-8")
+    return log
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga *_SUBIR en SQLite")
+    parser.add_argument("carpeta", type=Path, help="carpeta output_{timestamp}")
+    parser.add_argument("base", type=Path, help="fichero SQLite destino")
+    parser.add_argument("--lote", type=int, default=5000, help="filas por lote")
+    parser.add_argument("--actualizar", action="store_true",
+                        help=f"actualizar por {CLAVE_DESTINO} y aplicar {BORRAR} (incremental)")
+    args = parser.parse_args()
+
+    tablas = {
+        nombre: pd.read_excel(args.carpeta / f"{nombre}.xlsx")
+        for nombre in [*DESTINOS, BORRAR]
+        if (args.carpeta / f"{nombre}.xlsx").exists()
+    }
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(
+        cargar_migracion(
+            args.base,
+            tablas,
+            ruta_log=args.carpeta / f"migration_{timestamp}.txt",
+            tam_lote=args.lote,
+            actualizar=args.actualizar,
+        )
+    )
@@ -0,0 +1,209 @@
+# PATH: src/lotes.py
+
+"""
+Modo lote: varios libros históricos (uno por departamento / periodo).
+
+Las tablas de referencia (T_*, maestro) se cargan una vez en el proceso
+principal y se envían una sola vez a cada worker (`initializer`). Cada
+libro se extrae y transforma en su propio proceso con IdAnot desde 0; al
+terminar se desplazan los IdAnot de cada libro en el orden de la lista
+(no en el de finalización), de modo que los rangos no se solapan y son
+los mismos en cada ejecución.
+
+Las auxiliares y el informe de integridad se calculan sobre la unión de
+todos los libros, igual que si fuesen un único histórico.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src import perfil_tareas
+from src.config import FECHA_VALIDACION, ID_USUARIO_VALIDACION, PRIMER_ID_ANOT
+from src.extract import load_historico
+from src.integridad import validar_integridad
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.referencias import Referencias
+from src.utils import cache_excel, traza
+
+# Columnas de la base que necesitan las auxiliares / informe de integridad
+COLUMNAS_CLAVE = ["idusuario", "proyecto_codigo", "proyecto_nombre", "CARGADO A", "fecha"]
+
+# Estado de cada worker (lo rellena `_inicializar`)
+_REFERENCIAS: dict = {}
+
+
+def libros_historico(origen: Path | Iterable[Path]) -> list[Path]:
+    """
+    Lista de libros a procesar: los .xlsx de una carpeta (ordenados por
+    nombre, sin ficheros temporales «~$») o la lista indicada tal cual.
+    """
+    if isinstance(origen, (str, Path)) and Path(origen).is_dir():
+        return sorted(
+            p for p in Path(origen).glob("*.xlsx") if not p.name.startswith("~$")
+        )
+    if isinstance(origen, (str, Path)):
+        return [Path(origen)]
+    return [Path(p) for p in origen]
+
+
+def _inicializar(referencias: dict) -> None:
+    _REFERENCIAS.clear()
+    _REFERENCIAS.update(referencias)
+    if referencias["referencias_bd"] is not None:
+        # Cada worker abre el almacén en solo lectura en vez de recibir las tablas
+        with Referencias(referencias["referencias_bd"]) as ref:
+            _REFERENCIAS["tablas_bd"] = ref.tablas()
+    traza.fijar_filtro(referencias["traza"])
+    perfil_tareas.activar(referencias["perfil"])
+
+
+def _procesar_libro(ruta: Path) -> dict:
+    """Extracción + transformación de un libro con IdAnot desde 0."""
+    ref = _REFERENCIAS
+    inicio = time.perf_counter()
+    cache_excel.tomar_contadores()
+
+    try:
+        base, asign = load_historico(ruta)
+    except ValueError as e:          # p.ej. libro sin hoja «Base Datos»
+        raise ValueError(f"{ruta.name}: {e}") from e
+    base = (
+        base.pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    anot, trazada = preparar_anotaciones(
+        base=base,
+        asignaciones=asign,
+        usuarios_bd=ref["tablas_bd"]["usuarios"],
+        maestro_obras=ref["maestro"],
+        tareas_bd=ref["tablas_bd"]["tareas"],
+        primer_id=0,
+        ahora=ref["ahora"],
+        baja_memoria=ref["baja_memoria"],
+        depuracion=ref["depuracion"],
+    )
+    valid = preparar_anotaciones_valid(
+        anotaciones_subir=anot,
+        base_trazada=trazada,
+        fecha_validacion=ref["fecha_validacion"],
+        id_usuario_validacion=ref["id_usuario_validacion"],
+    )
+    return {
+        "libro": ruta.name,
+        "claves": base[COLUMNAS_CLAVE],
+        "anotaciones": anot,
+        "valid": valid,
+        "trazada": trazada,
+        "filas_base": len(base),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "cache": cache_excel.tomar_contadores(),
+        "traza": traza.tomar(),
+        "perfil": perfil_tareas.tomar(),
+    }
+
+
+def procesar_lote(
+    libros: list[Path],
+    *,
+    tablas_bd: dict,
+    maestro_obras: pd.DataFrame,
+    primer_id: int = PRIMER_ID_ANOT,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+    paralelo: bool = True,
+    baja_memoria: bool = False,
+    depuracion: bool = True,
+    referencias_bd: Path | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Procesa *libros* y devuelve las tablas de salida de `migracion.main`
+    unidas, más RESUMEN_LOTE (filas y rango de IdAnot por libro).
+    BASE_PROCESADA lleva la columna LIBRO con el fichero de origen.
+    Con *referencias_bd* (almacén de src/referencias.py ya actualizado)
+    los workers leen de él las tablas T_* en lugar de recibirlas.
+    """
+    if not libros:
+        raise ValueError("No hay libros históricos que procesar")
+
+    referencias = {
+        "tablas_bd": tablas_bd if referencias_bd is None else None,
+        "referencias_bd": referencias_bd,
+        "maestro": maestro_obras,
+        "ahora": datetime.now(),
+        "fecha_validacion": fecha_validacion,
+        "id_usuario_validacion": id_usuario_validacion,
+        "baja_memoria": baja_memoria,
+        "depuracion": depuracion,
+        "traza": traza.filtro(),
+        "perfil": perfil_tareas.activo(),
+    }
+    if paralelo and len(libros) > 1:
+        workers = min(len(libros), os.cpu_count() or 1)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_inicializar, initargs=(referencias,)
+        ) as pool:
+            resultados = list(pool.map(_procesar_libro, libros))
+    else:
+        _inicializar(referencias)
+        resultados = [_procesar_libro(ruta) for ruta in libros]
+
+    # ---------- rangos de IdAnot en el orden de *libros* ----------
+    siguiente = primer_id
+    resumen = []
+    for res in resultados:
+        n = len(res["anotaciones"])
+        for clave in ("anotaciones", "valid", "trazada"):
+            res[clave]["IdAnot"] = res[clave]["IdAnot"] + siguiente
+        res["trazada"]["LIBRO"] = res["libro"]
+        resumen.append(
+            {
+                "libro": res["libro"],
+                "filas_base": res["filas_base"],
+                "anotaciones": n,
+                "id_desde": siguiente if n else None,
+                "id_hasta": siguiente + n - 1 if n else None,
+                "segundos": res["segundos"],
+            }
+        )
+        cache_excel.sumar_contadores(res["cache"])
+        traza.agregar(res["traza"].assign(LIBRO=res["libro"]))
+        perfil_tareas.agregar(res["perfil"].assign(LIBRO=res["libro"]))
+        siguiente += n
+
+    anotaciones = pd.concat([r["anotaciones"] for r in resultados], ignore_index=True)
+    claves = pd.concat([r["claves"] for r in resultados], ignore_index=True)
+    usuarios_subir, obras_subir, cargado_a_subir, informe = validar_integridad(
+        claves, tablas_bd, anotaciones
+    )
+
+    return {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        "T_ANOTACIONES_SUBIR": anotaciones,
+        "T_ANOTACIONES_VALID_SUBIR": pd.concat(
+            [r["valid"] for r in resultados], ignore_index=True
+        ),
+        "BASE_PROCESADA": pd.concat(
+            [r["trazada"] for r in resultados], ignore_index=True
+        ),
+        "INFORME_INTEGRIDAD": informe,
+        "RESUMEN_LOTE": pd.DataFrame(resumen),
+    }
@@ -0,0 +1,202 @@
+# PATH: src/particiones.py
+
+"""
+Transformaciones por filas repartidas en tramos entre procesos.
+
+Con un solo histórico, las etapas que solo dependen de la propia fila
+(limpia_idusuario, desglosa_proyecto, usuarios incorrectos, maestro,
+mapeo de tareas, columnas de T_ANOTACIONES_SUBIR y VALID) se ejecutan
+sobre tramos consecutivos de la base en un pool de procesos:
+
+    • `normaliza_columnas` se aplica antes de partir, en el proceso
+      principal, para que las columnas Categorical tengan las mismas
+      categorías en todos los tramos,
+    • las referencias de solo lectura (T_*, maestro, asignaciones,
+      tabla de decisión '*' y filtro de traza) se envían una vez a cada
+      worker (`initializer`); cada tramo solo lleva sus filas,
+    • cada tramo numera sus IdAnot desde 0 y al unir se desplazan en el
+      orden de los tramos (no en el de finalización): los IdAnot y el
+      orden de las filas son los mismos que en la ejecución en serie,
+    • las auxiliares y el informe de integridad se calculan sobre la
+      unión, como en el modo lote.
+
+Se parte por rangos de filas y no por idusuario: así el orden de salida
+es el de la base sin reordenar nada.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src import perfil_tareas
+from src.config import FECHA_VALIDACION, ID_USUARIO_VALIDACION, PRIMER_ID_ANOT
+from src.integridad import validar_integridad
+from src.lotes import COLUMNAS_CLAVE
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+from src.utils import traza
+from src.utils.reglas_asterisco_tareas import fijar_tabla_decision, tabla_decision
+
+# Estado de cada worker (lo rellena `_inicializar`)
+_REFERENCIAS: dict = {}
+
+
+def _inicializar(referencias: dict) -> None:
+    _REFERENCIAS.clear()
+    _REFERENCIAS.update(referencias)
+    fijar_tabla_decision(referencias["reglas"])
+    traza.fijar_filtro(referencias["traza"])
+    perfil_tareas.activar(referencias["perfil"])
+
+
+def _procesar_tramo(tramo: pd.DataFrame) -> dict:
+    """Etapas por filas de un tramo ya normalizado, con IdAnot desde 0."""
+    ref = _REFERENCIAS
+    base = (
+        tramo.pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    anot, trazada = preparar_anotaciones(
+        base=base,
+        asignaciones=ref["asignaciones"],
+        usuarios_bd=ref["tablas_bd"]["usuarios"],
+        maestro_obras=ref["maestro"],
+        tareas_bd=ref["tablas_bd"]["tareas"],
+        primer_id=0,
+        ahora=ref["ahora"],
+        baja_memoria=ref["baja_memoria"],
+        depuracion=ref["depuracion"],
+    )
+    valid = preparar_anotaciones_valid(
+        anotaciones_subir=anot,
+        base_trazada=trazada,
+        fecha_validacion=ref["fecha_validacion"],
+        id_usuario_validacion=ref["id_usuario_validacion"],
+    )
+    return {
+        "claves": base[COLUMNAS_CLAVE],
+        "anotaciones": anot,
+        "valid": valid,
+        "trazada": trazada,
+        "traza": traza.tomar(),
+        "perfil": perfil_tareas.tomar(),
+    }
+
+
+def partir(base: pd.DataFrame, n: int) -> list[pd.DataFrame]:
+    """*base* en *n* tramos consecutivos de tamaño parecido (sin vacíos)."""
+    n = max(1, min(n, len(base)))
+    cortes = np.linspace(0, len(base), n + 1).astype(int)
+    return [base.iloc[desde:hasta] for desde, hasta in zip(cortes[:-1], cortes[1:])]
+
+
+def _unir(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    concat de *partes* en orden. Las columnas Categorical cuyas categorías
+    difieren entre tramos (las de `_por_unicos`, en orden de aparición)
+    se vuelven a unir como Categorical con las categorías en el orden de
+    aparición global, igual que en serie.
+    """
+    unido = pd.concat(partes, ignore_index=True)
+    for col in partes[0].columns:
+        if unido[col].dtype != object or not all(
+            isinstance(p[col].dtype, pd.CategoricalDtype) for p in partes
+        ):
+            continue
+        try:
+            unido[col] = pd.Series(
+                union_categoricals([p[col] for p in partes]), name=col
+            )
+        except TypeError:            # categorías de tipos distintos → se queda en object
+            pass
+    return unido
+
+
+def procesar_particionado(
+    base: pd.DataFrame,
+    *,
+    asignaciones: pd.DataFrame,
+    tablas_bd: dict,
+    maestro_obras: pd.DataFrame,
+    primer_id: int = PRIMER_ID_ANOT,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+    workers: int | None = None,
+    tramos: int | None = None,
+    baja_memoria: bool = False,
+    depuracion: bool = True,
+) -> dict[str, pd.DataFrame]:
+    """
+    Recorrido de `migracion.main` sobre la hoja *Base Datos* sin
+    normalizar, con las etapas por filas en *workers* procesos (por
+    defecto, uno por CPU) y *tramos* tramos (por defecto, uno por worker).
+
+    Devuelve las mismas tablas que la ejecución en serie.
+    """
+    workers = workers or os.cpu_count() or 1
+    base = normaliza_columnas(base)
+    partes = partir(base, tramos or workers)
+
+    referencias = {
+        "tablas_bd": {clave: tablas_bd[clave] for clave in ("usuarios", "tareas")},
+        "asignaciones": asignaciones,
+        "maestro": maestro_obras,
+        "reglas": tabla_decision(),
+        "ahora": datetime.now(),
+        "fecha_validacion": fecha_validacion,
+        "id_usuario_validacion": id_usuario_validacion,
+        "baja_memoria": baja_memoria,
+        "depuracion": depuracion,
+        "traza": traza.filtro(),
+        "perfil": perfil_tareas.activo(),
+    }
+    if workers > 1 and len(partes) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(partes)),
+            initializer=_inicializar,
+            initargs=(referencias,),
+        ) as pool:
+            resultados = list(pool.map(_procesar_tramo, partes))
+    else:
+        _inicializar(referencias)
+        # copia: en los workers cada tramo ya llega como DataFrame propio
+        resultados = [_procesar_tramo(tramo.copy()) for tramo in partes]
+    for res in resultados:
+        traza.agregar(res["traza"])
+        perfil_tareas.agregar(res["perfil"])
+
+    # ---------- IdAnot consecutivos en el orden de los tramos ----------
+    siguiente = primer_id
+    for res in resultados:
+        for clave in ("anotaciones", "valid", "trazada"):
+            res[clave]["IdAnot"] = res[clave]["IdAnot"] + siguiente
+        siguiente += len(res["anotaciones"])
+
+    anotaciones = _unir([r["anotaciones"] for r in resultados])
+    claves = _unir([r["claves"] for r in resultados])
+    usuarios_subir, obras_subir, cargado_a_subir, informe = validar_integridad(
+        claves, tablas_bd, anotaciones
+    )
+
+    return {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        "T_ANOTACIONES_SUBIR": anotaciones,
+        "T_ANOTACIONES_VALID_SUBIR": _unir([r["valid"] for r in resultados]),
+        "BASE_PROCESADA": _unir([r["trazada"] for r in resultados]),
+        "INFORME_INTEGRIDAD": informe,
+    }
@@ -0,0 +1,192 @@
+# PATH: src/perfil_tareas.py
+
+"""
+Perfil de la asignación de CodTarea: cuántas filas y horas resuelve cada
+regla y cuántas quedan sin código.
+
+Se calcula después de las transformaciones a partir de BASE_PROCESADA
+(actividad, idusuario, CATEGORIA, AsignarATarea, CodTarea, CHoras), así
+que sirve igual para el modo clásico, lote, streaming, grafo o polars.
+Una fila de la tabla por:
+
+    • regla '*'            → entrada de `_RULES` que decide (actividad,
+      nivel de la clave y tarea), o "sin regla" si ninguna casa,
+    • asignaciones_tareas  → actividad con código fijo en la hoja,
+    • #ESPECIAL#           → actividad que se deja vacía a propósito,
+    • sin asignación       → actividad que no está en la hoja.
+
+Para cada una: filas y horas, resueltas, pendientes (PEND_ASIGNACION_*),
+vacías y, de ellas, las que tenían código pero no existe en T_TAREAS.
+
+En las reglas '*', `claves` y `segundos` se miden durante la ejecución:
+con la medición activa (`activar`), `_mapear_cod_tarea` registra cada
+clave (actividad, chapa, categoria) distinta que resuelve y lo que tarda
+(`registrar`). Los modos con procesos (lote, particionado)
+devuelven lo medido en cada worker (`tomar`) y se une en el principal
+(`agregar`). Si la etapa no se ha ejecutado, `segundos` queda vacío.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.utils.reglas_asterisco_tareas import asignar_tarea_asterisco, regla_aplicada
+from src.utils.valores import texto
+
+REGLA, ASIGNACION, ESPECIAL, SIN_ASIGNACION = "*", "asignaciones_tareas", "#ESPECIAL#", "sin asignación"
+SIN_REGLA = "sin regla"
+
+COLUMNAS = [
+    "fuente", "actividad", "regla", "tarea", "claves", "filas", "horas",
+    "resueltas", "pendientes", "vacias", "no_en_t_tareas",
+    "horas_sin_resolver", "pct_resueltas", "segundos",
+]
+CLAVES = ["actividad", "chapa", "categoria"]
+
+# Medición de las reglas '*' durante la ejecución
+_ACTIVO = False
+_MEDIDAS: list[pd.DataFrame] = []
+
+
+def activar(activo: bool = True) -> None:
+    """Activa (o desactiva) la medición y descarta lo medido hasta ahora."""
+    global _ACTIVO
+
+    _ACTIVO = activo
+    _MEDIDAS.clear()
+
+
+def activo() -> bool:
+    return _ACTIVO
+
+
+def registrar(medidas: pd.DataFrame) -> None:
+    """Añade las claves resueltas (CLAVES + segundos) si se mide."""
+    if _ACTIVO and len(medidas):
+        _MEDIDAS.append(medidas)
+
+
+def tomar() -> pd.DataFrame:
+    """Devuelve lo medido (una fila por clave) y lo vacía."""
+    if not _MEDIDAS:
+        return pd.DataFrame(columns=[*CLAVES, "segundos"])
+    medidas = pd.concat(_MEDIDAS, ignore_index=True)
+    _MEDIDAS.clear()
+    claves = [c for c in medidas.columns if c != "segundos"]
+    return medidas.groupby(claves, sort=False, as_index=False)["segundos"].sum()
+
+
+def agregar(medidas: pd.DataFrame) -> None:
+    """Incorpora lo medido en otro proceso (ver `tomar`)."""
+    registrar(medidas)
+
+
+def _reglas(claves: pd.DataFrame) -> pd.DataFrame:
+    """Nivel y tarea de cada clave '*' distinta."""
+    reglas, tareas = [], []
+    for a, c, k in claves[CLAVES].itertuples(index=False):
+        tareas.append(asignar_tarea_asterisco(a, c, k))
+        reglas.append(regla_aplicada(a, c, k) or SIN_REGLA)
+    return claves.assign(regla=reglas, tarea=tareas)
+
+
+def perfil_tareas(
+    base_trazada: pd.DataFrame, medidas: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    """
+    Tabla PERFIL_TAREAS a partir de BASE_PROCESADA (con la columna LIBRO
+    del modo lote, una fila por libro y regla) y de lo medido en la
+    ejecución (por defecto, `tomar()`).
+    """
+    if medidas is None:
+        medidas = tomar()
+    actividad = texto(base_trazada["actividad"])
+    chapa = texto(base_trazada["idusuario"])
+    if "CATEGORIA" in base_trazada.columns:
+        categoria = texto(base_trazada["CATEGORIA"]).str.lower()
+    else:
+        categoria = pd.Series("", index=base_trazada.index, dtype=object)
+    asignacion = base_trazada["AsignarATarea"].fillna("").astype(str)
+    codigo = base_trazada["CodTarea"].fillna("").astype(str)
+
+    df = pd.DataFrame(
+        {
+            "actividad": actividad,
+            "chapa": chapa,
+            "categoria": categoria,
+            "fuente": np.select(
+                [asignacion == "*", asignacion == "#ESPECIAL#", asignacion == ""],
+                [REGLA, ESPECIAL, SIN_ASIGNACION],
+                ASIGNACION,
+            ),
+            "regla": "",
+            "tarea": asignacion.where(~asignacion.isin(["*", "#ESPECIAL#"]), ""),
+            "horas": pd.to_numeric(base_trazada["CHoras"], errors="coerce").fillna(0.0),
+            "resueltas": (codigo != "") & ~codigo.str.startswith("PEND_"),
+            "pendientes": codigo.str.startswith("PEND_"),
+            "vacias": codigo == "",
+        }
+    )
+    libro = ["LIBRO"] if "LIBRO" in base_trazada.columns else []
+    if libro:
+        df.insert(0, "LIBRO", base_trazada["LIBRO"].to_numpy())
+
+    # ---------- reglas '*': una resolución por clave distinta ----------
+    asterisco = (df["fuente"] == REGLA).to_numpy()
+    claves = [*libro, *CLAVES]
+    unicas = _reglas(df.loc[asterisco, claves].drop_duplicates())
+    resueltas = df.loc[asterisco, claves].merge(unicas, how="left", on=claves)
+    df.loc[asterisco, "regla"] = resueltas["regla"].to_numpy()
+    df.loc[asterisco, "tarea"] = resueltas["tarea"].to_numpy()
+    df["no_en_t_tareas"] = df["vacias"] & (df["tarea"] != "")
+
+    grupo = [*libro, "fuente", "actividad", "regla", "tarea"]
+    df["sin_resolver"] = np.where(df["resueltas"], 0.0, df["horas"])
+    perfil = df.groupby(grupo, sort=False, observed=True).agg(
+        filas=("horas", "size"),
+        horas=("horas", "sum"),
+        resueltas=("resueltas", "sum"),
+        pendientes=("pendientes", "sum"),
+        vacias=("vacias", "sum"),
+        no_en_t_tareas=("no_en_t_tareas", "sum"),
+        horas_sin_resolver=("sin_resolver", "sum"),
+    ).reset_index()
+
+    # Tiempos medidos, con la regla y tarea de cada clave
+    medidas = medidas.astype({"segundos": float}).merge(
+        unicas, how="inner", on=[c for c in claves if c in medidas.columns]
+    )
+    tiempos = (
+        medidas.assign(fuente=REGLA)
+        .groupby(grupo, sort=False)
+        .agg(claves=("segundos", "size"), segundos=("segundos", "sum"))
+        .reset_index()
+    )
+    perfil = perfil.merge(tiempos, how="left", on=grupo)
+    perfil["pct_resueltas"] = (100 * perfil["resueltas"] / perfil["filas"]).round(1)
+    perfil["horas"] = perfil["horas"].round(2)
+    perfil["horas_sin_resolver"] = perfil["horas_sin_resolver"].round(2)
+    perfil["claves"] = perfil["claves"].astype("Int64")
+    perfil["segundos"] = perfil["segundos"].round(6)
+
+    orden = {REGLA: 0, ASIGNACION: 1, ESPECIAL: 2, SIN_ASIGNACION: 3}
+    perfil = perfil.sort_values(
+        [*libro, "fuente", "filas"],
+        key=lambda s: s.map(orden) if s.name == "fuente" else s,
+        ascending=[*(True for _ in libro), True, False],
+        kind="stable",
+        ignore_index=True,
+    )
+    return perfil[[*libro, *COLUMNAS]]
+
+
+def resumen(perfil: pd.DataFrame) -> str:
+    """Una línea: % de filas y horas resueltas y actividades a revisar."""
+    filas, horas = perfil["filas"].sum(), perfil["horas"].sum()
+    revisar = perfil.loc[perfil["resueltas"] < perfil["filas"], "actividad"].nunique()
+    return (
+        f"Tareas: {perfil['resueltas'].sum() / max(filas, 1):.1%} de las filas y "
+        f"{1 - perfil['horas_sin_resolver'].sum() / horas if horas else 1:.1%} de las horas "
+        f"con CodTarea; {revisar} actividades con filas sin resolver"
+    )
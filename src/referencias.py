@@ -0,0 +1,150 @@
+# PATH: src/referencias.py
+
+"""
+Almacén de las tablas de referencia (T_USUARIOS, T_OBRAS, T_PROCESOS,
+T_TAREAS) en un fichero SQLite indexado.
+
+Se construye una vez a partir de TABLAS_BD con las columnas que usan las
+transformaciones (`COLUMNAS`, la primera es la clave, con índice) y se
+reconstruye solo cuando cambian los libros de origen (ruta, tamaño,
+mtime). Las ejecuciones y los workers lo abren en solo lectura y
+`tablas()` devuelve los DataFrames que esperan transform / integridad
+sin volver a leer Excel (ni lanzar un proceso por libro).
+
+Las columnas se crean sin tipo declarado, así que cada valor conserva el
+suyo (un IdUsuario numérico no pasa a ser texto) y las comparaciones son
+las mismas que con el DataFrame original.
+
+Uso:
+    python -m src.referencias ./archivos/TABLAS_BD .cache/referencias.sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.extract import TABLAS_BD
+from src.utils.cache_excel import leer_excel
+from src.utils.grafo import huella_ficheros
+from src.utils.sql import identificador, valor_sql
+
+# tabla → columnas que se guardan (la primera es la clave)
+COLUMNAS = {
+    "usuarios": ["IdUsuario", "PagaHE"],
+    "obras": ["ClaveObra"],
+    "procesos": ["IdProceso"],
+    "tareas": ["CodTarea"],
+}
+
+
+def _huella(carpeta_bd: Path) -> str:
+    rutas = [Path(carpeta_bd) / fichero for fichero in TABLAS_BD.values()]
+    return huella_ficheros(*rutas) + repr(COLUMNAS)
+
+
+def _construir(carpeta_bd: Path, ruta: Path, huella: str) -> None:
+    """Escribe el almacén en un fichero temporal y lo sustituye de golpe."""
+    tmp = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    try:
+        with con:
+            con.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            con.execute("INSERT INTO meta VALUES ('huella', ?)", (huella,))
+            for nombre, columnas in COLUMNAS.items():
+                df = leer_excel(Path(carpeta_bd) / TABLAS_BD[nombre])
+                clave = columnas[0]
+                con.execute(
+                    f"CREATE TABLE {identificador(nombre)} "
+                    f"({', '.join(map(identificador, columnas))})"
+                )
+                con.executemany(
+                    f"INSERT INTO {identificador(nombre)} "
+                    f"VALUES ({', '.join('?' for _ in columnas)})",
+                    (
+                        tuple(valor_sql(v) for v in fila)
+                        for fila in df[columnas].itertuples(index=False, name=None)
+                    ),
+                )
+                unico = "UNIQUE " if df[clave].is_unique else ""
+                con.execute(
+                    f"CREATE {unico}INDEX {identificador('ix_' + nombre)} "
+                    f"ON {identificador(nombre)} ({identificador(clave)})"
+                )
+    finally:
+        con.close()
+    os.replace(tmp, ruta)
+
+
+def actualizar(carpeta_bd: Path, ruta: Path) -> bool:
+    """Reconstruye el almacén si falta o si cambió TABLAS_BD. True si lo hizo."""
+    ruta = Path(ruta)
+    huella = _huella(carpeta_bd)
+    if ruta.exists():
+        con = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        try:
+            actual = con.execute("SELECT valor FROM meta WHERE clave = 'huella'").fetchone()
+        except sqlite3.Error:        # fichero dañado o de otra versión
+            actual = None
+        finally:
+            con.close()
+        if actual is not None and actual[0] == huella:
+            return False
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    _construir(carpeta_bd, ruta, huella)
+    return True
+
+
+class Referencias:
+    """Acceso de solo lectura al almacén (una conexión por proceso)."""
+
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self._con = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True)
+
+    def cerrar(self) -> None:
+        self._con.close()
+
+    def __enter__(self) -> "Referencias":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cerrar()
+
+    def tabla(self, nombre: str) -> pd.DataFrame:
+        """Tabla *nombre* con las columnas de `COLUMNAS`, en el orden de origen."""
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(map(identificador, COLUMNAS[nombre]))} "
+            f"FROM {identificador(nombre)} ORDER BY rowid",
+            self._con,
+        )
+        # NULL → NaN, como en read_excel
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        return df
+
+    def tablas(self) -> dict[str, pd.DataFrame]:
+        """Las tablas de TABLAS_BD, con las mismas claves que `load_tablas_bd`."""
+        return {nombre: self.tabla(nombre) for nombre in COLUMNAS}
+
+
+def tablas_bd(carpeta_bd: Path, ruta: Path) -> dict[str, pd.DataFrame]:
+    """`load_tablas_bd` a través del almacén (reconstruido si hace falta)."""
+    actualizar(carpeta_bd, ruta)
+    with Referencias(ruta) as ref:
+        return ref.tablas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén SQLite de T_USUARIOS / T_OBRAS / ...")
+    parser.add_argument("carpeta", type=Path, help="carpeta TABLAS_BD")
+    parser.add_argument("almacen", type=Path, help="fichero SQLite")
+    args = parser.parse_args()
+
+    print("reconstruido" if actualizar(args.carpeta, args.almacen) else "al día")
@@ -0,0 +1,171 @@
+# PATH: src/streaming.py
+
+"""
+Modo por bloques para históricos grandes.
+
+La hoja *Base Datos* se lee en bloques (`iter_hoja`) y cada bloque pasa
+por las transformaciones que solo dependen de la propia fila
+(normalización, maestro, mapeo de tareas, construcción de anotaciones).
+Con *output_dir* las tablas por fila (`TABLAS_POR_BLOQUE`) se escriben
+en cuanto cada bloque está listo (`EscritorBloques`: csv, parquet o
+xlsx_stream) y no se guardan en memoria. Entre bloques solo se arrastra
+el estado global imprescindible:
+    • las columnas clave de la base (`COLUMNAS_CLAVE`: usuario, obra,
+      CARGADO A y fecha) y de las anotaciones (`COLUMNAS_CLAVE_ANOTACIONES`)
+      para las auxiliares y el informe de integridad,
+    • el siguiente IdAnot libre.
+
+Sin *output_dir* se devuelven todas las tablas, como `migracion.main`,
+para quien las necesite enteras (delta, agregación, perfil…).
+"""
+
+from __future__ import annotations
+
+import contextlib
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import FECHA_VALIDACION, ID_USUARIO_VALIDACION, PRIMER_ID_ANOT
+from src.export import EscritorBloques, exportar_dataframes
+from src.extract import iter_hoja
+from src.integridad import validar_integridad
+from src.lotes import COLUMNAS_CLAVE
+from src.transform import (
+    normaliza_columnas,
+    limpia_idusuario,
+    desglosa_proyecto,
+    borrar_registros_usuarios_incorrectos,
+    preparar_anotaciones,
+    preparar_anotaciones_valid,
+)
+
+# Tablas con una fila por línea del histórico: se escriben bloque a bloque
+TABLAS_POR_BLOQUE = ["T_ANOTACIONES_SUBIR", "T_ANOTACIONES_VALID_SUBIR", "BASE_PROCESADA"]
+# Columnas de T_ANOTACIONES_SUBIR que comprueba el informe de integridad
+COLUMNAS_CLAVE_ANOTACIONES = ["CodTarea", "IdProceso"]
+
+
+def _normalizar(bloques: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Transformaciones básicas de `migracion.main`, bloque a bloque."""
+    for bloque in bloques:
+        yield (
+            bloque.pipe(normaliza_columnas)
+            .pipe(limpia_idusuario)
+            .pipe(desglosa_proyecto)
+            .pipe(borrar_registros_usuarios_incorrectos)
+        )
+
+
+def procesar_en_bloques(
+    fichero: Path,
+    *,
+    asignaciones: pd.DataFrame,
+    tablas_bd: dict,
+    maestro_obras: pd.DataFrame,
+    primer_id: int = PRIMER_ID_ANOT,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+    filas_por_bloque: int = 50_000,
+    baja_memoria: bool = False,
+    depuracion: bool = True,
+    output_dir: Path | None = None,
+    formato: str | dict[str, str] = "xlsx",
+) -> tuple[dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Ejecuta el pipeline completo leyendo *Base Datos* por bloques.
+    *baja_memoria* y *depuracion* se pasan a `preparar_anotaciones`.
+
+    Con *output_dir* las siete tablas se escriben ahí en *formato* (como
+    en `exportar_dataframes`; "xlsx" se escribe como "xlsx_stream") y
+    las de `TABLAS_POR_BLOQUE` no se devuelven.
+
+    Devuelve ({nombre_tabla: DataFrame}, informe de escritura como el de
+    `exportar_dataframes` o vacío).
+    """
+    ahora = datetime.now()
+    siguiente_id = primer_id
+
+    claves: list[pd.DataFrame] = []
+    claves_anot: list[pd.DataFrame] = []
+    acumuladas: dict[str, list[pd.DataFrame]] = {n: [] for n in TABLAS_POR_BLOQUE}
+    escritores: dict[str, EscritorBloques] = {}
+    informe_escritura: list[dict] = []
+
+    with contextlib.ExitStack() as pila:
+        if output_dir is not None:
+            # la pila cierra en orden inverso: el informe sale en el de la lista
+            for nombre in reversed(TABLAS_POR_BLOQUE):
+                escritores[nombre] = EscritorBloques(
+                    output_dir,
+                    nombre,
+                    formato.get(nombre, "xlsx") if isinstance(formato, dict) else formato,
+                )
+                pila.callback(
+                    lambda e=escritores[nombre]: informe_escritura.append(e.cerrar())
+                )
+
+        bloques = _normalizar(iter_hoja(fichero, "Base Datos", filas_por_bloque))
+        for bloque in bloques:
+            # --- estado para las auxiliares y el informe de integridad
+            claves.append(bloque[COLUMNAS_CLAVE])
+
+            # --- anotaciones del bloque con IdAnot consecutivos
+            anot, trazada = preparar_anotaciones(
+                base=bloque,
+                asignaciones=asignaciones,
+                usuarios_bd=tablas_bd["usuarios"],
+                maestro_obras=maestro_obras,
+                tareas_bd=tablas_bd["tareas"],
+                primer_id=siguiente_id,
+                ahora=ahora,
+                baja_memoria=baja_memoria,
+                depuracion=depuracion,
+            )
+            siguiente_id += len(anot)
+            claves_anot.append(anot[COLUMNAS_CLAVE_ANOTACIONES])
+
+            valid = preparar_anotaciones_valid(
+                anotaciones_subir=anot,
+                base_trazada=trazada,
+                fecha_validacion=fecha_validacion,
+                id_usuario_validacion=id_usuario_validacion,
+            )
+            tablas = {
+                "T_ANOTACIONES_SUBIR": anot,
+                "T_ANOTACIONES_VALID_SUBIR": valid,
+                "BASE_PROCESADA": trazada,
+            }
+            for nombre, df in tablas.items():
+                if nombre in escritores:
+                    escritores[nombre].anadir(df)
+                else:
+                    acumuladas[nombre].append(df)
+
+    if not claves:
+        raise ValueError(f"{Path(fichero).name}: la hoja 'Base Datos' está vacía")
+
+    # --- auxiliares e informe: necesitan ver todos los bloques
+    usuarios_subir, obras_subir, cargado_a_subir, informe = validar_integridad(
+        pd.concat(claves, ignore_index=True),
+        tablas_bd,
+        pd.concat(claves_anot, ignore_index=True),
+    )
+    salidas = {
+        "AUX_USUARIOS_SUBIR_DEBE_CONTENER": usuarios_subir,
+        "AUX_T_OBRAS_SUBIR_DEBE_CONTENER": obras_subir,
+        "AUX_T_OBRAS_CARGADO_A_SUBIR_DEBE_CONTENER": cargado_a_subir,
+        **{
+            nombre: pd.concat(partes, ignore_index=True)
+            for nombre, partes in acumuladas.items()
+            if nombre not in escritores
+        },
+        "INFORME_INTEGRIDAD": informe,
+    }
+    if output_dir is None:
+        return salidas, pd.DataFrame()
+
+    informe_escritura += exportar_dataframes(output_dir, salidas, formato).to_dict("records")
+    return salidas, pd.DataFrame(informe_escritura)
@@ -1,9 +1,26 @@
 # PATH: src/transform.py
 
-import pandas as pd, re
+import numpy as np
+import pandas as pd, re, time
 from datetime import datetime
 
-from src.utils.reglas_asterisco_tareas import asignar_tarea_asterisco
+from src import perfil_tareas
+from src.config import FECHA_VALIDACION, ID_USUARIO_VALIDACION, PRIMER_ID_ANOT
+from src.utils import traza
+from src.utils.valores import factorizar, texto, tipo_unico
+from src.utils.reglas_asterisco_tareas import asignar_tarea_asterisco, regla_aplicada
+from src.utils.fechas import (
+    parsear_fechas,
+    formatear_fechas,
+    texto_fecha,
+    resumen_no_validas,
+)
+from src.integridad import (
+    claves_referencia,
+    usuarios_faltantes,
+    obras_faltantes,
+    cargado_a_faltantes,
+)
 
 # ---------------------------------------------------------------------- #
 #  -------------------------  NORMALIZACIÓN  --------------------------- #
@@ -18,22 +35,57 @@ RENAME = {
     "OBSERVACIONES": "obs",
 }
 
+# Columnas con pocos valores distintos: se llevan como Categorical si
+# todos sus valores son del mismo tipo (CARGADO A mezcla textos y números)
+CATEGORICAS = ["proyecto", "actividad", "CARGADO A"]
+
+def _categorica(valores: pd.Series, codigos: np.ndarray, serie: pd.Series) -> pd.Series:
+    """`valores[codigos]` con el índice de *serie*: Categorical si son de un solo tipo."""
+    if not tipo_unico(valores):
+        return pd.Series(
+            valores.to_numpy(dtype=object)[codigos], index=serie.index, name=serie.name, dtype=object
+        )
+    inversa, categorias = pd.factorize(valores)
+    return pd.Series(
+        pd.Categorical.from_codes(inversa[codigos], categorias),
+        index=serie.index,
+        name=serie.name,
+    )
+
+def _por_unicos(serie: pd.Series, func) -> pd.Series:
+    """
+    Aplica *func* una vez por valor distinto de *serie* (NaN incluido) y
+    devuelve el resultado como Categorical con el mismo índice (object si
+    los resultados mezclan tipos). 1234 y 1234.0 son valores distintos.
+    """
+    codigos, unicos = factorizar(serie, use_na_sentinel=False)
+    valores = pd.Series([func(v) for v in unicos], dtype=object)
+    return _categorica(valores, codigos, serie)
+
 def normaliza_columnas(df: pd.DataFrame) -> pd.DataFrame:
-    return df.rename(columns=RENAME)
+    df = df.rename(columns=RENAME)
+    for col in CATEGORICAS:
+        if col in df.columns and tipo_unico(df[col]):
+            df[col] = df[col].astype("category")
+    return df
 
 def limpia_idusuario(df: pd.DataFrame) -> pd.DataFrame:
-    df["idusuario"] = (
-        df["idusuario_raw"].astype(str).str.replace(r"\.0$", "", regex=True).str.strip()
+    patron = re.compile(r"\.0$")
+    df["idusuario"] = _por_unicos(
+        df["idusuario_raw"], lambda v: patron.sub("", str(v)).strip()
     )
     return df
 
 def desglosa_proyecto(df: pd.DataFrame) -> pd.DataFrame:
     pat = re.compile(r"\((\d+)\)")
-    df["proyecto_codigo"] = df["proyecto"].apply(
-        lambda s: pat.search(str(s)).group(1) if pat.search(str(s)) else str(s).strip()
-    )
-    df["proyecto_nombre"] = df["proyecto"].apply(
-        lambda s: pat.sub("", str(s)).strip(" -")
+
+    def _codigo(s):
+        m = pat.search(str(s))
+        return m.group(1) if m else str(s).strip()
+
+    df["proyecto_codigo"] = _por_unicos(df["proyecto"], _codigo)
+    df["proyecto_nombre"] = _por_unicos(
+        df["proyecto"], lambda s: pat.sub("", str(s)).strip(" -")
     )
     return df
 
@@ -58,14 +110,15 @@ def borrar_registros_usuarios_incorrectos(df: pd.DataFrame) -> pd.DataFrame:
         "11292"
     ]
     
-    # Convertir a string para asegurar comparación correcta
-    df_filtrado = df[~df["idusuario"].astype(str).isin(usuarios_incorrectos)].copy()
-    
-    # Informar de cuántos registros se eliminaron
-    registros_eliminados = len(df) - len(df_filtrado)
-    print(f"Se eliminaron {registros_eliminados} registros de usuarios incorrectos")
-    
-    return df_filtrado
+    # idusuario ya es texto (limpia_idusuario)
+    incorrectos = df["idusuario"].isin(usuarios_incorrectos)
+    if traza.activa():
+        traza.registrar(
+            "usuarios_incorrectos", df[incorrectos], "fila", "", "eliminada",
+            "chapa en la lista de usuarios incorrectos",
+        )
+    # (el nº de filas eliminadas queda en el informe de etapas)
+    return df[~incorrectos].copy()
 # ---------------------------------------------------------------------- #
 #  -------------------------  AUXILIARES  ------------------------------ #
 # ---------------------------------------------------------------------- #
@@ -73,63 +126,24 @@ def analizar_cargado_a(
     base: pd.DataFrame, obras_exist: pd.DataFrame, obras_subir: pd.DataFrame
 ) -> pd.DataFrame:
     """Detecta valores únicos de 'CARGADO A' no presentes ni en obras existentes ni en las que ya vamos a subir."""
-    cargados = base["CARGADO A"].dropna().astype(str).str.strip().unique()
-    obras_existentes = obras_exist["ClaveObra"].astype(str)
-    obras_a_subir = obras_subir["ClaveObra"].astype(str)
-
-    faltantes = [
-        v
-        for v in cargados
-        if v not in obras_existentes.values and v not in obras_a_subir.values
-    ]
-
-    return pd.DataFrame({"ClaveObra": faltantes, "NomObra": [""] * len(faltantes)})
+    return cargado_a_faltantes(base, obras_exist, obras_subir)
 
 def tablas_auxiliares(
     base: pd.DataFrame, usuarios: pd.DataFrame, obras: pd.DataFrame
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
-    # ----- Usuarios
-    faltan_u = base.loc[~base["idusuario"].isin(usuarios["IdUsuario"])].copy()
-    usuarios_subir = (
-        faltan_u[["idusuario"]]
-        .drop_duplicates()
-        .assign(NomUsuario="", ClaveUsuario="", PagaHE="")
-    )
-
-    # ----- Obras
-    faltan_o = base.loc[~base["proyecto_codigo"].isin(obras["ClaveObra"])].copy()
-    obras_subir = (
-        faltan_o[["proyecto_codigo", "proyecto_nombre"]]
-        .drop_duplicates()
-        .rename(columns={"proyecto_codigo": "ClaveObra", "proyecto_nombre": "NomObra"})
-    )
-    return usuarios_subir, obras_subir
+    """Usuarios y obras de la base que faltan en T_USUARIOS / T_OBRAS."""
+    return usuarios_faltantes(base, usuarios), obras_faltantes(base, obras)
 
 # ---------------------------------------------------------------------- #
 #  --------------------  PREPARACIÓN ANOTACIONES  ---------------------- #
 # ---------------------------------------------------------------------- #
-def _aplicar_maestro(base: pd.DataFrame, maestro: pd.DataFrame) -> pd.DataFrame:
-    """Aplica las reglas del maestro de modificaciones de obra."""
+def _reglas_maestro(maestro: pd.DataFrame) -> tuple[list[str], dict[str, str]]:
+    """Devuelve (obras a borrar, mapa ClaveObra → CambiarAObra)."""
     maestro = maestro.rename(columns=str.strip)
-    
-    # 0) Guardar los valores originales para depuración
-    base["DBG_Proyecto_original"] = base["proyecto_codigo"].copy()
-    if "CARGADO A" in base.columns:
-        base["DBG_CargadoA_original"] = base["CARGADO A"].copy()
-
-    # 1) Identificar obras a borrar
     borrar = maestro.loc[
         maestro["CambiarAObra"].astype(str).str.lower() == "borrar", "ClaveObra"
     ].astype(str).tolist()
-    
-    # 1.a) Eliminar filas donde proyecto_codigo está en la lista de borrar
-    base = base.loc[~base["proyecto_codigo"].isin(borrar)].copy()
-    
-    # 1.b) Eliminar filas donde CARGADO A está en la lista de borrar
-    if "CARGADO A" in base.columns:
-        base = base.loc[~base["CARGADO A"].astype(str).isin(borrar)].copy()
 
-    # 2) Cambios de clave obra
     cambios = maestro.dropna(subset=["CambiarAObra"])
     cambios = cambios[cambios["CambiarAObra"].astype(str).str.lower() != "borrar"]  # Excluir las obras a borrar
     mapa = dict(
@@ -138,34 +152,227 @@ def _aplicar_maestro(base: pd.DataFrame, maestro: pd.DataFrame) -> pd.DataFrame:
             cambios["CambiarAObra"].astype(str),
         )
     )
-    base["ClaveObra"] = base["proyecto_codigo"].replace(mapa)
+    return borrar, mapa
+
+def _trazar_maestro(antes: pd.DataFrame, despues: pd.DataFrame) -> None:
+    """Filas seguidas que el maestro borra o cuya obra cambia."""
+    borradas = antes[~antes.index.isin(despues.index)]
+    traza.registrar("maestro", borradas, "fila", "", "eliminada", "maestro: borrar")
+
+    codigo = despues["proyecto_codigo"].astype(object)
+    cambia = (codigo != despues["ClaveObra"].astype(object)).to_numpy()
+    traza.registrar(
+        "maestro", despues[cambia], "ClaveObra",
+        codigo[cambia], despues.loc[cambia, "ClaveObra"], "maestro: CambiarAObra",
+    )
+    if "CARGADO A" in despues.columns:
+        original = antes.loc[despues.index, "CARGADO A"].astype(object)
+        final = despues["CARGADO A"].astype(object)
+        cambia = (original.notna() & (original.astype(str) != final.astype(str))).to_numpy()
+        traza.registrar(
+            "maestro", despues[cambia], "CARGADO A",
+            original[cambia], final[cambia], "maestro: CambiarAObra",
+        )
 
-    # Donde no haya coincidencia se mantiene la clave original
-    base["ClaveObra"] = base["ClaveObra"].fillna(base["proyecto_codigo"])
+def _aplicar_maestro(
+    base: pd.DataFrame, maestro: pd.DataFrame, depuracion: bool = True
+) -> pd.DataFrame:
+    """Aplica las reglas del maestro de modificaciones de obra."""
+    borrar, mapa = _reglas_maestro(maestro)
+    antes = base
     
-    # 3) Aplicar las mismas reglas al campo "CARGADO A"
-    if "CARGADO A" in base.columns:
-        # Solo intentamos reemplazar si hay valores no nulos
-        cargado_mask = base["CARGADO A"].notna()
-        if cargado_mask.any():
-            # Aplicamos el mapeo solo a las filas con valores no nulos
-            base.loc[cargado_mask, "CARGADO A"] = (
-                base.loc[cargado_mask, "CARGADO A"]
-                .astype(str)
-                .replace(mapa)
-            )
+    # 0) Guardar los valores originales para depuración
+    if depuracion:
+        base["DBG_Proyecto_original"] = base["proyecto_codigo"].copy()
+        if "CARGADO A" in base.columns:
+            base["DBG_CargadoA_original"] = base["CARGADO A"].copy()
+
+    # 1.a) Eliminar filas donde proyecto_codigo está en la lista de borrar
+    base = base.loc[~base["proyecto_codigo"].isin(borrar)].copy()
     
+    # 1.b) Eliminar filas donde CARGADO A está en la lista de borrar
+    if "CARGADO A" in base.columns:
+        cargado_txt = _por_unicos(base["CARGADO A"], str)
+        base = base.loc[~cargado_txt.isin(borrar)].copy()
+
+    # 2) Cambios de clave obra
+    # Donde no haya coincidencia se mantiene la clave original
+    base["ClaveObra"] = _por_unicos(base["proyecto_codigo"], lambda v: mapa.get(v, v))
+
+    # 3) Aplicar las mismas reglas al campo "CARGADO A" (los nulos se quedan nulos)
+    if "CARGADO A" in base.columns:
+        base["CARGADO A"] = _por_unicos(
+            base["CARGADO A"],
+            lambda v: v if pd.isna(v) else mapa.get(str(v), str(v)),
+        )
+
+    if traza.activa():
+        _trazar_maestro(antes, base)
+    return base
+
+def _remapear(serie: pd.Series, mapa: dict[str, str]) -> pd.Series:
+    """
+    `mapa.get(str(v), str(v))` con los nulos intactos, resuelto con un
+    único `Index.map` sobre los valores distintos. Devuelve Categorical
+    (object si los resultados mezclan tipos).
+    """
+    codigos, unicos = factorizar(serie, use_na_sentinel=False)
+    texto = unicos.astype(str)
+    nuevos = texto.map(mapa)
+    nuevos = nuevos.where(nuevos.notna(), texto).where(unicos.notna(), unicos)
+    return _categorica(pd.Series(nuevos, dtype=object), codigos, serie)
+
+def _aplicar_maestro_en_sitio(
+    base: pd.DataFrame, maestro: pd.DataFrame, depuracion: bool = False
+) -> pd.DataFrame:
+    """
+    Igual que `_aplicar_maestro` pero sin copias intermedias: una sola
+    máscara de borrado, una sola selección de filas (ninguna copia de
+    datos si no se borra nada) y columnas DBG_* solo con *depuracion*.
+    *base* no se modifica.
+    """
+    borrar, mapa = _reglas_maestro(maestro)
+    tiene_cargado = "CARGADO A" in base.columns
+    antes = base
+
+    borra = base["proyecto_codigo"].isin(borrar).to_numpy()
+    if tiene_cargado:
+        borra |= _por_unicos(base["CARGADO A"], str).isin(borrar).to_numpy()
+    if borra.any():
+        base = base.take(np.flatnonzero(~borra))
+    else:
+        base = base.copy(deep=False)
+
+    if depuracion:
+        base["DBG_Proyecto_original"] = base["proyecto_codigo"]
+        if tiene_cargado:
+            base["DBG_CargadoA_original"] = base["CARGADO A"]
+
+    base["ClaveObra"] = _remapear(base["proyecto_codigo"], mapa)
+    if tiene_cargado:
+        base["CARGADO A"] = _remapear(base["CARGADO A"], mapa)
+    if traza.activa():
+        _trazar_maestro(antes, base)
     return base
 
+def _trazar_tareas(
+    base: pd.DataFrame,
+    actividad: pd.Series,
+    chapa: pd.Series,
+    categoria: pd.Series,
+    asignacion: pd.Series,
+    codigo: pd.Series,
+    no_valido: pd.Series,
+) -> None:
+    """Regla que decide el CodTarea de cada fila seguida."""
+    sel = traza.seguidas(base)
+    if not sel.any():
+        return
+    asig = asignacion[sel]
+    regla = np.select(
+        [asig == "*", asig == "#ESPECIAL#", asig == ""],
+        ["*", "#ESPECIAL# → vacío", "actividad sin asignación"],
+        "asignaciones_tareas",
+    ).astype(object)
+    asterisco = (asig == "*").to_numpy()
+    regla[asterisco] = [
+        f"* {regla_aplicada(a, c, k) or 'sin regla → PEND'}"
+        for a, c, k in zip(actividad[sel][asterisco], chapa[sel][asterisco], categoria[sel][asterisco])
+    ]
+    invalida = no_valido[sel].to_numpy()
+    regla[invalida] = [f"{r} → {c} no está en T_TAREAS" for r, c in zip(regla[invalida], codigo[sel][invalida])]
+    final = codigo[sel].where(~invalida, "")
+    traza.registrar("tareas", base[sel], "CodTarea", asig, final, regla)
+
 def _mapear_cod_tarea(
     base: pd.DataFrame,
     asignaciones: pd.DataFrame,
     tareas_bd: pd.DataFrame,
+    modo: str = "columnar",
 ) -> pd.DataFrame:
     """
     Devuelve un DataFrame con:
         • CodTarea         → código final asignado
         • AsignarATarea    → valor bruto de la hoja *asignaciones_tareas*
+
+    Con ``modo="columnar"`` (por defecto) la resolución se hace por columnas:
+    el mapeo actividad → AsignarATarea es un join, los '*' se resuelven una
+    vez por combinación (actividad, chapa, categoria) y la validación contra
+    T_TAREAS es un ``isin``. ``modo="filas"`` usa el bucle original.
+    """
+    if modo == "filas":
+        return _mapear_cod_tarea_filas(base, asignaciones, tareas_bd)
+    if modo != "columnar":
+        raise ValueError(f"Modo de mapeo de tareas desconocido: {modo!r}")
+
+    asign = asignaciones.rename(columns=str.strip)
+    asign["Tarea"] = asign["Tarea"].str.strip()
+    asign["AsignarATarea"] = asign["AsignarATarea"].astype(str).str.strip()
+    mapa_asign = dict(zip(asign["Tarea"], asign["AsignarATarea"]))
+
+    tareas_validas = claves_referencia(tareas_bd["CodTarea"], como_texto=True)
+
+    actividad = texto(base["actividad"])
+    chapa = texto(base["idusuario"])
+    if "CATEGORIA" in base.columns:
+        categoria = texto(base["CATEGORIA"]).str.lower()
+    else:
+        categoria = pd.Series("", index=base.index, dtype=object)
+
+    # ---------------- resolución -----------------
+    asignacion = actividad.map(mapa_asign).fillna("").astype(object)
+    codigo = asignacion.copy()
+    codigo[asignacion == "#ESPECIAL#"] = ""
+
+    asterisco = asignacion == "*"
+    if asterisco.any():
+        claves = pd.DataFrame(
+            {
+                "actividad": actividad[asterisco],
+                "chapa": chapa[asterisco],
+                "categoria": categoria[asterisco],
+            }
+        )
+        unicas = claves.drop_duplicates()
+        medir = perfil_tareas.activo()     # sin PERFIL_TAREAS no se cronometra
+        codigos, segundos = [], []
+        for a, c, k in unicas.itertuples(index=False):
+            inicio = time.perf_counter() if medir else 0.0
+            codigos.append(
+                asignar_tarea_asterisco(actividad=a, chapa=c, categoria=k)
+                or "PEND_ASIGNACION_*"
+            )
+            if medir:
+                segundos.append(time.perf_counter() - inicio)
+        if medir:
+            perfil_tareas.registrar(unicas.assign(segundos=segundos))
+        unicas = unicas.assign(codigo=codigos)
+        codigo[asterisco] = claves.merge(
+            unicas, how="left", on=["actividad", "chapa", "categoria"]
+        )["codigo"].to_numpy()
+
+    # --- verificar que exista en T_TAREAS --------------
+    no_valido = (
+        (codigo != "")
+        & ~codigo.str.startswith("PEND_")
+        & ~codigo.isin(tareas_validas)
+    )
+    if traza.activa():
+        _trazar_tareas(base, actividad, chapa, categoria, asignacion, codigo, no_valido)
+    codigo[no_valido] = ""         # marcar para revisión
+
+    return pd.DataFrame(
+        {"CodTarea": codigo.tolist(), "AsignarATarea": asignacion.tolist()}
+    )
+
+def _mapear_cod_tarea_filas(
+    base: pd.DataFrame,
+    asignaciones: pd.DataFrame,
+    tareas_bd: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Versión fila a fila de `_mapear_cod_tarea` (referencia para comparar
+    resultados con el modo columnar).
     """
     asign = asignaciones.rename(columns=str.strip)
     asign["Tarea"] = asign["Tarea"].str.strip()
@@ -175,6 +382,8 @@ def _mapear_cod_tarea(
     tareas_validas = set(tareas_bd["CodTarea"].astype(str))
 
     cod_out, asign_out = [], []
+    medir = perfil_tareas.activo()
+    segundos: dict[tuple[str, str, str], float] = {}
 
     for _, row in base.iterrows():
         act_original  = str(row["actividad"]).strip()
@@ -183,14 +392,8 @@ def _mapear_cod_tarea(
         categoria     = str(row.get("CATEGORIA", "")).strip().lower()
 
         # ---------------- resolución -----------------
-        cond_debug = (
-            act_original == "U20-FASE COORDINACION: Definir proceso fabr. + Reuniones IP/Fabr. + Acta + Informe mejora + Listado utillajes"
-            or  act_original == "U21-FASE COORDINACION: Analisis de planos y creación del listado de herramientas"
-        )
-        if cond_debug:
-            print(f"Asignación U20 o U21. Asignación: {asignacion}")
-        
         if asignacion == "*":
+            inicio = time.perf_counter() if medir else 0.0
             codigo = (
                 asignar_tarea_asterisco(
                     actividad=act_original,
@@ -199,17 +402,15 @@ def _mapear_cod_tarea(
                 )
                 or "PEND_ASIGNACION_*"
             )
+            if medir:
+                clave = (act_original, chapa, categoria)
+                segundos[clave] = segundos.get(clave, 0.0) + time.perf_counter() - inicio
         elif asignacion == "#ESPECIAL#":
             codigo = ""
         else:
             codigo = asignacion
 
         # --- verificar que exista en T_TAREAS --------------
-
-        if cond_debug:
-            print(f"Asignación: {asignacion} → Código: {codigo}")
-        
-        
         if (
             codigo
             and not codigo.startswith("PEND_")
@@ -220,6 +421,13 @@ def _mapear_cod_tarea(
         cod_out.append(codigo)
         asign_out.append(asignacion)
 
+    if medir:
+        perfil_tareas.registrar(
+            pd.DataFrame(
+                [(*clave, s) for clave, s in segundos.items()],
+                columns=[*perfil_tareas.CLAVES, "segundos"],
+            )
+        )
     return pd.DataFrame({"CodTarea": cod_out, "AsignarATarea": asign_out})
 
 # ------------------------------------------------------------------ #
@@ -235,36 +443,72 @@ def preparar_anotaciones(
     usuarios_bd: pd.DataFrame,
     maestro_obras: pd.DataFrame,
     tareas_bd: pd.DataFrame,
-    primer_id: int = 47000,
+    primer_id: int = PRIMER_ID_ANOT,
+    ahora: datetime | None = None,
+    ids_existentes: pd.Series | None = None,
+    baja_memoria: bool = False,
+    depuracion: bool = True,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Devuelve una tupla:
         • T_ANOTACIONES_SUBIR (DataFrame listo para Excel)
         • BASE_PROCESADA      (mismo contenido que *base* pero con la
           columna IdAnot añadida para trazabilidad)
+
+    *ahora* fija FCREA/FMODIFI (por defecto, el momento de la llamada).
+    *ids_existentes* (mismo índice que *base*) conserva los IdAnot ya
+    emitidos en ejecuciones anteriores; las filas con NaN reciben ids
+    nuevos consecutivos a partir de *primer_id*.
+
+    Con *baja_memoria* el maestro se aplica sin copias intermedias y las
+    columnas de tarea se asignan sin concat.
+    Sin *depuracion* no se generan las columnas DBG_*.
+
+    La columna fecha de BASE_PROCESADA queda como datetime64; las fechas
+    que no se pueden interpretar quedan vacías y se avisa de ellas.
     """
     # --- ajustes de obra (borrar / renombrar claves)
-    base = _aplicar_maestro(base, maestro_obras).copy()
-
-    # --- numérico a CHoras
+    if baja_memoria:
+        base = _aplicar_maestro_en_sitio(base, maestro_obras, depuracion)
+    else:
+        base = _aplicar_maestro(base, maestro_obras, depuracion).copy()
+    indice_original = base.index
+
+    # --- fecha tipada (una vez por fecha distinta) y numérico a CHoras
+    fechas, no_validas = parsear_fechas(base["fecha"])
+    aviso = resumen_no_validas(base["fecha"], no_validas)
+    if aviso:
+        print(f"Aviso: {aviso}")
+    base["fecha"] = fechas
     base["CHoras"] = pd.to_numeric(base["choras"], errors="coerce")
 
     # --- mapeo de tarea + columnas debug
     tarea_df = _mapear_cod_tarea(base, asignaciones, tareas_bd)
-    base = pd.concat([base.reset_index(drop=True), tarea_df], axis=1)
+    if baja_memoria:
+        base.reset_index(drop=True, inplace=True)
+        for col in tarea_df.columns:
+            base[col] = tarea_df[col].to_numpy()
+    else:
+        base = pd.concat([base.reset_index(drop=True), tarea_df], axis=1)
 
     # ---------- IdAnot para ambas tablas ---------------
-    ids = list(range(primer_id, primer_id + len(base)))
+    if ids_existentes is None:
+        ids = list(range(primer_id, primer_id + len(base)))
+    else:
+        previos = ids_existentes.reindex(indice_original).to_numpy(dtype=float)
+        nuevos = pd.isna(previos)
+        previos[nuevos] = range(primer_id, primer_id + int(nuevos.sum()))
+        ids = previos.astype("int64").tolist()
     base["IdAnot"] = ids          # ← trazabilidad
 
-    ahora   = datetime.now()
+    ahora   = ahora or datetime.now()
     paga_he = dict(zip(usuarios_bd["IdUsuario"], usuarios_bd["PagaHE"]))
 
     anot = pd.DataFrame(
         {
             "IdAnot": ids,
             "Idusuario": base["idusuario"],
-            "FAnotacion": pd.to_datetime(base["fecha"]).dt.strftime("%d/%m/%Y"),
+            "FAnotacion": formatear_fechas(base["fecha"]),
             "ClaveObra": base["ClaveObra"],
             "CodObra": "",
             "IdProceso": "",                    # se rellenará más adelante
@@ -279,19 +523,21 @@ def preparar_anotaciones(
             "IdTipo": base["idusuario"].map(paga_he),
             "TasaHora": 80,
             "NumModOT": "",
-            # --- columnas de depuración ---
-            "DBG_TareaOriginal": base["actividad"],
-            "DBG_AsignarATarea": base["AsignarATarea"]
-        }
+        },
+        copy=not baja_memoria,      # sin copia: comparte columnas con *base*
     )
+    if depuracion:
+        # --- columnas de depuración ---
+        anot["DBG_TareaOriginal"] = base["actividad"]
+        anot["DBG_AsignarATarea"] = base["AsignarATarea"]
 
     return anot, base   # ← devolvemos ambos
 
 def preparar_anotaciones_valid(
     anotaciones_subir: pd.DataFrame,
     base_trazada: pd.DataFrame,
-    fecha_validacion: str = "15/05/2025",
-    id_usuario_validacion: str = "18287"
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION
 ) -> pd.DataFrame:
     """
     Genera la tabla T_ANOTACIONES_VALID_SUBIR a partir de T_ANOTACIONES_SUBIR.
@@ -305,6 +551,9 @@ def preparar_anotaciones_valid(
     Returns:
         DataFrame con la estructura de T_ANOTACIONES_VALID
     """
+    # Fecha validada una sola vez (ValueError si no es una fecha)
+    fecha_validacion = texto_fecha(fecha_validacion)
+
     # Crear un diccionario para mapear IdAnot a CARGADO A
     id_to_cargado = dict(zip(base_trazada["IdAnot"], base_trazada["CARGADO A"]))
     
@@ -325,4 +574,79 @@ def preparar_anotaciones_valid(
     # Asegurar que ClaveObra no tenga valores nulos (reemplazar por string vacío)
     valid["ClaveObra"] = valid["ClaveObra"].fillna("")
     
-    return valid
\ No newline at end of file
+    return valid
+# Clave por defecto de la agregación de anotaciones
+CLAVE_AGREGACION = ["Idusuario", "FAnotacion", "ClaveObra", "CodTarea", "NPlano"]
+
+def _unir_distintos(valores) -> str:
+    """Valores distintos no vacíos de un grupo, en orden, unidos con ' | '."""
+    return " | ".join(dict.fromkeys(str(v) for v in valores if pd.notna(v) and str(v) != ""))
+
+def agregar_anotaciones(
+    anotaciones_subir: pd.DataFrame,
+    base_trazada: pd.DataFrame,
+    claves: list[str] = CLAVE_AGREGACION,
+    primer_id: int | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Agrupa T_ANOTACIONES_SUBIR por *claves* (más el CARGADO A de cada
+    fila, para que la validación siga siendo única) sumando CHoras.
+
+    Devuelve:
+        • T_ANOTACIONES_SUBIR agregada, con IdAnot nuevos consecutivos
+          desde *primer_id* en orden de primera aparición. Por defecto
+          empiezan tras el mayor IdAnot original: BASE_PROCESADA y
+          PROCEDENCIA siguen usando los originales y en una misma salida
+          un IdAnot no puede designar dos registros. Las columnas
+          que no son clave y varían dentro de un grupo (DescAnot, DBG_*)
+          llevan sus valores distintos unidos con ' | '.
+        • PROCEDENCIA: IdAnot agregado → IdAnotOrigen (el de
+          BASE_PROCESADA), con su CARGADO A y CHoras. Sirve también de
+          *base_trazada* para `preparar_anotaciones_valid`.
+    """
+    faltan = [c for c in claves if c not in anotaciones_subir.columns]
+    if faltan:
+        raise ValueError(f"Columnas de agregación inexistentes en T_ANOTACIONES_SUBIR: {faltan}")
+
+    anot = anotaciones_subir.reset_index(drop=True)
+    originales = pd.concat([anot["IdAnot"], base_trazada["IdAnot"]])
+    if primer_id is None:
+        primer_id = int(originales.max()) + 1 if len(originales) else PRIMER_ID_ANOT
+    elif len(originales) and primer_id <= originales.max():
+        raise ValueError(
+            f"primer_id={primer_id} se solapa con los IdAnot originales "
+            f"(hasta {int(originales.max())})"
+        )
+    cargado = pd.Series(
+        base_trazada["CARGADO A"].to_numpy(), index=base_trazada["IdAnot"].to_numpy()
+    ).reindex(anot["IdAnot"].to_numpy()).to_numpy()
+    grupo = (
+        anot[claves].assign(_cargado=cargado)
+        .groupby(claves + ["_cargado"], sort=False, dropna=False, observed=True)
+        .ngroup()
+        .to_numpy()
+    )
+    _, primeras = np.unique(grupo, return_index=True)
+    ids = np.arange(primer_id, primer_id + len(primeras))
+
+    agregada = anot.iloc[primeras].reset_index(drop=True)
+    agregada["IdAnot"] = ids
+    por_grupo = anot.groupby(grupo, sort=True)
+    agregada["CHoras"] = por_grupo["CHoras"].sum(min_count=1).to_numpy()
+    for col in agregada.columns.difference(claves + ["IdAnot", "CHoras"], sort=False):
+        varian = np.flatnonzero(por_grupo[col].nunique(dropna=False).to_numpy() > 1)
+        if len(varian):
+            en_grupo = np.isin(grupo, varian)
+            unidos = anot.loc[en_grupo, col].groupby(grupo[en_grupo]).agg(_unir_distintos)
+            agregada[col] = agregada[col].astype(object)
+            agregada.loc[varian, col] = unidos.to_numpy()
+
+    procedencia = pd.DataFrame(
+        {
+            "IdAnot": ids[grupo],
+            "IdAnotOrigen": anot["IdAnot"].to_numpy(),
+            "CARGADO A": cargado,
+            "CHoras": anot["CHoras"].to_numpy(),
+        }
+    )
+    return agregada, procedencia
@@ -0,0 +1,416 @@
+# PATH: src/transform_polars.py
+
+"""
+Backend Polars (LazyFrame) de las transformaciones de `src/transform.py`.
+
+Mismas etapas, mismos nombres y mismas tablas de salida, pero cada etapa
+añade pasos a un plan perezoso; `ejecutar()` lanza un único `collect_all`
+para que el optimizador fusione filtros y mapeos, comparta la parte común
+de los planes (base, anotaciones, trazada, VALID) y ejecute en varios
+hilos. Se elige con `BACKEND_TRANSFORM = "polars"` en config.py.
+
+Reparto del trabajo:
+    - A Polars solo pasan las columnas que se calculan (chapa, proyecto,
+      actividad, categoría, CARGADO A, horas, fecha) y la posición de
+      cada fila (`_fila`). Las columnas de texto se convierten con
+      `str(v)` una vez por valor distinto, igual que hace pandas.
+    - Las columnas que se copian tal cual del Excel (OBSERVACIONES,
+      CODIGO PLANO, … con números y textos mezclados) no tienen tipo
+      Polars equivalente: se recuperan del DataFrame original por `_fila`
+      al volver a pandas.
+    - Las reglas '*' se resuelven en Python una vez por combinación
+      distinta (actividad, chapa, categoria), como en el backend pandas.
+
+No admite `ids_existentes` (modo incremental): ese modo usa pandas.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError as e:                 # dependencia opcional
+    raise ImportError(
+        "BACKEND_TRANSFORM='polars' requiere el paquete polars (pip install polars)"
+    ) from e
+
+from src import perfil_tareas
+from src.config import FECHA_VALIDACION, ID_USUARIO_VALIDACION, PRIMER_ID_ANOT
+from src.integridad import claves_referencia
+from src.transform import CATEGORICAS, RENAME, _reglas_maestro
+from src.utils.fechas import parsear_fechas, resumen_no_validas, texto_fecha
+from src.utils.reglas_asterisco_tareas import asignar_tarea_asterisco
+from src.utils.valores import factorizar, tipo_unico
+
+FILA = "_fila"
+
+# Columnas (ya renombradas) que se calculan en Polars y cómo convertirlas
+_TEXTO = ["idusuario_raw", "proyecto", "actividad", "CATEGORIA"]
+_TEXTO_NULOS = ["CARGADO A", "choras"]
+_FECHAS = ["fecha"]
+
+# Columnas de salida que son copia de una columna original (+ relleno)
+_ORIGEN = {
+    "DBG_CargadoA_original": ("CARGADO A", None),
+    "DBG_TareaOriginal": ("actividad", None),
+    "DescAnot": ("obs", ""),
+    "NPlano": ("nplano", ""),
+}
+
+_CLAVES_ASTERISCO = ["actividad", "chapa", "categoria"]
+
+
+# ---------------------------------------------------------------------- #
+#  ----------------------  CONVERSIÓN pandas ↔ Polars  ----------------- #
+# ---------------------------------------------------------------------- #
+def _a_texto(serie: pd.Series, nulos: bool) -> pl.Series:
+    """
+    `str(v)` por valor distinto. Con *nulos* los vacíos quedan nulos; si
+    no, se convierten como lo haría pandas ("nan"; "nan" también en las
+    columnas que pandas lleva como Categorical, las de un solo tipo).
+    """
+    codigos, unicos = factorizar(serie, use_na_sentinel=False)
+    categorica = RENAME.get(serie.name, serie.name) in CATEGORICAS and tipo_unico(serie)
+    texto = [
+        None if nulos and pd.isna(v)
+        else "nan" if categorica and pd.isna(v)
+        else str(v)
+        for v in unicos
+    ]
+    return pl.Series(serie.name, texto, dtype=pl.Utf8).gather(codigos)
+
+
+def a_polars(base: pd.DataFrame) -> pl.LazyFrame:
+    """Columnas de *base* (nombres del Excel) que necesita el cálculo."""
+    columnas = [pl.Series(FILA, np.arange(len(base), dtype=np.int64))]
+    for col in base.columns:
+        nombre = RENAME.get(col, col)
+        serie = base[col]
+        if nombre in _FECHAS:
+            fechas, no_validas = parsear_fechas(serie)
+            aviso = resumen_no_validas(serie.rename(nombre), no_validas)
+            if aviso:
+                print(f"Aviso: {aviso}")
+            columnas.append(pl.from_pandas(fechas).alias(col))
+        elif nombre in _TEXTO and pd.api.types.is_integer_dtype(serie):
+            columnas.append(pl.from_pandas(serie).alias(col))
+        elif nombre in _TEXTO or nombre in _TEXTO_NULOS:
+            if nombre == "choras" and pd.api.types.is_numeric_dtype(serie):
+                columnas.append(pl.from_pandas(serie).alias(col))
+            else:
+                columnas.append(_a_texto(serie, nulos=nombre in _TEXTO_NULOS))
+    return pl.DataFrame(columnas).lazy()
+
+
+def a_pandas(
+    df: pl.DataFrame,
+    original: pd.DataFrame,
+    originales: bool = False,
+    calculadas: tuple[str, ...] = (),
+) -> pd.DataFrame:
+    """
+    Vuelve a pandas. Con *originales* la tabla empieza por todas las
+    columnas de *original* (ya renombrado) en las filas `_fila`, salvo
+    las *calculadas*, que salen de Polars. Las columnas de `_ORIGEN` se
+    toman también de *original*.
+    """
+    filas = df[FILA].to_numpy()
+
+    def tomar(col: str) -> pd.Series:
+        return original[col].take(filas).reset_index(drop=True)
+
+    resultado = {}
+    if originales:
+        for col in original.columns:
+            resultado[col] = df[col].to_pandas() if col in calculadas else tomar(col)
+    for col in df.columns:
+        if col == FILA or col in resultado:
+            continue
+        if col in _ORIGEN:
+            origen, relleno = _ORIGEN[col]
+            serie = tomar(origen)
+            if relleno is not None:
+                serie = serie.astype(object).fillna(relleno)
+            resultado[col] = serie.rename(col)
+        else:
+            resultado[col] = df[col].to_pandas()
+    return pd.DataFrame(resultado)
+
+
+# ---------------------------------------------------------------------- #
+#  -------------------------  NORMALIZACIÓN  --------------------------- #
+# ---------------------------------------------------------------------- #
+def normaliza_columnas(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.rename(RENAME, strict=False)
+
+
+def limpia_idusuario(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.with_columns(
+        idusuario=pl.col("idusuario_raw")
+        .cast(pl.Utf8)
+        .str.replace(r"\.0$", "")
+        .str.strip_chars()
+    )
+
+
+def desglosa_proyecto(lf: pl.LazyFrame) -> pl.LazyFrame:
+    pat = r"\((\d+)\)"
+    proyecto = pl.col("proyecto")
+    return lf.with_columns(
+        proyecto_codigo=pl.coalesce(
+            proyecto.str.extract(pat, 1), proyecto.str.strip_chars()
+        ),
+        proyecto_nombre=proyecto.str.replace_all(pat, "").str.strip_chars(" -"),
+    )
+
+
+def borrar_registros_usuarios_incorrectos(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """Misma lista que el backend pandas; el recuento se informa en `ejecutar`."""
+    usuarios_incorrectos = [
+        "12682", "12742", "11281", "43179", "11452", "14328", "14329", "11292",
+    ]
+    return lf.filter(~pl.col("idusuario").is_in(usuarios_incorrectos))
+
+
+# ---------------------------------------------------------------------- #
+#  --------------------  PREPARACIÓN ANOTACIONES  ---------------------- #
+# ---------------------------------------------------------------------- #
+def _aplicar_maestro(
+    lf: pl.LazyFrame, maestro: pd.DataFrame, depuracion: bool = True
+) -> pl.LazyFrame:
+    """Borrado + cambios de clave del maestro en un solo filtro y un mapeo."""
+    borrar, mapa = _reglas_maestro(maestro)
+    tiene_cargado = "CARGADO A" in lf.collect_schema().names()
+
+    if depuracion:
+        dbg = [pl.col("proyecto_codigo").alias("DBG_Proyecto_original")]
+        if tiene_cargado:
+            dbg.append(pl.col("CARGADO A").alias("DBG_CargadoA_original"))
+        lf = lf.with_columns(dbg)
+
+    borra = pl.col("proyecto_codigo").is_in(borrar)
+    if tiene_cargado:
+        borra = borra | pl.col("CARGADO A").fill_null("nan").is_in(borrar)
+    lf = lf.filter(~borra)
+
+    lf = lf.with_columns(ClaveObra=pl.col("proyecto_codigo").replace(mapa))
+    if tiene_cargado:
+        # replace deja los nulos como nulos
+        lf = lf.with_columns(pl.col("CARGADO A").replace(mapa))
+    return lf
+
+
+def _resolver_asteriscos(claves: pl.Series) -> pl.Series:
+    """Reglas '*' una vez por combinación distinta de las filas con '*'."""
+    df = claves.struct.unnest()
+    unicas = (
+        df.filter(pl.col("asignacion") == "*")
+        .select(_CLAVES_ASTERISCO)
+        .unique(maintain_order=True)
+    )
+    medir = perfil_tareas.activo()
+    codigos, segundos = [], []
+    for a, c, k in unicas.iter_rows():
+        inicio = time.perf_counter() if medir else 0.0
+        codigos.append(
+            asignar_tarea_asterisco(actividad=a, chapa=c, categoria=k) or "PEND_ASIGNACION_*"
+        )
+        if medir:
+            segundos.append(time.perf_counter() - inicio)
+    if medir:
+        perfil_tareas.registrar(unicas.to_pandas().assign(segundos=segundos))
+    unicas = unicas.with_columns(pl.Series("codigo", codigos, dtype=pl.Utf8))
+    return df.join(unicas, on=_CLAVES_ASTERISCO, how="left", maintain_order="left")["codigo"]
+
+
+def _mapear_cod_tarea(
+    lf: pl.LazyFrame, asignaciones: pd.DataFrame, tareas_bd: pd.DataFrame
+) -> pl.LazyFrame:
+    """Añade CodTarea y AsignarATarea (mismas reglas que el modo columnar)."""
+    asign = asignaciones.rename(columns=str.strip)
+    asign["Tarea"] = asign["Tarea"].str.strip()
+    asign["AsignarATarea"] = asign["AsignarATarea"].astype(str).str.strip()
+    # Las claves que no son texto nunca coinciden con una actividad (texto)
+    mapa_asign = {
+        k: v for k, v in zip(asign["Tarea"], asign["AsignarATarea"]) if isinstance(k, str)
+    }
+    tareas_validas = claves_referencia(tareas_bd["CodTarea"], como_texto=True).tolist()
+
+    actividad = pl.col("actividad").str.strip_chars()
+    if "CATEGORIA" in lf.collect_schema().names():
+        categoria = pl.col("CATEGORIA").str.strip_chars().str.to_lowercase()
+    else:
+        categoria = pl.lit("")
+    asignacion = (
+        actividad.replace_strict(mapa_asign, default="", return_dtype=pl.Utf8)
+        if mapa_asign else pl.lit("")
+    )
+
+    lf = lf.with_columns(
+        _asignacion=asignacion,
+        _claves=pl.struct(
+            asignacion.alias("asignacion"),
+            actividad.alias("actividad"),
+            pl.col("idusuario").str.strip_chars().alias("chapa"),
+            categoria.alias("categoria"),
+        ),
+    )
+    codigo = (
+        pl.when(pl.col("_asignacion") == "*")
+        .then(pl.col("_claves").map_batches(_resolver_asteriscos, return_dtype=pl.Utf8))
+        .when(pl.col("_asignacion") == "#ESPECIAL#")
+        .then(pl.lit(""))
+        .otherwise(pl.col("_asignacion"))
+    )
+    no_valido = (
+        (pl.col("CodTarea") != "")
+        & ~pl.col("CodTarea").str.starts_with("PEND_")
+        & ~pl.col("CodTarea").is_in(tareas_validas)
+    )
+    return (
+        lf.with_columns(CodTarea=codigo)
+        .with_columns(
+            CodTarea=pl.when(no_valido).then(pl.lit("")).otherwise(pl.col("CodTarea")),
+            AsignarATarea=pl.col("_asignacion"),
+        )
+        .drop("_asignacion", "_claves")
+    )
+
+
+def preparar_anotaciones(
+    lf: pl.LazyFrame,
+    *,
+    asignaciones: pd.DataFrame,
+    usuarios_bd: pd.DataFrame,
+    maestro_obras: pd.DataFrame,
+    tareas_bd: pd.DataFrame,
+    primer_id: int = PRIMER_ID_ANOT,
+    ahora: datetime | None = None,
+    depuracion: bool = True,
+) -> tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Planes de T_ANOTACIONES_SUBIR y BASE_PROCESADA (ver backend pandas)."""
+    base = _aplicar_maestro(lf, maestro_obras, depuracion)
+    base = base.with_columns(CHoras=pl.col("choras").cast(pl.Float64, strict=False))
+    base = _mapear_cod_tarea(base, asignaciones, tareas_bd)
+    base = base.with_columns(IdAnot=pl.int_range(pl.len(), dtype=pl.Int64) + primer_id)
+
+    ahora = ahora or datetime.now()
+    paga_he = {
+        k: None if pd.isna(v) else str(v)
+        for k, v in zip(usuarios_bd["IdUsuario"], usuarios_bd["PagaHE"])
+        if isinstance(k, str)
+    }
+    id_tipo = (
+        pl.col("idusuario").replace_strict(paga_he, default=None, return_dtype=pl.Utf8)
+        if paga_he else pl.lit(None, dtype=pl.Utf8)
+    )
+
+    # DescAnot, NPlano y DBG_TareaOriginal llevan el valor original del
+    # Excel: se rellenan en `a_pandas` (ver `_ORIGEN`)
+    columnas = [
+        pl.col(FILA),
+        pl.col("IdAnot"),
+        pl.col("idusuario").alias("Idusuario"),
+        pl.col("fecha").dt.strftime("%d/%m/%Y").alias("FAnotacion"),
+        pl.col("ClaveObra"),
+        pl.lit("").alias("CodObra"),
+        pl.lit("").alias("IdProceso"),
+        pl.col("CodTarea"),
+        pl.lit(None).alias("DescAnot"),
+        pl.lit("").alias("CEuros"),
+        pl.col("CHoras"),
+        pl.lit(None).alias("NPlano"),
+        pl.lit(ahora).alias("FCREA"),
+        pl.lit(ahora).alias("FMODIFI"),
+        pl.col("idusuario").alias("IdUsuarioC"),
+        id_tipo.alias("IdTipo"),
+        pl.lit(80, dtype=pl.Int64).alias("TasaHora"),
+        pl.lit("").alias("NumModOT"),
+    ]
+    if depuracion:
+        columnas += [
+            pl.lit(None).alias("DBG_TareaOriginal"),
+            pl.col("AsignarATarea").alias("DBG_AsignarATarea"),
+        ]
+    return base.select(columnas), base
+
+
+def preparar_anotaciones_valid(
+    anotaciones_subir: pl.LazyFrame,
+    base_trazada: pl.LazyFrame,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+) -> pl.LazyFrame:
+    """T_ANOTACIONES_VALID_SUBIR: CARGADO A de la trazada por IdAnot."""
+    fecha_validacion = texto_fecha(fecha_validacion)
+    cargado = base_trazada.select("IdAnot", pl.col("CARGADO A").alias("_cargado"))
+    return anotaciones_subir.join(
+        cargado, on="IdAnot", how="left", maintain_order="left"
+    ).select(
+        pl.col(FILA),
+        pl.col("IdAnot"),
+        pl.col("_cargado").fill_null("").alias("ClaveObra"),
+        pl.lit("H").alias("IdTipoV"),
+        pl.lit(fecha_validacion).alias("FValid"),
+        pl.lit(0, dtype=pl.Int64).alias("VEuros"),
+        pl.col("CHoras").alias("VHoras"),
+        pl.lit(fecha_validacion).alias("FCREAV"),
+        pl.lit(fecha_validacion).alias("FMODIFIV"),
+        pl.lit(id_usuario_validacion).alias("IdUsuarioCV"),
+        pl.lit("S").alias("DctaHoras"),
+    )
+
+
+# ---------------------------------------------------------------------- #
+#  ---------------------------  EJECUCIÓN  ----------------------------- #
+# ---------------------------------------------------------------------- #
+def ejecutar(
+    base: pd.DataFrame,
+    *,
+    asignaciones: pd.DataFrame,
+    usuarios_bd: pd.DataFrame,
+    maestro_obras: pd.DataFrame,
+    tareas_bd: pd.DataFrame,
+    primer_id: int = PRIMER_ID_ANOT,
+    ahora: datetime | None = None,
+    depuracion: bool = True,
+    fecha_validacion: str = FECHA_VALIDACION,
+    id_usuario_validacion: str = ID_USUARIO_VALIDACION,
+) -> dict[str, pd.DataFrame]:
+    """
+    Recorrido completo desde la hoja *Base Datos* tal cual se lee.
+    Devuelve {"base", "anotaciones", "trazada", "valid"} en pandas:
+    *base* es la base tras las transformaciones básicas (para integridad).
+    """
+    lf = (
+        a_polars(base)
+        .pipe(normaliza_columnas)
+        .pipe(limpia_idusuario)
+        .pipe(desglosa_proyecto)
+        .pipe(borrar_registros_usuarios_incorrectos)
+    )
+    anot, trazada = preparar_anotaciones(
+        lf,
+        asignaciones=asignaciones,
+        usuarios_bd=usuarios_bd,
+        maestro_obras=maestro_obras,
+        tareas_bd=tareas_bd,
+        primer_id=primer_id,
+        ahora=ahora,
+        depuracion=depuracion,
+    )
+    valid = preparar_anotaciones_valid(anot, trazada, fecha_validacion, id_usuario_validacion)
+    base_pl, anot_pl, trazada_pl, valid_pl = pl.collect_all([lf, anot, trazada, valid])
+
+    original = base.rename(columns=RENAME)
+    return {
+        "base": a_pandas(base_pl, original, originales=True),
+        "anotaciones": a_pandas(anot_pl, original),
+        "trazada": a_pandas(trazada_pl, original, originales=True, calculadas=("CARGADO A", "fecha")),
+        "valid": a_pandas(valid_pl, original),
+    }
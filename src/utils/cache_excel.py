@@ -0,0 +1,236 @@
+# PATH: src/utils/cache_excel.py
+
+"""
+Caché persistente de hojas Excel en formato columnar (Parquet).
+
+`leer_excel()` se usa igual que `pd.read_excel` para una sola hoja y
+`leer_hojas()` para varias hojas de un mismo libro. La primera vez
+parsea el Excel y guarda el resultado en CACHE_DIR; las siguientes lo
+lee de la caché mientras el fichero de origen no cambie.
+
+Cada entrada se identifica por (ruta, opciones de lectura) y guarda el
+tamaño, mtime y sha256 del origen:
+    - tamaño y mtime iguales           → acierto directo
+    - mtime distinto pero mismo sha256 → acierto (se actualiza el mtime)
+    - cualquier otro caso              → se vuelve a leer el Excel
+
+Si Parquet no está disponible (falta pyarrow) o la hoja no se puede
+representar (p.ej. columnas con números y textos mezclados) se guarda en
+pickle, que conserva los tipos tal cual.
+
+Uso por línea de comandos:
+    python -m src.utils.cache_excel --stats
+    python -m src.utils.cache_excel --purgar
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import CACHE_DIR, CACHE_EXCEL
+
+# Contadores del proceso actual
+_STATS = {"aciertos": 0, "revalidados": 0, "fallos": 0}
+
+
+def _hash_fichero(ruta: Path) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as fh:
+        for bloque in iter(lambda: fh.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _clave(ruta: Path, opciones: dict) -> str:
+    texto = json.dumps(
+        [str(ruta.resolve()), opciones], sort_keys=True, default=str
+    )
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:20]
+
+
+def _escribir_atomico(destino: Path, escribir) -> None:
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    try:
+        escribir(tmp)
+        os.replace(tmp, destino)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _guardar(clave: str, df: pd.DataFrame, meta: dict) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        datos = CACHE_DIR / f"{clave}.parquet"
+        _escribir_atomico(datos, lambda p: df.to_parquet(p, index=True))
+    except (ImportError, ValueError, TypeError):
+        datos = CACHE_DIR / f"{clave}.pkl"
+        _escribir_atomico(datos, df.to_pickle)
+    meta["datos"] = datos.name
+    _escribir_meta(clave, meta)
+
+
+def _escribir_meta(clave: str, meta: dict) -> None:
+    _escribir_atomico(
+        CACHE_DIR / f"{clave}.json",
+        lambda p: p.write_text(json.dumps(meta, indent=1), encoding="utf-8"),
+    )
+
+
+def _cargar(meta: dict) -> pd.DataFrame | None:
+    datos = CACHE_DIR / meta["datos"]
+    if not datos.exists():
+        return None
+    if datos.suffix == ".pkl":
+        return pd.read_pickle(datos)
+
+    df = pd.read_parquet(datos)
+    # Parquet devuelve None donde read_excel pone NaN en columnas object
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _buscar(ruta: Path, opciones: dict, st: os.stat_result) -> pd.DataFrame | None:
+    """Devuelve la hoja cacheada si sigue siendo válida, o None."""
+    clave = _clave(ruta, opciones)
+    ruta_meta = CACHE_DIR / f"{clave}.json"
+    if not ruta_meta.exists():
+        return None
+    meta = json.loads(ruta_meta.read_text(encoding="utf-8"))
+    if meta["size"] != st.st_size:
+        return None
+
+    if meta["mtime_ns"] == st.st_mtime_ns:
+        df = _cargar(meta)
+        if df is not None:
+            _STATS["aciertos"] += 1
+        return df
+
+    if _hash_fichero(ruta) != meta["sha256"]:
+        return None
+    df = _cargar(meta)
+    if df is not None:
+        meta["mtime_ns"] = st.st_mtime_ns
+        _escribir_meta(clave, meta)
+        _STATS["revalidados"] += 1
+    return df
+
+
+def _registrar(ruta: Path, opciones: dict, st: os.stat_result, sha: str,
+               df: pd.DataFrame) -> None:
+    _guardar(
+        _clave(ruta, opciones),
+        df,
+        {
+            "origen": str(ruta.resolve()),
+            "opciones": {k: str(v) for k, v in opciones.items()},
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha,
+        },
+    )
+
+
+def leer_excel(ruta: Path, **opciones) -> pd.DataFrame:
+    """`pd.read_excel(ruta, **opciones)` con caché persistente (una hoja)."""
+    if not CACHE_EXCEL:
+        return pd.read_excel(ruta, **opciones)
+
+    ruta = Path(ruta)
+    st = ruta.stat()
+    df = _buscar(ruta, opciones, st)
+    if df is not None:
+        return df
+
+    _STATS["fallos"] += 1
+    df = pd.read_excel(ruta, **opciones)
+    _registrar(ruta, opciones, st, _hash_fichero(ruta), df)
+    return df
+
+
+def leer_hojas(ruta: Path, hojas: list[str], **opciones) -> dict[str, pd.DataFrame]:
+    """
+    Varias hojas de un mismo libro. Las que no estén en caché se parsean
+    juntas abriendo el libro una sola vez.
+    """
+    ruta = Path(ruta)
+    if not CACHE_EXCEL:
+        return pd.read_excel(ruta, sheet_name=list(hojas), **opciones)
+
+    st = ruta.stat()
+    leidas = {}
+    for hoja in hojas:
+        df = _buscar(ruta, {**opciones, "sheet_name": hoja}, st)
+        if df is not None:
+            leidas[hoja] = df
+
+    faltan = [h for h in hojas if h not in leidas]
+    if faltan:
+        _STATS["fallos"] += len(faltan)
+        nuevas = pd.read_excel(ruta, sheet_name=faltan, **opciones)
+        sha = _hash_fichero(ruta)
+        for hoja in faltan:
+            _registrar(ruta, {**opciones, "sheet_name": hoja}, st, sha, nuevas[hoja])
+        leidas.update(nuevas)
+
+    return {h: leidas[h] for h in hojas}
+
+
+def tomar_contadores() -> dict[str, int]:
+    """Devuelve los contadores del proceso y los pone a cero."""
+    copia = dict(_STATS)
+    for k in _STATS:
+        _STATS[k] = 0
+    return copia
+
+
+def sumar_contadores(otros: dict[str, int]) -> None:
+    """Acumula los contadores de otro proceso (workers de extracción)."""
+    for k, v in otros.items():
+        _STATS[k] += v
+
+
+def estadisticas() -> dict:
+    """Contadores del proceso + entradas y bytes ocupados en disco."""
+    datos = [
+        p for p in CACHE_DIR.glob("*") if p.suffix in (".parquet", ".pkl")
+    ] if CACHE_DIR.exists() else []
+    return {
+        **_STATS,
+        "entradas": len(datos),
+        "parquet": sum(p.suffix == ".parquet" for p in datos),
+        "bytes": sum(p.stat().st_size for p in datos),
+        "directorio": str(CACHE_DIR),
+    }
+
+
+def purgar() -> int:
+    """Borra todas las entradas de la caché. Devuelve cuántos ficheros borró."""
+    if not CACHE_DIR.exists():
+        return 0
+    borrados = 0
+    for p in CACHE_DIR.iterdir():
+        if p.is_file():
+            p.unlink()
+            borrados += 1
+    return borrados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caché de hojas Excel")
+    parser.add_argument("--stats", action="store_true", help="muestra estadísticas")
+    parser.add_argument("--purgar", action="store_true", help="vacía la caché")
+    args = parser.parse_args()
+
+    if args.purgar:
+        print(f"Ficheros borrados: {purgar()}")
+    if args.stats or not args.purgar:
+        for k, v in estadisticas().items():
+            print(f"{k}: {v}")
@@ -0,0 +1,102 @@
+# PATH: src/utils/fechas.py
+
+"""
+Fechas: interpretación y formato una vez por valor distinto.
+
+Un histórico tiene cientos de miles de filas pero solo unos miles de
+fechas distintas, así que la columna se factoriza, se trabaja sobre los
+valores distintos y el resultado se propaga a las filas con los códigos.
+
+    - Valores que ya son fecha (celdas de fecha del Excel) se usan tal
+      cual; una columna datetime64 no se toca.
+    - Textos: se prueban los formatos de `FORMATOS_ENTRADA` en orden, sin
+      inferencia (un "05/06/2024" es siempre 5 de junio).
+    - Lo que no se puede interpretar (textos en otro formato, números…)
+      queda NaT y se devuelve aparte para informar de ello.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Formato de fecha de las tablas que se importan en Access
+FORMATO_EXCEL = "%d/%m/%Y"
+
+FORMATOS_ENTRADA = (
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%d-%m-%Y",
+)
+
+_NAT = np.datetime64("NaT", "ns")
+
+
+def parsear_fechas(
+    serie: pd.Series, formatos: tuple[str, ...] = FORMATOS_ENTRADA
+) -> tuple[pd.Series, pd.Index]:
+    """
+    Devuelve (fechas datetime64[ns] con el índice de *serie*, valores
+    distintos no vacíos que no se han podido interpretar).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie, pd.Index([], dtype=object)
+
+    codigos, unicos = pd.factorize(serie)          # vacíos → -1 → NaT
+    unicos = pd.Index(unicos, dtype=object)
+    fechas = np.full(len(unicos), _NAT)
+
+    es_fecha = np.array([isinstance(v, (datetime, date)) for v in unicos], dtype=bool)
+    if es_fecha.any():
+        fechas[es_fecha] = pd.to_datetime(unicos[es_fecha]).to_numpy(dtype="datetime64[ns]")
+
+    es_texto = np.array([isinstance(v, str) for v in unicos], dtype=bool)
+    textos = pd.Index([v.strip() for v in unicos[es_texto]], dtype=object)
+    pendiente = np.ones(len(textos), dtype=bool)
+    destino = np.flatnonzero(es_texto)
+    for formato in formatos:
+        if not pendiente.any():
+            break
+        leidas = pd.to_datetime(textos[pendiente], format=formato, errors="coerce")
+        ok = ~leidas.isna()
+        fechas[destino[pendiente][ok]] = leidas[ok].to_numpy(dtype="datetime64[ns]")
+        pendiente[np.flatnonzero(pendiente)[ok]] = False
+
+    no_validas = unicos[np.isnat(fechas)]
+    por_fila = np.append(fechas, _NAT)[codigos]
+    return pd.Series(por_fila, index=serie.index, name=serie.name), no_validas
+
+
+def formatear_fechas(fechas: pd.Series, formato: str = FORMATO_EXCEL) -> pd.Series:
+    """`fechas.dt.strftime(formato)` calculado por fecha distinta (NaT → NaN)."""
+    codigos, unicos = pd.factorize(fechas)
+    textos = pd.DatetimeIndex(unicos).strftime(formato).to_numpy(dtype=object)
+    return pd.Series(
+        np.append(textos, np.nan)[codigos], index=fechas.index, name=fechas.name, dtype=object
+    )
+
+
+def texto_fecha(valor, formato: str = FORMATO_EXCEL) -> str:
+    """Una fecha (texto o fecha) en *formato*; ValueError si no es válida."""
+    fechas, no_validas = parsear_fechas(pd.Series([valor], dtype=object))
+    if len(no_validas) or fechas.isna().all():
+        raise ValueError(
+            f"Fecha no válida: {valor!r} (formatos admitidos: {', '.join(FORMATOS_ENTRADA)})"
+        )
+    return fechas.iloc[0].strftime(formato)
+
+
+def resumen_no_validas(serie: pd.Series, no_validas: pd.Index, ejemplos: int = 5) -> str | None:
+    """Aviso legible con filas afectadas y algunos valores, o None."""
+    if not len(no_validas):
+        return None
+    filas = int(serie.isin(no_validas).sum())
+    muestra = ", ".join(repr(v) for v in list(no_validas[:ejemplos]))
+    return (
+        f"{filas} filas con fecha no válida en '{serie.name}' "
+        f"({len(no_validas)} valores distintos, p.ej. {muestra}) → fecha vacía"
+    )
@@ -0,0 +1,230 @@
+# PATH: src/utils/grafo.py
+
+"""
+Grafo de etapas con resultados intermedios en caché.
+
+Cada nodo declara su función, los nodos de los que depende y sus
+parámetros:
+
+    nodos = {
+        "base":  nodo(transformar, "entradas"),
+        "valid": nodo(preparar_valid, "anotaciones", fecha="15/05/2025"),
+    }
+    resultados, registro = ejecutar(nodos)
+
+La función recibe los resultados de sus dependencias (en orden) y los
+parámetros como argumentos con nombre. La clave de caché de un nodo es
+el sha256 de:
+    - su nombre y el código (módulo de la función + paquete src/),
+    - sus parámetros,
+    - las claves de sus dependencias (si cambia algo aguas arriba cambia
+      todo lo que cuelga de ahí).
+Así, cambiar solo `fecha` en el ejemplo vuelve a ejecutar únicamente
+"valid". Los nodos que leen ficheros deben recibir su huella
+(`huella_ficheros`) como parámetro.
+
+Con *paralelo* los nodos cuyas dependencias ya están resueltas se
+ejecutan a la vez en hilos. Los DataFrame se pasan como copia superficial
+para que un nodo que añade columnas no afecte a los demás.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import CACHE_ETAPAS_DIR
+
+# Cualquier cambio de código en src/ invalida los resultados guardados
+_SRC = Path(__file__).resolve().parents[1]
+
+
+def nodo(func, *dependencias: str, cache: bool = True, **parametros) -> dict:
+    """Declara un nodo; con `cache=False` se ejecuta siempre."""
+    return {
+        "func": func,
+        "deps": list(dependencias),
+        "params": parametros,
+        "cache": cache,
+    }
+
+
+def huella_ficheros(*rutas: Path) -> str:
+    """Huella barata (ruta, tamaño, mtime) de ficheros de entrada."""
+    partes = []
+    for ruta in rutas:
+        ruta = Path(ruta)
+        st = ruta.stat() if ruta.exists() else None
+        partes.append([str(ruta.resolve()), st and st.st_size, st and st.st_mtime_ns])
+    return json.dumps(partes)
+
+
+@lru_cache(maxsize=None)
+def _huella_codigo(fichero: str) -> str:
+    """Huella del fichero de la función y de todo el paquete src/."""
+    h = hashlib.sha256(Path(fichero).read_bytes())
+    for ruta in sorted(_SRC.rglob("*.py")):
+        h.update(ruta.read_bytes())
+    return h.hexdigest()
+
+
+def _clave(nombre: str, n: dict, claves_deps: list[str]) -> str:
+    func = n["func"]
+    try:
+        codigo = _huella_codigo(inspect.getsourcefile(func))
+    except (TypeError, OSError):
+        codigo = _huella_codigo(__file__)
+    texto = json.dumps(
+        [nombre, func.__module__, func.__qualname__, codigo, n["params"], claves_deps],
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:24]
+
+
+def _orden(nodos: dict) -> list[str]:
+    """Orden topológico; error si falta una dependencia o hay ciclos."""
+    orden, estado = [], {}
+
+    def visitar(nombre: str, camino: tuple) -> None:
+        if estado.get(nombre) == "hecho":
+            return
+        if nombre not in nodos:
+            raise KeyError(f"Dependencia desconocida: {nombre!r} (desde {camino[-1]!r})")
+        if estado.get(nombre) == "visitando":
+            raise ValueError(f"Ciclo en el grafo: {' → '.join(camino + (nombre,))}")
+        estado[nombre] = "visitando"
+        for dep in nodos[nombre]["deps"]:
+            visitar(dep, camino + (nombre,))
+        estado[nombre] = "hecho"
+        orden.append(nombre)
+
+    for nombre in nodos:
+        visitar(nombre, ())
+    return orden
+
+
+def _aislar(valor):
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy(deep=False)
+    if isinstance(valor, tuple):
+        return tuple(_aislar(v) for v in valor)
+    if isinstance(valor, dict):
+        return {k: _aislar(v) for k, v in valor.items()}
+    return valor
+
+
+def _ruta(cache_dir: Path, nombre: str, clave: str) -> Path:
+    return cache_dir / f"{nombre}-{clave}.pkl"
+
+
+def _leer(ruta: Path) -> tuple[bool, object]:
+    try:
+        with open(ruta, "rb") as fh:
+            return True, pickle.load(fh)
+    except FileNotFoundError:
+        return False, None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return False, None             # entrada corrupta o de otra versión → se recalcula
+
+
+def _ejecutar_nodo(n: dict, args: list, ruta: Path | None) -> tuple:
+    inicio = time.perf_counter()
+    resultado = n["func"](*[_aislar(a) for a in args], **n["params"])
+    if ruta is not None:
+        tmp = ruta.with_name(f"{ruta.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            pickle.dump(resultado, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, ruta)
+    return resultado, time.perf_counter() - inicio
+
+
+def ejecutar(
+    nodos: dict[str, dict],
+    salidas: list[str] | None = None,
+    paralelo: bool = True,
+    cache_dir: Path | None = CACHE_ETAPAS_DIR,
+) -> tuple[dict, pd.DataFrame]:
+    """
+    Resuelve los nodos *salidas* (por defecto todos). Devuelve
+    ({nodo: resultado}, registro) donde el registro indica por nodo si
+    salió de caché o se ejecutó y su tiempo. Las dependencias de un nodo
+    leído de caché no se resuelven (no aparecen en el registro).
+    `cache_dir=None` desactiva la caché.
+    """
+    orden = _orden(nodos)
+    claves: dict[str, str] = {}
+    for nombre in orden:
+        claves[nombre] = _clave(nombre, nodos[nombre], [claves[d] for d in nodos[nombre]["deps"]])
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def ruta(nombre: str) -> Path | None:
+        if cache_dir is None or not nodos[nombre]["cache"]:
+            return None
+        return _ruta(cache_dir, nombre, claves[nombre])
+
+    resultados: dict = {}
+    registro: list[dict] = []
+
+    def anotar(nombre: str, estado: str, segundos: float) -> None:
+        registro.append(
+            {"nodo": nombre, "estado": estado, "segundos": round(segundos, 3), "clave": claves[nombre]}
+        )
+
+    # De las salidas hacia atrás: lo que está en caché se lee y corta la
+    # búsqueda; lo demás arrastra a sus dependencias
+    necesarios = set(salidas or nodos)
+    for nombre in reversed(orden):
+        if nombre not in necesarios:
+            continue
+        if ruta(nombre) is not None:
+            inicio = time.perf_counter()
+            leido, valor = _leer(ruta(nombre))
+            if leido:
+                resultados[nombre] = valor
+                anotar(nombre, "cache", time.perf_counter() - inicio)
+                continue
+        necesarios.update(nodos[nombre]["deps"])
+    pendientes = [n for n in orden if n in necesarios and n not in resultados]
+
+    def lanzar(nombre: str):
+        args = [resultados[d] for d in nodos[nombre]["deps"]]
+        return nodos[nombre], args, ruta(nombre)
+
+    if not paralelo:
+        for nombre in pendientes:
+            resultados[nombre], seg = _ejecutar_nodo(*lanzar(nombre))
+            anotar(nombre, "ejecutado", seg)
+        return resultados, pd.DataFrame(registro)
+
+    with ThreadPoolExecutor(max_workers=max(2, os.cpu_count() or 1)) as pool:
+        en_curso = {}
+        while pendientes or en_curso:
+            for nombre in [p for p in pendientes if all(d in resultados for d in nodos[p]["deps"])]:
+                en_curso[pool.submit(_ejecutar_nodo, *lanzar(nombre))] = nombre
+                pendientes.remove(nombre)
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                nombre = en_curso.pop(futuro)
+                resultados[nombre], seg = futuro.result()
+                anotar(nombre, "ejecutado", seg)
+    return resultados, pd.DataFrame(registro)
+
+
+def purgar(cache_dir: Path = CACHE_ETAPAS_DIR) -> int:
+    """Borra los resultados intermedios guardados. Devuelve cuántos."""
+    borrados = 0
+    for ruta in Path(cache_dir).glob("*.pkl"):
+        ruta.unlink()
+        borrados += 1
+    return borrados
@@ -0,0 +1,196 @@
+# PATH: src/utils/medicion.py
+
+"""
+Instrumentación por etapas de una ejecución.
+
+Cada etapa registra tiempo real, tiempo de CPU, memoria y filas de
+entrada / salida:
+
+    with etapa("preparar_anotaciones", base) as e:
+        anot, trazada = preparar_anotaciones(...)
+        e["filas_salida"] = filas(anot)
+
+o, para funciones que reciben y devuelven un DataFrame (`.pipe`):
+
+    base = base.pipe(medida(normaliza_columnas))
+
+Memoria:
+    - rss_mb / rss_max_mb → RSS actual (psutil o /proc) y pico del
+      proceso (`resource`, no disponible en Windows),
+    - pico_mb → pico de tracemalloc dentro de la etapa; solo si se pidió
+      en `iniciar(tracemalloc_=True)` porque ralentiza la ejecución.
+
+Con `iniciar(perfil_etapa=...)` esa etapa se ejecuta bajo cProfile y
+`guardar()` deja el volcado `.prof` junto al informe JSON.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+
+# Estado de la ejecución actual
+_ETAPAS: list[dict] = []
+_PILA: list[dict] = []
+_CONFIG = {"tracemalloc": False, "perfil_etapa": None, "inicio": None}
+_PERFILES: dict[str, cProfile.Profile] = {}
+
+
+def iniciar(perfil_etapa: str | None = None, tracemalloc_: bool = False) -> None:
+    """Empieza una ejecución nueva (borra las etapas registradas)."""
+    _ETAPAS.clear()
+    _PILA.clear()
+    _PERFILES.clear()
+    _CONFIG.update(
+        tracemalloc=tracemalloc_,
+        perfil_etapa=perfil_etapa,
+        inicio=datetime.now().isoformat(timespec="seconds"),
+    )
+    if tracemalloc_ and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _parar_tracemalloc_en_hijo() -> None:
+    # Los workers de ProcessPoolExecutor (fork) heredarían el trazado
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_parar_tracemalloc_en_hijo)
+
+
+def filas(obj):
+    """Nº de filas de un DataFrame; lista / dict de filas para colecciones."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return {str(k): filas(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [filas(v) for v in obj]
+    return None
+
+
+def _rss_mb() -> float | None:
+    try:
+        import psutil
+    except ImportError:
+        try:
+            with open("/proc/self/statm") as fh:
+                return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError, AttributeError):
+            return None
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _rss_max_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da KiB, macOS bytes
+    return maximo / 2**20 if sys.platform == "darwin" else maximo / 2**10
+
+
+def _redondear(valor):
+    return None if valor is None else round(valor, 3)
+
+
+@contextmanager
+def etapa(nombre: str, entrada=None):
+    """
+    Mide el bloque `with` como una etapa. Devuelve el registro (dict) para
+    que el llamador anote `filas_salida` u otros datos.
+    """
+    reg = {"etapa": nombre, "filas_entrada": filas(entrada), "filas_salida": None}
+    medir_heap = _CONFIG["tracemalloc"] and tracemalloc.is_tracing()
+    if medir_heap:
+        # el pico de la etapa padre no debe perderse al reiniciarlo
+        if _PILA:
+            _PILA[-1]["_pico"] = max(_PILA[-1]["_pico"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        reg["_pico"] = 0
+    _PILA.append(reg)
+
+    perfil = None
+    if nombre == _CONFIG["perfil_etapa"]:
+        perfil = _PERFILES.setdefault(nombre, cProfile.Profile())
+        perfil.enable()
+
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield reg
+    finally:
+        segundos, cpu = time.perf_counter() - t0, time.process_time() - c0
+        if perfil is not None:
+            perfil.disable()
+        _PILA.pop()
+
+        reg["segundos"] = round(segundos, 3)
+        reg["cpu_segundos"] = round(cpu, 3)
+        if medir_heap:
+            pico = max(reg.pop("_pico"), tracemalloc.get_traced_memory()[1])
+            reg["pico_mb"] = round(pico / 2**20, 3)
+            if _PILA:
+                _PILA[-1]["_pico"] = max(_PILA[-1]["_pico"], pico)
+        reg["rss_mb"] = _redondear(_rss_mb())
+        reg["rss_max_mb"] = _redondear(_rss_max_mb())
+        reg["nivel"] = len(_PILA)
+        _ETAPAS.append(reg)
+
+
+def medida(func, nombre: str | None = None):
+    """Envuelve *func(df, ...) -> df* para medirla como etapa (uso con `.pipe`)."""
+
+    @wraps(func)
+    def envoltura(df, *args, **kwargs):
+        with etapa(nombre or func.__name__, df) as reg:
+            resultado = func(df, *args, **kwargs)
+            reg["filas_salida"] = filas(resultado)
+        return resultado
+
+    return envoltura
+
+
+def etapas() -> list[dict]:
+    """Etapas registradas, en orden de finalización."""
+    return [dict(e) for e in _ETAPAS]
+
+
+def guardar(ruta: Path, **extra) -> Path:
+    """
+    Escribe el informe JSON de la ejecución en *ruta* (y el volcado
+    cProfile como `<ruta sin extensión>_<etapa>.prof`). *extra* se añade
+    tal cual al informe (configuración, contadores de caché, …).
+    """
+    informe = {
+        "inicio": _CONFIG["inicio"],
+        "fin": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "tracemalloc": _CONFIG["tracemalloc"],
+        **extra,
+        "etapas": etapas(),
+    }
+    for nombre, perfil in _PERFILES.items():
+        destino = ruta.with_name(f"{ruta.stem}_{nombre}.prof")
+        perfil.dump_stats(destino)
+        informe.setdefault("perfiles", {})[nombre] = str(destino)
+
+    ruta.write_text(
+        json.dumps(informe, indent=2, ensure_ascii=False, default=str),
+        encoding="utf-8",
+    )
+    return ruta
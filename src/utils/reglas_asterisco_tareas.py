@@ -15,7 +15,10 @@ Devuelve:
 
 from __future__ import annotations
 
-from typing import Callable
+import csv
+import hashlib
+from functools import lru_cache
+from pathlib import Path
 
 # --------------------------------------------------------------------- #
 #  -------------------------  REGLAS BÁSICAS  ------------------------- #
@@ -43,200 +46,281 @@ CHAPAS = {
 # --------------------------------------------------------------------- #
 #  ---------------------------  REGLAS  -------------------------------- #
 # --------------------------------------------------------------------- #
-
-def _ips(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        if chapa in CHAPAS["UE81"]:
-            return "UE81"
-        if chapa in CHAPAS["A81"]:
-            return "A81"
-        if chapa in CHAPAS["E81"]:
-            return "E81"
-    elif categoria == UTI:
-        if chapa == "12591":
-            return "UE81"
-        if chapa in {"11296", "12320"}:
-            return "UT80"
-    # GG o cualquier otro → descartar
-    return ""
-
-
-def _ipa(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        if chapa in CHAPAS["UEVAR01"]:
-            return "UEVAR01"
-        if chapa in CHAPAS["A91"]:
-            return "A91"
-        if chapa in CHAPAS["E91"]:
-            return "E91"
-    elif categoria == UTI:
-        return "UTVAR01"
-    return ""
-
-
-def _i20(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        return "A39"
-    if categoria == UTI:
-        return "UT31"
-    return ""
-
-
-def _i30(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        return "UE30"
-    # "Resto: descartar"
-    return ""
-
-
-def _u40(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        return "UE64"
-    if categoria == UTI:
-        return "UE64" if chapa == "12591" else "UT64"
-    return ""
-
-
-def _u41(_, categoria: str) -> str:
-    # Nueva función para U41-FASE MODIFICACIONES MEJORA
-    if categoria == PROC:
-        return "UE10"
-    if categoria == UTI:
-        return "UT20"
-    return ""
-
-
-def _u80(_, categoria: str) -> str:
-    return "UE70" if categoria == PROC else ("UT30" if categoria == UTI else "")
-
-
-def _u21(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        # Para categoria procesos: UE20 a excepcion de 12705 cuya tarea es A20
-        if chapa == "12705":
-            return "A20"
-        else:
-            return "UE20"
-    elif categoria == UTI:
-        # Para categoria utillajes: UT16 a excepcion de 12591 cuya tarea es UE20
-        if chapa == "12591":
-            return "UE20"
-        else:
-            return "UT16"
-    return ""
-
-
-def _u20(chapa: str, categoria: str) -> str:
-    # Misma lógica que U21 según los requisitos
-    if categoria == PROC:
-        # Para categoria procesos: UE20 a excepcion de 12705 cuya tarea es A20
-        if chapa == "12705":
-            return "A20"
-        else:
-            return "UE20"
-    elif categoria == UTI:
-        # Para categoria utillajes: UT16 a excepcion de 12591 cuya tarea es UE20
-        if chapa == "12591":
-            return "UE20"
-        else:
-            return "UT16"
-    return ""
-
-
-def _f20(chapa: str, categoria: str) -> str:
-    if categoria == UTI:
-        if chapa == "11296":
-            return "UT20"
-        if chapa == "11780":
-            return "UT21"
-    if categoria == PROC:
-        if chapa == "12705":
-            return "A39"
-        if chapa == "16276":
-            return "UA11"
-    return ""
-
-
-def _i10(_, categoria: str) -> str:
-    return "UE30" if categoria == PROC else ("UT30" if categoria == UTI else "")
-
-
-def _f40(_, categoria: str) -> str:
-    return "A39" if categoria == PROC else ("UT20" if categoria == UTI else "")
-
-
-def _f30(_, categoria: str) -> str:
-    return "UE12" if categoria == PROC else ("UT22" if categoria == UTI else "")
-
-
-def _u50(_, categoria: str) -> str:
-    return "UE50" if categoria == PROC else ("UT50" if categoria == UTI else "")
-
-
-def _f10(_, categoria: str) -> str:
-    return "UE10" if categoria == PROC else ("UT20" if categoria == UTI else "")
-
-
-def _formacion(chapa: str, _categoria: str) -> str:
-    if chapa in CHAPAS["AGG01"]:
-        return "AGG01"
-    if chapa in CHAPAS["EGG01"]:
-        return "EGG01"
-    return ""
-
-
-def _uh(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        if chapa == "12591":
-            return "UE10"
-        if chapa == "12705":
-            return "A32"
-    if categoria == UTI:
-        return "UE10"
-    return ""
-
-
-def _um(_, categoria: str) -> str:
-    return "A39" if categoria == PROC else ("UT42" if categoria == UTI else "")
-
-
-def _uv(chapa: str, categoria: str) -> str:
-    if categoria == PROC:
-        return "A39" if chapa == "12705" else "UE10"
-    if categoria == UTI:
-        return "UE10" if chapa == "12591" else "UT40"
-    return ""
-
-
-def _varios(_, categoria: str) -> str:
-    return "UTVAR01" if categoria == UTI else ("UEVAR01" if categoria == PROC else "")
-
-
-# Mapeo actividad  ➜  función que decide la tarea
-_RULES: dict[str, Callable[[str, str], str]] = {
-    "IPS-GESTION SUBCONTRATACION": _ips,
-    "IPA-ADMINISTRACION": _ipa,
-    "I20-FASE IMPLANTACION UTILLAJES BOGIE ACABADO": _i20,
-    "I30-FASE IMPLANTACION UTILLAJES CAJAS ESTRUCTURA": _i30,
-    "U40-FASE MODIFICACIONES PRODUCTO": _u40,
-    "U41-FASE MODIFICACIONES MEJORA": _u41,  # Nueva entrada para U41
-    "U80-FASE CIERRE PROYECTO: Analisis Coste/Mejoras/Incidencias/Utillajes fin de obra": _u80,
-    "U21-FASE COORDINACION: Analisis de planos y creación del listado de herramientas": _u21,
-    "U20-FASE COORDINACION: Definir proceso fabr. + Reuniones IP/Fabr. + Acta + Informe mejora + Listado utillajes": _u20,
-    "F20-FASE FABRICACION UTILLAJES BOGIE ACABADO": _f20,
-    "I10-FASE IMPLANTACION UTILLAJES BOGIE ESTRUCTURA": _i10,
-    "F40-FASE FABRICACION UTILLAJES CAJAS ACABADO": _f40,
-    "F30-FASE FABRICACION UTILLAJES CAJAS ESTRUCTURA": _f30,
-    "U50-FASE PRESERIE 2 INICIO FABRICACION": _u50,
-    "F10-FASE FABRICACION UTILLAJES BOGIE ESTRUCTURA": _f10,
-    "FORMACIÓN": _formacion,
-    "UH-GESTION DE HERRAMIENTAS": _uh,
-    "UM-MANTENIMIENTO": _um,
-    "UV-VERIFICACION DE UTILLAJES": _uv,
-    "VARIOS": _varios,
+# Cada actividad tiene una lista de entradas (chapas, categoria, tarea).
+# `TODAS` (None) actúa como comodín en chapas o categoria. Dentro de una
+# misma actividad, si dos entradas coinciden gana la primera declarada
+# aunque la otra sea más concreta (igual que el orden de los `if`
+# originales). Lo que no casa con ninguna → ''.
+TODAS = None
+
+Regla = tuple[set[str] | None, str | None, str]
+
+_RULES: dict[str, list[Regla]] = {
+    "IPS-GESTION SUBCONTRATACION": [
+        (CHAPAS["UE81"], PROC, "UE81"),
+        (CHAPAS["A81"], PROC, "A81"),
+        (CHAPAS["E81"], PROC, "E81"),
+        ({"12591"}, UTI, "UE81"),
+        ({"11296", "12320"}, UTI, "UT80"),
+        # GG o cualquier otro → descartar
+    ],
+    "IPA-ADMINISTRACION": [
+        (CHAPAS["UEVAR01"], PROC, "UEVAR01"),
+        (CHAPAS["A91"], PROC, "A91"),
+        (CHAPAS["E91"], PROC, "E91"),
+        (TODAS, UTI, "UTVAR01"),
+    ],
+    "I20-FASE IMPLANTACION UTILLAJES BOGIE ACABADO": [
+        (TODAS, PROC, "A39"),
+        (TODAS, UTI, "UT31"),
+    ],
+    "I30-FASE IMPLANTACION UTILLAJES CAJAS ESTRUCTURA": [
+        (TODAS, PROC, "UE30"),
+        # "Resto: descartar"
+    ],
+    "U40-FASE MODIFICACIONES PRODUCTO": [
+        (TODAS, PROC, "UE64"),
+        ({"12591"}, UTI, "UE64"),
+        (TODAS, UTI, "UT64"),
+    ],
+    "U41-FASE MODIFICACIONES MEJORA": [
+        (TODAS, PROC, "UE10"),
+        (TODAS, UTI, "UT20"),
+    ],
+    "U80-FASE CIERRE PROYECTO: Analisis Coste/Mejoras/Incidencias/Utillajes fin de obra": [
+        (TODAS, PROC, "UE70"),
+        (TODAS, UTI, "UT30"),
+    ],
+    # U20 y U21: procesos → UE20 salvo 12705 (A20);
+    #            utillajes → UT16 salvo 12591 (UE20)
+    "U21-FASE COORDINACION: Analisis de planos y creación del listado de herramientas": [
+        ({"12705"}, PROC, "A20"),
+        (TODAS, PROC, "UE20"),
+        ({"12591"}, UTI, "UE20"),
+        (TODAS, UTI, "UT16"),
+    ],
+    "U20-FASE COORDINACION: Definir proceso fabr. + Reuniones IP/Fabr. + Acta + Informe mejora + Listado utillajes": [
+        ({"12705"}, PROC, "A20"),
+        (TODAS, PROC, "UE20"),
+        ({"12591"}, UTI, "UE20"),
+        (TODAS, UTI, "UT16"),
+    ],
+    "F20-FASE FABRICACION UTILLAJES BOGIE ACABADO": [
+        ({"11296"}, UTI, "UT20"),
+        ({"11780"}, UTI, "UT21"),
+        ({"12705"}, PROC, "A39"),
+        ({"16276"}, PROC, "UA11"),
+    ],
+    "I10-FASE IMPLANTACION UTILLAJES BOGIE ESTRUCTURA": [
+        (TODAS, PROC, "UE30"),
+        (TODAS, UTI, "UT30"),
+    ],
+    "F40-FASE FABRICACION UTILLAJES CAJAS ACABADO": [
+        (TODAS, PROC, "A39"),
+        (TODAS, UTI, "UT20"),
+    ],
+    "F30-FASE FABRICACION UTILLAJES CAJAS ESTRUCTURA": [
+        (TODAS, PROC, "UE12"),
+        (TODAS, UTI, "UT22"),
+    ],
+    "U50-FASE PRESERIE 2 INICIO FABRICACION": [
+        (TODAS, PROC, "UE50"),
+        (TODAS, UTI, "UT50"),
+    ],
+    "F10-FASE FABRICACION UTILLAJES BOGIE ESTRUCTURA": [
+        (TODAS, PROC, "UE10"),
+        (TODAS, UTI, "UT20"),
+    ],
+    "FORMACIÓN": [
+        (CHAPAS["AGG01"], TODAS, "AGG01"),
+        (CHAPAS["EGG01"], TODAS, "EGG01"),
+    ],
+    "UH-GESTION DE HERRAMIENTAS": [
+        ({"12591"}, PROC, "UE10"),
+        ({"12705"}, PROC, "A32"),
+        (TODAS, UTI, "UE10"),
+    ],
+    "UM-MANTENIMIENTO": [
+        (TODAS, PROC, "A39"),
+        (TODAS, UTI, "UT42"),
+    ],
+    "UV-VERIFICACION DE UTILLAJES": [
+        ({"12705"}, PROC, "A39"),
+        (TODAS, PROC, "UE10"),
+        ({"12591"}, UTI, "UE10"),
+        (TODAS, UTI, "UT40"),
+    ],
+    "VARIOS": [
+        (TODAS, PROC, "UEVAR01"),
+        (TODAS, UTI, "UTVAR01"),
+    ],
 }
 
 
+# --------------------------------------------------------------------- #
+#  ------------------  TABLA DE DECISIÓN COMPILADA  -------------------- #
+# --------------------------------------------------------------------- #
+Clave = tuple[str, str | None, str | None]
+Entrada = tuple[int, str]                     # (orden de declaración, tarea)
+
+COLUMNAS_FICHERO = ["actividad", "chapa", "categoria", "tarea"]
+
+
+def _filas_desde_reglas(
+    reglas: dict[str, list[Regla]],
+) -> list[tuple[str, str | None, str | None, str]]:
+    """Aplana `_RULES` en filas (actividad, chapa, categoria, tarea)."""
+    filas = []
+    for actividad, entradas in reglas.items():
+        for chapas, categoria, tarea in entradas:
+            for chapa in sorted(chapas) if chapas is not TODAS else [TODAS]:
+                filas.append((actividad, chapa, categoria, tarea))
+    return filas
+
+
+def _compilar(
+    filas: list[tuple[str, str | None, str | None, str]],
+) -> dict[Clave, Entrada]:
+    """
+    Construye el diccionario (actividad, chapa, categoria) → (orden, tarea);
+    el orden es el de la primera fila con esa clave.
+    """
+    tabla: dict[Clave, Entrada] = {}
+    for orden, (actividad, chapa, categoria, tarea) in enumerate(filas):
+        tabla.setdefault((actividad.strip(), chapa, categoria), (orden, tarea))
+    return tabla
+
+
+_TABLA: dict[Clave, Entrada] = _compilar(_filas_desde_reglas(_RULES))
+
+
+def _celda(valor) -> str | None:
+    """Celda del fichero de reglas → str limpio, o `TODAS` si está vacía."""
+    if valor is None:
+        return TODAS
+    texto = str(valor).strip()
+    if texto in ("", "*", "nan"):
+        return TODAS
+    return texto
+
+
+def cargar_reglas(ruta: Path) -> int:
+    """
+    Sustituye la tabla de decisión por la del fichero indicado.
+
+    El fichero (.csv separado por ';' o Excel) debe tener las columnas
+    actividad / chapa / categoria / tarea. Una chapa o categoría vacía (o
+    '*') actúa como comodín. Devuelve el número de claves cargadas.
+    """
+    global _TABLA
+
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == ".csv":
+        with ruta.open(newline="", encoding="utf-8-sig") as fh:
+            registros = list(csv.DictReader(fh, delimiter=";"))
+    else:
+        import pandas as pd
+
+        registros = pd.read_excel(ruta, dtype=str).to_dict("records")
+
+    faltan = [c for c in COLUMNAS_FICHERO if registros and c not in registros[0]]
+    if faltan:
+        raise ValueError(f"{ruta.name}: faltan columnas {faltan}")
+
+    filas = []
+    for r in registros:
+        actividad, tarea = _celda(r["actividad"]), _celda(r["tarea"])
+        if actividad is None or tarea is None:
+            continue
+        categoria = _celda(r["categoria"])
+        filas.append(
+            (actividad, _celda(r["chapa"]), categoria and categoria.lower(), tarea)
+        )
+
+    _TABLA = _compilar(filas)
+    _resolver.cache_clear()
+    return len(_TABLA)
+
+
+def tabla_decision() -> dict[Clave, Entrada]:
+    """Tabla de decisión activa (para enviarla a otros procesos)."""
+    return _TABLA
+
+
+def fijar_tabla_decision(tabla: dict[Clave, Entrada]) -> None:
+    """Sustituye la tabla de decisión por *tabla* (p.ej. en un worker)."""
+    global _TABLA
+
+    _TABLA = tabla
+    _resolver.cache_clear()
+
+
+def exportar_reglas(ruta: Path) -> None:
+    """Vuelca las reglas incorporadas a un CSV editable por `cargar_reglas`."""
+    with Path(ruta).open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh, delimiter=";")
+        writer.writerow(COLUMNAS_FICHERO)
+        for actividad, chapa, categoria, tarea in _filas_desde_reglas(_RULES):
+            writer.writerow([actividad, chapa or "", categoria or "", tarea])
+
+
+# Nivel de la clave que decide (traza)
+NIVELES = (
+    "actividad+chapa+categoria",
+    "actividad+chapa",
+    "actividad+categoria",
+    "actividad",
+)
+
+
+def _claves(actividad: str, chapa: str, categoria: str) -> tuple[Clave, ...]:
+    return (
+        (actividad, chapa, categoria),
+        (actividad, chapa, TODAS),
+        (actividad, TODAS, categoria),
+        (actividad, TODAS, TODAS),
+    )
+
+
+def _decidir(actividad: str, chapa: str, categoria: str) -> tuple[str, str]:
+    """
+    (nivel, tarea) de la primera entrada declarada que casa con la fila,
+    o ('', '') si ninguna.
+    """
+    casan = [
+        (_TABLA[clave], nivel)
+        for nivel, clave in zip(NIVELES, _claves(actividad, chapa, categoria))
+        if clave in _TABLA
+    ]
+    if not casan:
+        # Actividad sin regla específica → pendiente de decidir
+        return "", ""
+    (_, tarea), nivel = min(casan)
+    return nivel, tarea
+
+
+@lru_cache(maxsize=4096)
+def _resolver(actividad: str, chapa: str, categoria: str) -> str:
+    return _decidir(actividad, chapa, categoria)[1]
+
+
+def regla_aplicada(actividad: str, chapa: str, categoria: str | None) -> str:
+    """Nivel (`NIVELES`) de la clave que decide, o '' si ninguna (traza)."""
+    categoria = (categoria or "").strip().lower()
+    return _decidir(actividad.strip(), chapa, categoria)[0]
+
+
+def firma_reglas() -> str:
+    """Huella de la tabla de decisión activa (cambia si cambian las reglas)."""
+    texto = repr(sorted(_TABLA.items(), key=repr))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def estadisticas_cache() -> dict[str, int]:
+    """Aciertos / fallos / tamaño de la caché de `asignar_tarea_asterisco`."""
+    return _resolver.cache_info()._asdict()
+
+
 # --------------------------------------------------------------------- #
 #  ---------------------  FUNCIÓN PÚBLICA  ---------------------------- #
 # --------------------------------------------------------------------- #
@@ -261,10 +345,4 @@ def asignar_tarea_asterisco(
         CodTarea final o '' si la fila debe descartarse / sin asignar.
     """
     categoria = (categoria or "").strip().lower()
-
-    func = _RULES.get(actividad.strip())
-    if func is None:
-        # Actividad sin regla específica → pendiente de decidir
-        return ""
-
-    return func(chapa, categoria)
\ No newline at end of file
+    return _resolver(actividad.strip(), chapa, categoria)
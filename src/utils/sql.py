@@ -0,0 +1,29 @@
+# PATH: src/utils/sql.py
+
+"""
+Utilidades SQLite compartidas por la carga (src/load.py) y el almacén de
+referencias (src/referencias.py).
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pandas as pd
+
+# Máximo de parámetros por consulta IN (límite de SQLite: 999)
+LOTE_IN = 900
+
+
+def valor_sql(valor):
+    """NaN / None / NaT → NULL y fechas en ISO; el resto tal cual."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ")
+    return valor
+
+
+def identificador(nombre: str) -> str:
+    """Identificador SQL entre comillas."""
+    return '"' + str(nombre).replace('"', '""') + '"'
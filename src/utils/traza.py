@@ -0,0 +1,146 @@
+# PATH: src/utils/traza.py
+
+"""
+Traza de filas concretas a lo largo de las transformaciones.
+
+Qué filas se siguen se configura fuera del código, en el fichero
+`TRAZA` de config.py (CSV separado por ';' con columnas campo;valor):
+
+    campo;valor
+    actividad;U20-FASE COORDINACION: Definir proceso fabr. + …
+    chapa;12705
+    obra;1234
+
+Sin fichero la traza está desactivada y cada etapa solo comprueba
+`activa()` una vez: no hay coste por fila. Con traza, cada etapa añade
+en bloque un registro por fila seguida y cambio (etapa, fila de *Base
+Datos*, chapa, actividad, obra, campo, valor original, valor final y
+regla aplicada). `tabla()` los devuelve juntos → tabla TRAZA de la
+salida.
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.valores import factorizar
+
+# campo del fichero → columna de la base donde se busca
+CAMPOS = {
+    "actividad": ["actividad"],
+    "chapa": ["idusuario"],
+    "obra": ["proyecto_codigo", "CARGADO A"],
+}
+COLUMNAS = [
+    "etapa", "fila", "idusuario", "actividad", "proyecto_codigo",
+    "campo", "valor_original", "valor_final", "regla",
+]
+
+# Estado de la ejecución actual
+_FILTRO: dict[str, frozenset[str]] | None = None
+_REGISTROS: list[pd.DataFrame] = []
+
+
+def cargar_filtro(ruta: Path) -> int:
+    """Activa la traza con el fichero indicado. Devuelve nº de valores."""
+    ruta = Path(ruta)
+    with ruta.open(newline="", encoding="utf-8-sig") as fh:
+        registros = list(csv.DictReader(fh, delimiter=";"))
+    if registros and not {"campo", "valor"} <= set(registros[0]):
+        raise ValueError(f"{ruta.name}: se esperan las columnas campo;valor")
+
+    valores: dict[str, set[str]] = {campo: set() for campo in CAMPOS}
+    for r in registros:
+        campo = (r["campo"] or "").strip().lower()
+        if campo not in CAMPOS:
+            raise ValueError(f"{ruta.name}: campo desconocido {r['campo']!r} ({', '.join(CAMPOS)})")
+        valores[campo].add((r["valor"] or "").strip())
+    fijar_filtro({campo: frozenset(v) for campo, v in valores.items()})
+    return sum(len(v) for v in valores.values())
+
+
+def fijar_filtro(filtro: dict[str, frozenset[str]] | None) -> None:
+    """Activa (o con None desactiva) la traza y vacía los registros."""
+    global _FILTRO
+    _FILTRO = filtro
+    _REGISTROS.clear()
+
+
+def filtro() -> dict[str, frozenset[str]] | None:
+    """Filtro activo (para enviarlo a otros procesos)."""
+    return _FILTRO
+
+
+def activa() -> bool:
+    return _FILTRO is not None
+
+
+def seguidas(base: pd.DataFrame) -> np.ndarray:
+    """Máscara de las filas de *base* que coinciden con el filtro."""
+    mascara = np.zeros(len(base), dtype=bool)
+    for campo, columnas in CAMPOS.items():
+        valores = _FILTRO[campo]
+        for col in columnas:
+            if not valores or col not in base.columns:
+                continue
+            codigos, unicos = factorizar(base[col], use_na_sentinel=False)
+            en_filtro = np.array([str(v).strip() in valores for v in unicos], dtype=bool)
+            mascara |= en_filtro[codigos]
+    return mascara
+
+
+def _valores(valor, seleccion: np.ndarray):
+    if isinstance(valor, (pd.Series, pd.Index, np.ndarray)):
+        return np.asarray(valor, dtype=object)[seleccion]
+    return valor
+
+
+def registrar(etapa: str, filas: pd.DataFrame, campo: str, original, final, regla) -> None:
+    """
+    Añade las filas seguidas de *filas*. *original*, *final* y *regla*
+    son un valor o un array / Series alineado por posición con *filas*.
+    """
+    sel = seguidas(filas)
+    if not sel.any():
+        return
+    elegidas = filas[sel]
+    _REGISTROS.append(
+        pd.DataFrame(
+            {
+                "etapa": etapa,
+                "fila": elegidas.index,
+                **{
+                    col: elegidas[col].to_numpy(dtype=object) if col in elegidas else None
+                    for col in ("idusuario", "actividad", "proyecto_codigo")
+                },
+                "campo": campo,
+                "valor_original": _valores(original, sel),
+                "valor_final": _valores(final, sel),
+                "regla": _valores(regla, sel),
+            }
+        )
+    )
+
+
+def agregar(registros: pd.DataFrame) -> None:
+    """Añade registros capturados en otro proceso (modo lote)."""
+    if len(registros):
+        _REGISTROS.append(registros)
+
+
+def tomar() -> pd.DataFrame:
+    """Devuelve los registros y los vacía."""
+    resultado = tabla()
+    _REGISTROS.clear()
+    return resultado
+
+
+def tabla() -> pd.DataFrame:
+    """Todos los registros de la ejecución, en orden de captura."""
+    if not _REGISTROS:
+        return pd.DataFrame(columns=COLUMNAS)
+    return pd.concat(_REGISTROS, ignore_index=True)
@@ -0,0 +1,63 @@
+# PATH: src/utils/valores.py
+
+"""
+Factorización que respeta el tipo de cada valor.
+
+`pd.factorize` (y `astype("category")`) tratan 1234, 1234.0 y True/1
+como el mismo valor porque son iguales y tienen el mismo hash: el que
+aparece primero se queda y los demás se convierten a él. En columnas
+como CARGADO A, donde el Excel mezcla textos, enteros y decimales,
+`str(v)` deja entonces de ser el de cada fila ("1234" en vez de
+"1234.0") y cambian los borrados del maestro o las obras faltantes.
+
+`tipo_unico()` dice si una columna se puede factorizar / categorizar tal
+cual; `factorizar()` lo hace por tipo cuando no, con los valores
+distintos en orden de aparición, igual que `pd.factorize`. `texto()` es
+`str(v).strip()` por fila calculado así.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def tipo_unico(serie: pd.Series) -> bool:
+    """True si todos los valores no nulos de *serie* son del mismo tipo."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return tipo_unico(pd.Series(serie.cat.categories))
+    if serie.dtype != object:
+        return True
+    return not pd.api.types.infer_dtype(serie, skipna=True).startswith("mixed")
+
+
+def factorizar(serie: pd.Series, use_na_sentinel: bool = True) -> tuple[np.ndarray, pd.Index]:
+    """`pd.factorize` sin unir valores iguales de tipos distintos."""
+    if tipo_unico(serie):
+        codigos, distintos = pd.factorize(serie, use_na_sentinel=use_na_sentinel)
+        return codigos, pd.Index(distintos, dtype=object)
+
+    objetos = serie.to_numpy(dtype=object)
+    tipos, _ = pd.factorize(pd.Series([type(v) for v in objetos], dtype=object))
+    codigos = np.empty(len(objetos), dtype=np.int64)
+    distintos: list = []
+    for t in range(tipos.max() + 1):
+        sel = tipos == t
+        c, d = pd.factorize(objetos[sel], use_na_sentinel=use_na_sentinel)
+        codigos[sel] = np.where(c >= 0, c + len(distintos), -1)
+        distintos.extend(d)
+
+    # Valores distintos en orden de aparición, como pd.factorize
+    validos = codigos >= 0
+    orden, primeros = pd.factorize(codigos[validos])
+    codigos[validos] = orden
+    distintos_arr = np.empty(len(distintos), dtype=object)
+    distintos_arr[:] = distintos
+    return codigos, pd.Index(distintos_arr[primeros], dtype=object)
+
+
+def texto(serie: pd.Series) -> pd.Series:
+    """Equivale a `str(v).strip()` por fila, calculado solo sobre los únicos."""
+    codigos, unicos = factorizar(serie, use_na_sentinel=False)
+    limpios = unicos.map(lambda v: str(v).strip())
+    return pd.Series(limpios.take(codigos), index=serie.index, dtype=object)
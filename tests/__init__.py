@@ -0,0 +1 @@
+# PATH: tests/__init__.py
@@ -0,0 +1,84 @@
+# PATH: tests/test_mapear_cod_tarea.py
+
+"""
+`_mapear_cod_tarea` columnar frente al bucle por filas original
+(`_mapear_cod_tarea_filas`) sobre una base hecha a mano con un caso de
+cada: '*' resuelto y sin regla, #ESPECIAL#, código fuera de T_TAREAS,
+actividad sin asignación, vacíos y chapas / CARGADO A en decimales.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.transform import _mapear_cod_tarea, _mapear_cod_tarea_filas
+
+# (actividad, idusuario, CATEGORIA, CARGADO A)
+FILAS = [
+    ("VARIOS", "12705", "Procesos", 1234),                   # '*' resuelto
+    ("  VARIOS ", "12705", " UTILLAJES ", "1234"),           # espacios / mayúsculas
+    ("VARIOS", "12705", None, 1234.0),                       # '*' sin regla → PEND
+    ("VARIOS", 12705.0, "Procesos", np.nan),                 # chapa en decimales
+    ("IPS-GESTION SUBCONTRATACION", "99999", "GG", "OBRA-1"),
+    ("IPS-GESTION SUBCONTRATACION", 12705, "Procesos", 1234.5),
+    ("ZZ-ESPECIAL", "12705", "Procesos", None),              # #ESPECIAL#
+    ("ZZ-FUERA DE T_TAREAS", "12705", "Procesos", 1234),     # código desconocido
+    ("ZZ-SIN ASIGNACION", "12705", "Procesos", 1234),        # no está en la hoja
+    ("ZZ-NUMERICA", "12705", "Procesos", 1234),              # código numérico
+    (np.nan, "12705", "Procesos", 1234),                     # actividad vacía
+    ("VARIOS", np.nan, np.nan, np.nan),                      # chapa y categoría vacías
+]
+
+ASIGNACIONES = pd.DataFrame(
+    [
+        (" VARIOS", "*"),
+        ("IPS-GESTION SUBCONTRATACION", "*"),
+        ("ZZ-ESPECIAL", "#ESPECIAL#"),
+        ("ZZ-FUERA DE T_TAREAS", "ZZ_NO_EXISTE"),
+        ("ZZ-NUMERICA", 4711),
+    ],
+    columns=["Tarea ", "AsignarATarea"],
+)
+
+TAREAS_BD = pd.DataFrame(
+    {"CodTarea": ["UEVAR01", "UTVAR01", "AGG01", "EGG01", "UEVAR02", 4711]}
+)
+
+
+def _base(con_categoria: bool = True) -> pd.DataFrame:
+    base = pd.DataFrame(FILAS, columns=["actividad", "idusuario", "CATEGORIA", "CARGADO A"])
+    return base if con_categoria else base.drop(columns="CATEGORIA")
+
+
+@pytest.mark.parametrize("con_categoria", [True, False])
+def test_columnar_igual_que_filas(con_categoria):
+    base = _base(con_categoria)
+    columnar = _mapear_cod_tarea(base, ASIGNACIONES, TAREAS_BD)
+    filas = _mapear_cod_tarea_filas(base, ASIGNACIONES, TAREAS_BD)
+    pd.testing.assert_frame_equal(columnar, filas)
+
+
+def test_casos_conocidos():
+    res = _mapear_cod_tarea(_base(), ASIGNACIONES, TAREAS_BD)
+    cod = dict(zip(range(len(FILAS)), res["CodTarea"]))
+    assert cod[0] == "UEVAR01"
+    assert cod[1] == "UTVAR01"
+    assert cod[2] == "PEND_ASIGNACION_*"
+    assert cod[6] == ""                       # #ESPECIAL#
+    assert cod[7] == ""                       # no está en T_TAREAS
+    assert cod[8] == "" and res["AsignarATarea"][8] == ""
+    assert cod[9] == "4711"
+    assert cod[10] == ""
+
+
+def test_base_vacia():
+    base = _base().iloc[:0]
+    pd.testing.assert_frame_equal(
+        _mapear_cod_tarea(base, ASIGNACIONES, TAREAS_BD),
+        _mapear_cod_tarea_filas(base, ASIGNACIONES, TAREAS_BD),
+    )
+
+
+def test_modo_desconocido():
+    with pytest.raises(ValueError):
+        _mapear_cod_tarea(_base(), ASIGNACIONES, TAREAS_BD, modo="otro")
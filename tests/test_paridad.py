@@ -0,0 +1,40 @@
+# PATH: tests/test_paridad.py
+
+"""
+Paridad pandas / Polars (`bench.paridad`) como test: las tablas de los
+dos backends tienen que coincidir celda a celda sobre datos sintéticos,
+también con CARGADO A en decimales (mitad float y todo float), y la
+tabla de decisión '*' compilada tiene que dar lo mismo que recorrer
+`_RULES` en orden.
+"""
+
+import pytest
+
+from bench import paridad
+from bench.datos_sinteticos import generar
+from src.utils import reglas_asterisco_tareas as reglas_ast
+
+pytest.importorskip("polars")
+
+FILAS = 3000
+
+
+@pytest.fixture(scope="module")
+def entradas():
+    return generar(FILAS, 0)
+
+
+def test_reglas_asterisco():
+    assert paridad.reglas() == []
+
+
+def test_reglas_asterisco_orden_de_declaracion():
+    # una regla genérica declarada antes que una concreta tiene que ganar
+    orden = {"X": [(None, reglas_ast.PROC, "GENERICA"), ({"1"}, reglas_ast.PROC, "CONCRETA")]}
+    assert paridad.reglas(orden) == []
+
+
+@pytest.mark.parametrize("variante", ["", " [CARGADO A mitad float]", " [CARGADO A float]"])
+def test_pandas_igual_que_polars(entradas, variante):
+    d = paridad.variantes(entradas)[variante]
+    assert paridad.comparar(d) == []